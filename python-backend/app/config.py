@@ -12,12 +12,72 @@ class Settings(BaseSettings):
     jwt_secret: str = "change-me"
     jwt_algorithm: str = "HS256"
     jwt_exp_days: int = 7
+    # Verified-token cache (entries never outlive the token's own exp)
+    jwt_cache_size: int = 10000
+    jwt_cache_ttl_seconds: int = 300
 
     firebase_credentials: str | None = None
     firebase_storage_bucket: str | None = None
+    # Skip Firebase and use the in-memory MockDatabase (load tests, offline dev)
+    use_mock_db: bool = False
+
+    # Firestore client (one per worker process, shared by every router)
+    # Worker threads for sync handlers and blocking helpers (scripts use the sync client)
+    firestore_pool_size: int = 40
+    firestore_warmup: bool = True
 
     balance_encryption_key: str = "change-me-2"
 
+    # Country code assumed for local phone numbers (07..., 7...)
+    default_phone_country: str = "254"
+
+    # Read-through cache for user/wallet/credit documents; CACHE_SHARED adds a Redis tier
+    # (REDIS_URL, which must be reachable at startup when set; an in-process fake when unset) shared by all workers
+    cache_max_entries: int = 10000
+    cache_shared: bool = False
+    redis_url: str | None = None
+    user_cache_ttl_seconds: int = 300
+    wallet_cache_ttl_seconds: int = 10
+    credit_cache_ttl_seconds: int = 60
+
+    # Job heatmap: geohash length of a cell (5 = ~4.9km; changing it needs rebuild_job_heatmap.py)
+    heatmap_geohash_precision: int = 5
+    heatmap_cache_ttl_seconds: int = 30
+    # Documents each cell's counters are spread over, so a busy cell isn't a write hotspot
+    heatmap_shards: int = 4
+
+    # Job trends: longest window served (in days) and how long computed trends are cached
+    trends_max_days: int = 90
+    trends_cache_ttl_seconds: int = 60
+    # Documents each hour's counters are spread over, so the current hour isn't a write hotspot
+    trends_shards: int = 4
+
+    # Ratings: days covered by the recent average on a user's rating aggregates
+    rating_recent_days: int = 30
+
+    # Job views: counter shards per job (only ever raise it), buffer flush interval and read cache
+    job_view_shards: int = 8
+    job_views_flush_seconds: float = 5.0
+    job_views_cache_ttl_seconds: int = 30
+
+    # Document IDs: set a distinct WORKER_ID (0-65535) per process to make IDs strictly collision-free
+    worker_id: int | None = None
+
+    # Job search index: how often each worker picks up jobs written by other workers (0 disables)
+    job_search_refresh_seconds: int = 30
+
+    # USSD sessions: "memory" (per worker) or "redis" (shared via REDIS_URL)
+    ussd_session_store: str = "memory"
+    ussd_session_ttl_seconds: int = 300
+
+    # argon2 cost (existing hashes are upgraded on next login when these change)
+    argon2_time_cost: int = 3
+    argon2_memory_cost_kib: int = 65536
+    argon2_parallelism: int = 4
+    # Password hashing pool; requests beyond max_queue get a 503
+    password_pool_workers: int = 4
+    password_pool_max_queue: int = 64
+
     blockchain_enabled: bool = False
     web3_rpc_url: str | None = None
     contract_address: str | None = None
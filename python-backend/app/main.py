@@ -4,29 +4,6 @@ from fastapi.middleware.gzip import GZipMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 from .config import settings
 from fastapi.staticfiles import StaticFiles
-import firebase_admin
-from firebase_admin import credentials
-import os
-
-# Initialize Firebase Admin SDK (if not already initialized)
-if not firebase_admin._apps:
-    try:
-        # Try to load from ../secrets/service-account.json (relative to python-backend folder)
-        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-        cred_path = os.path.join(base_dir, 'secrets', 'service-account.json')
-        
-        if os.path.exists(cred_path):
-            cred = credentials.Certificate(cred_path)
-            firebase_admin.initialize_app(cred)
-            print(f"[SUCCESS] Firebase initialized with service account from: {cred_path}")
-        else:
-            # Try default credentials
-            firebase_admin.initialize_app()
-            print("[SUCCESS] Firebase initialized with default credentials")
-    except Exception as e:
-        print(f"[WARNING] Firebase not initialized: {e}")
-        print(f"   Expected path: {cred_path if 'cred_path' in locals() else 'secrets/service-account.json'}")
-        print("   App will run with limited functionality.")
 
 
 def create_app() -> FastAPI:
@@ -111,9 +88,50 @@ def create_app() -> FastAPI:
         name="profile-images",
     )
 
+    @app.on_event("startup")
+    async def connect_database():
+        # One Firestore client/channel per worker; sync handlers and blocking helpers share this thread pool
+        import anyio.to_thread
+        from .services.firebase import init_firebase, warm_up
+        anyio.to_thread.current_default_thread_limiter().total_tokens = settings.firestore_pool_size
+        init_firebase()
+        if settings.firestore_warmup:
+            await warm_up()
+
+    @app.on_event("startup")
+    async def connect_redis():
+        from .services.cache import check_redis
+        await check_redis()
+
+    @app.on_event("startup")
+    async def build_search_index():
+        from .services.job_search import job_index
+        await job_index.start()
+
     @app.get("/health")
     def health():
-        return {"status": "running"}
+        from .services.firebase import db_health
+        from .services.passwords import password_pool
+        from .services.cache import doc_cache
+        from .services.ussd_sessions import session_store
+        from .services.job_search import job_index
+        from .services.views import job_views
+        return {
+            "status": "running",
+            "database": db_health(),
+            "passwordPool": password_pool.stats(),
+            "cache": doc_cache.stats(),
+            "ussdSessions": session_store.stats(),
+            "jobSearch": job_index.stats(),
+            "jobViews": job_views.stats(),
+        }
+
+    @app.on_event("shutdown")
+    async def flush_pending_writes():
+        from .services.job_search import job_index
+        from .services.views import job_views
+        await job_views.flush()
+        await job_index.stop()
 
     return app
 
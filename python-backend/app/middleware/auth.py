@@ -1,18 +1,121 @@
 from __future__ import annotations
-from typing import Optional
+import hashlib
+import heapq
+import math
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
 from fastapi import Header, HTTPException
 from jose import jwt
 from ..config import settings
+from ..services.cache import get_redis
+
+
+# Verified tokens: sha256(token) -> (cache expiry, token exp or None, claims), least recently used first
+_verified: OrderedDict[bytes, tuple[float, Optional[float], dict]] = OrderedDict()
+# Revoked tokens seen by this worker: sha256(token) -> when the entry can be dropped (the token's own exp).
+# The authoritative set is in the shared Redis tier under revoked_key(), so a logout reaches every worker.
+_revoked: dict[bytes, float] = {}
+# (drop time, digest) for _revoked, soonest first, so pruning only touches entries that are due
+_revoked_expiry: list[tuple[float, bytes]] = []
+# Extra revocation checks, e.g. "all tokens for this user issued before X"; return True to reject
+_revocation_checks: list[Callable[[dict], bool]] = []
+
+
+def token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+def add_revocation_check(check: Callable[[dict], bool]) -> None:
+    """Register a predicate over verified claims; tokens it returns True for are rejected"""
+    _revocation_checks.append(check)
+
+
+def revoked_key(digest: bytes) -> str:
+    return f"revoked:{digest.hex()}"
+
+
+async def revoke_token(token: str) -> None:
+    """Reject this token from now on, on every worker (until it would have expired anyway)"""
+    digest = token_digest(token)
+    cached = _verified.pop(digest, None)
+    exp = cached[1] if cached else None
+    if exp is None:
+        try:
+            exp = jwt.get_unverified_claims(token).get("exp")
+        except Exception:
+            exp = None
+    now = time.time()
+    until = float(exp) if exp else now + settings.jwt_exp_days * 86400
+    _remember_revoked(digest, until)
+    if until > now:
+        await get_redis().set(revoked_key(digest), "1", ex=max(1, math.ceil(until - now)))
+
+
+def _remember_revoked(digest: bytes, until: float) -> None:
+    _verified.pop(digest, None)
+    _revoked[digest] = until
+    heapq.heappush(_revoked_expiry, (until, digest))
+    _prune_revoked(time.time())
+
+
+def _prune_revoked(now: float) -> None:
+    while _revoked_expiry and _revoked_expiry[0][0] <= now:
+        until, digest = heapq.heappop(_revoked_expiry)
+        # Skip stale heap entries for tokens revoked again with a later drop time
+        if _revoked.get(digest) == until:
+            del _revoked[digest]
+
+
+async def _verify(token: str) -> dict:
+    """Decode and verify, served from the LRU cache when possible. Raises jose errors.
+
+    The shared revocation set is consulted on every call, before any cached
+    claims are trusted, so a token revoked on another worker stops working here too.
+    """
+    digest = token_digest(token)
+    if digest in _revoked:
+        raise jwt.JWTError("Token revoked")
+    if await get_redis().get(revoked_key(digest)) is not None:
+        cached = _verified.get(digest)
+        _remember_revoked(digest, cached[1] if cached and cached[1] else time.time() + settings.jwt_exp_days * 86400)
+        raise jwt.JWTError("Token revoked")
+    now = time.time()
+    cached = _verified.get(digest)
+    if cached is not None:
+        cache_until, exp, claims = cached
+        if exp is not None and now >= exp:
+            del _verified[digest]
+            raise jwt.ExpiredSignatureError("Signature has expired.")
+        if now < cache_until:
+            _verified.move_to_end(digest)
+            return claims
+        del _verified[digest]
+
+    claims = jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
+    exp = claims.get("exp")
+    exp = float(exp) if exp is not None else None
+    cache_until = now + settings.jwt_cache_ttl_seconds
+    _verified[digest] = (min(cache_until, exp) if exp is not None else cache_until, exp, claims)
+    while len(_verified) > settings.jwt_cache_size:
+        _verified.popitem(last=False)
+    return claims
+
+
+def bearer_token(authorization: Optional[str]) -> str:
+    scheme, token = authorization.split(" ", 1)
+    if scheme.lower() != "bearer":
+        raise ValueError("Invalid scheme")
+    return token
 
 
 async def get_current_user(authorization: Optional[str] = Header(default=None)) -> dict:
     if not authorization:
         raise HTTPException(status_code=401, detail={"success": False, "message": "Access token required", "code": "NO_TOKEN"})
     try:
-        scheme, token = authorization.split(" ", 1)
-        if scheme.lower() != "bearer":
-            raise ValueError("Invalid scheme")
-        payload = jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
+        payload = await _verify(bearer_token(authorization))
+        if any(check(payload) for check in _revocation_checks):
+            raise ValueError("Token revoked")
         return {"userId": payload.get("userId", "")}
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail={"success": False, "message": "Token expired", "code": "TOKEN_EXPIRED"})
@@ -2,6 +2,7 @@ from __future__ import annotations
 from fastapi import APIRouter, Depends
 from datetime import datetime, timedelta
 from ..middleware.auth import get_current_user
+from ..services.trends import market_trends as compute_market_trends
 
 router = APIRouter()
 
@@ -42,9 +43,7 @@ async def insights(period: int = 30, user=Depends(get_current_user)):
 @router.get('/market-trends')
 async def market_trends(period: int = 30, location: str | None = None, user=Depends(get_current_user)):
     trends = {
-        'jobTrends': {},
-        'locationTrends': {},
-        'skillTrends': {},
+        **await compute_market_trends(period, location),
         'period': period,
         'generatedAt': datetime.utcnow().isoformat()
     }
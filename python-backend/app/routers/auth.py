@@ -1,9 +1,12 @@
+import asyncio
 from datetime import datetime, timedelta
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException
 from pydantic import BaseModel, EmailStr
 from jose import jwt
 from ..config import settings
-from ..services.firebase import get_db
+from ..middleware.auth import bearer_token, revoke_token
+from ..services.passwords import PasswordPoolSaturated
+from ..services.ids import new_id
 from ..services.repos import UsersRepo, WalletsRepo, CreditRepo
 
 
@@ -41,18 +44,34 @@ def issue_token(user_id: str, days: int | None = None) -> str:
     return jwt.encode(payload, settings.jwt_secret, algorithm=settings.jwt_algorithm)
 
 
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail={"success": False, "message": "Server busy, please try again", "code": "AUTH_BUSY"},
+        headers={"Retry-After": "1"},
+    )
+
+
+async def _hash_password(password: str) -> str:
+    try:
+        return await UsersRepo.hash_password(password)
+    except PasswordPoolSaturated:
+        raise _busy()
+
+
 @router.post("/register")
-def register(req: RegisterRequest):
+async def register(req: RegisterRequest):
     # Database is always available (Firebase or Mock)
     # Check existing
-    if UsersRepo.find_by_email(req.email) or UsersRepo.find_by_phone(req.phoneNumber):
+    by_email, by_phone = await asyncio.gather(UsersRepo.find_by_email(req.email), UsersRepo.find_by_phone(req.phoneNumber))
+    if by_email or by_phone:
         raise HTTPException(status_code=400, detail={"success": False, "message": "Email or phone already registered", "code": "USER_EXISTS"})
 
-    user_id = f"user_{int(datetime.utcnow().timestamp())}"
+    user_id = new_id("user")
     user_doc = {
         "email": req.email.lower(),
         "phoneNumber": req.phoneNumber,
-        "passwordHash": UsersRepo.hash_password(req.password),
+        "passwordHash": await _hash_password(req.password),
         "fullName": req.fullName,
         "location": req.location,
         "skills": req.skills or [],
@@ -69,11 +88,10 @@ def register(req: RegisterRequest):
         "voiceBiometric": req.voiceBiometric,  # Store biometric data
         "faceBiometric": req.faceBiometric,  # Store biometric data
     }
-    UsersRepo.create_user(user_id, user_doc)
+    await UsersRepo.create_user(user_id, user_doc)
 
     # Initialize wallet and credit score
-    WalletsRepo.get_or_create(user_id)
-    CreditRepo.get_or_create(user_id)
+    await asyncio.gather(WalletsRepo.get_or_create(user_id), CreditRepo.get_or_create(user_id))
 
     token = issue_token(user_id)
     user_public = {"userId": user_id, "email": req.email.lower(), "fullName": req.fullName}
@@ -85,7 +103,7 @@ def register(req: RegisterRequest):
 
 
 @router.post("/login")
-def login(req: LoginRequest):
+async def login(req: LoginRequest):
     # Database is always available (Firebase or Mock)
     if not req.password:
         raise HTTPException(status_code=401, detail={"success": False, "message": "Invalid credentials", "code": "INVALID_CREDENTIALS"})
@@ -96,47 +114,27 @@ def login(req: LoginRequest):
     phone_norm = str(req.phoneNumber).strip() if req.phoneNumber else None
 
     if email_norm:
-        user_doc = UsersRepo.find_by_email(email_norm)
+        user_doc = await UsersRepo.find_by_email(email_norm)
     elif phone_norm:
-        # Try multiple reasonable variants to tolerate past formatting
-        variants: list[str] = []
-        raw = phone_norm.replace(" ", "").replace("-", "")
-        variants.append(raw)
-        # Ensure leading '+' for common country codes if missing
-        if raw.startswith("254") and not raw.startswith("+254"):
-            variants.append("+" + raw)
-        if raw.startswith("27") and not raw.startswith("+27"):
-            variants.append("+" + raw)
-        # Kenya: remove trunk '0' after country code (e.g., +2540xxxx -> +254xxxx)
-        if raw.startswith("+2540"):
-            variants.append("+254" + raw[len("+2540"):])
-        # South Africa: remove trunk '0' after country code (e.g., +270xxx -> +27xxx)
-        if raw.startswith("+270"):
-            variants.append("+27" + raw[len("+270"):])
-        # Local numbers to E.164 (Kenya common prefixes 07x/01x)
-        if raw.startswith("07"):
-            variants.append("+254" + raw[1:])
-        if raw.startswith("01"):
-            variants.append("+254" + raw[1:])
-        # Also try collapsing any duplicate variants while preserving order
-        seen: set[str] = set()
-        ordered_variants: list[str] = []
-        for v in variants:
-            if v not in seen:
-                seen.add(v)
-                ordered_variants.append(v)
-        for candidate in ordered_variants:
-            user_doc = UsersRepo.find_by_phone(candidate)
-            if user_doc:
-                break
+        # Matches however the number was typed or stored (E.164, 07..., 254..., +2540...)
+        user_doc = await UsersRepo.find_by_phone(phone_norm)
 
     # Support both Python ('passwordHash') and legacy Node ('password') hashed fields
     password_hash = (user_doc or {}).get("passwordHash") or (user_doc or {}).get("password") or ""
-    if not user_doc or not UsersRepo.verify_password(req.password, password_hash):
+    if not user_doc:
+        raise HTTPException(status_code=401, detail={"success": False, "message": "Invalid credentials", "code": "INVALID_CREDENTIALS"})
+    try:
+        valid, new_hash = await UsersRepo.verify_password(req.password, password_hash)
+    except PasswordPoolSaturated:
+        raise _busy()
+    if not valid:
         raise HTTPException(status_code=401, detail={"success": False, "message": "Invalid credentials", "code": "INVALID_CREDENTIALS"})
 
-    # Update last login
-    UsersRepo.update_profile(user_doc["userId"], {"lastLogin": datetime.utcnow()})
+    # Update last login (and upgrade the hash if the cost settings changed)
+    updates = {"lastLogin": datetime.utcnow()}
+    if new_hash:
+        updates["passwordHash"] = new_hash
+    await UsersRepo.update_profile(user_doc["userId"], updates)
 
     token = issue_token(user_doc["userId"], 30 if req.rememberMe else settings.jwt_exp_days)
     user_public = {"userId": user_doc["userId"], "email": user_doc.get("email"), "fullName": user_doc.get("fullName")}
@@ -144,7 +142,12 @@ def login(req: LoginRequest):
 
 
 @router.post("/logout")
-def logout():
+async def logout(authorization: str | None = Header(default=None)):
+    # Revoke the presented token so it stops working before it expires
+    try:
+        await revoke_token(bearer_token(authorization))
+    except Exception:
+        pass
     return {"success": True, "message": "Logout successful"}
 
 
@@ -204,7 +207,7 @@ class BiometricLoginRequest(BaseModel):
 
 
 @router.post("/biometric-login")
-def biometric_login(req: BiometricLoginRequest):
+async def biometric_login(req: BiometricLoginRequest):
     """
     Authenticate user using voice or face biometrics.
     This is a simplified implementation. In production, you would:
@@ -218,9 +221,9 @@ def biometric_login(req: BiometricLoginRequest):
     # Find user
     user_doc = None
     if req.email:
-        user_doc = UsersRepo.find_by_email(req.email.lower())
+        user_doc = await UsersRepo.find_by_email(req.email.lower())
     elif req.phoneNumber:
-        user_doc = UsersRepo.find_by_phone(req.phoneNumber)
+        user_doc = await UsersRepo.find_by_phone(req.phoneNumber)
     
     if not user_doc:
         raise HTTPException(status_code=401, detail={"success": False, "message": "User not found", "code": "USER_NOT_FOUND"})
@@ -251,7 +254,7 @@ def biometric_login(req: BiometricLoginRequest):
     
     # Update last login
     user_id = user_doc.get("userId")
-    UsersRepo.update_last_login(user_id)
+    await UsersRepo.update_profile(user_id, {"lastLogin": datetime.utcnow()})
     
     # Generate token
     token = issue_token(user_id)
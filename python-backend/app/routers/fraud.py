@@ -1,23 +1,14 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from pydantic import BaseModel, Field
 from typing import Optional, List
-from datetime import datetime
 from ..middleware.auth import get_current_user
-import firebase_admin
 from firebase_admin import firestore
+from ..services.firebase import get_async_db
+from ..services.ids import new_id
+from ..services.unit_of_work import UnitOfWork, run_transaction
 
 router = APIRouter()
 
-# Lazy load firestore client
-def get_db():
-    try:
-        return firestore.client()
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail="Firebase not configured. Please add service-account.json to secrets folder."
-        )
-
 
 class FraudReport(BaseModel):
     category: str
@@ -33,6 +24,17 @@ class FraudReportUpdate(BaseModel):
     action: Optional[str] = None
 
 
+# Report statuses still awaiting a resolution
+OPEN_STATUSES = {"pending", "investigating"}
+
+
+def report_counts_ref(item_type: Optional[str], item_id: Optional[str]):
+    """Per-item report counter (total and still-open reports), or None for reports about nothing specific"""
+    if not item_id:
+        return None
+    return get_async_db().collection("fraud_report_counts").document(f"{item_type or 'item'}_{item_id}")
+
+
 def determine_priority(category: str) -> str:
     """Determine priority based on fraud category"""
     high_priority = ["Identity Theft", "Payment Fraud", "Scam/Fraud"]
@@ -49,7 +51,7 @@ def determine_priority(category: str) -> str:
 async def report_fraud(report: FraudReport, current_user: dict = Depends(get_current_user)):
     """Submit a fraud report"""
     try:
-        report_id = f"FRAUD_{int(datetime.now().timestamp() * 1000)}"
+        report_id = new_id("FRAUD")
         
         report_data = {
             "reportId": report_id,
@@ -67,7 +69,18 @@ async def report_fraud(report: FraudReport, current_user: dict = Depends(get_cur
             "resolution": None,
         }
         
-        get_db().collection("fraud_reports").document(report_id).set(report_data)
+        # Report and the reported item's counters are written together
+        async with UnitOfWork() as uow:
+            uow.create(get_async_db().collection("fraud_reports").document(report_id), report_data)
+            counts_ref = report_counts_ref(report.relatedItemType, report.relatedItemId)
+            if counts_ref is not None:
+                uow.set(counts_ref, {
+                    "relatedItemId": report.relatedItemId,
+                    "relatedItemType": report.relatedItemType,
+                    "total": firestore.Increment(1),
+                    "open": firestore.Increment(1),
+                    "lastReportedAt": firestore.SERVER_TIMESTAMP,
+                }, merge=True)
         
         return {
             "success": True,
@@ -93,7 +106,7 @@ async def get_my_reports(
 ):
     """Get user's fraud reports"""
     try:
-        query = db.collection("fraud_reports").where(
+        query = get_async_db().collection("fraud_reports").where(
             "reportedBy", "==", current_user["userId"]
         ).order_by("createdAt", direction=firestore.Query.DESCENDING).limit(limit)
         
@@ -101,7 +114,7 @@ async def get_my_reports(
             query = query.where("status", "==", status_filter)
         
         reports = []
-        for doc in query.stream():
+        async for doc in query.stream():
             report_data = doc.to_dict()
             report_data["id"] = doc.id
             reports.append(report_data)
@@ -141,7 +154,7 @@ async def get_all_reports(
                 detail="Admin access required"
             )
         
-        query = db.collection("fraud_reports").order_by(
+        query = get_async_db().collection("fraud_reports").order_by(
             "createdAt", direction=firestore.Query.DESCENDING
         ).limit(limit)
         
@@ -152,7 +165,7 @@ async def get_all_reports(
             query = query.where("priority", "==", priority)
         
         reports = []
-        for doc in query.stream():
+        async for doc in query.stream():
             report_data = doc.to_dict()
             report_data["id"] = doc.id
             reports.append(report_data)
@@ -192,14 +205,7 @@ async def update_fraud_report(
                 detail="Admin access required"
             )
         
-        report_ref = db.collection("fraud_reports").document(report_id)
-        report = report_ref.get()
-        
-        if not report.exists:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Fraud report not found"
-            )
+        report_ref = get_async_db().collection("fraud_reports").document(report_id)
         
         update_data = {
             "updatedAt": firestore.SERVER_TIMESTAMP,
@@ -213,7 +219,25 @@ async def update_fraud_report(
         if update.action:
             update_data["action"] = update.action
         
-        report_ref.update(update_data)
+        # Report and the reported item's open count change together, from the
+        # status as of the commit: concurrent updates can't both move the count
+        async def apply(transaction):
+            report = await report_ref.get(transaction=transaction)
+            if not report.exists:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Fraud report not found"
+                )
+            current = report.to_dict() or {}
+            transaction.update(report_ref, update_data)
+            counts_ref = report_counts_ref(current.get("relatedItemType"), current.get("relatedItemId"))
+            if counts_ref is not None and update.status:
+                was_open = current.get("status", "pending") in OPEN_STATUSES
+                now_open = update.status in OPEN_STATUSES
+                if was_open != now_open:
+                    transaction.set(counts_ref, {"open": firestore.Increment(1 if now_open else -1)}, merge=True)
+        
+        await run_transaction(apply)
         
         return {
             "success": True,
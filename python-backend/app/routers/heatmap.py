@@ -1,86 +1,50 @@
 from __future__ import annotations
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from ..services import heatmap as hm
+from ..services.geo import JOB_CATEGORIES, KENYA_AREAS
+from ..services.heatmap import JobHeatmap
+from ..services.trends import area_trends
+from ..services.repos import JobsRepo
 
 router = APIRouter()
 
 
-JOB_CATEGORIES = {
-    'Boda Boda': { 'color': '#FF6B6B', 'icon': '🏍️', 'intensity': 1.0 },
-    'Mama Fua': { 'color': '#4ECDC4', 'icon': '👩‍💼', 'intensity': 0.8 },
-    'Delivery': { 'color': '#45B7D1', 'icon': '📦', 'intensity': 0.9 },
-    'Cleaning': { 'color': '#96CEB4', 'icon': '🧹', 'intensity': 0.7 },
-    'Construction': { 'color': '#FFEAA7', 'icon': '🔨', 'intensity': 0.6 },
-    'Gardening': { 'color': '#DDA0DD', 'icon': '🌱', 'intensity': 0.5 },
-    'Other': { 'color': '#98D8C8', 'icon': '💼', 'intensity': 0.4 },
-}
+def _parse_date(value: str | None, name: str) -> datetime | None:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail={'success': False, 'message': f'Invalid {name}', 'code': 'INVALID_DATE'})
 
-KENYA_AREAS = {
-    'Nairobi': {
-        'coordinates': { 'latitude': -1.2921, 'longitude': 36.8219 },
-        'districts': ['CBD', 'Westlands', 'Kilimani', 'Karen', 'Runda', 'Kasarani', 'Eastleigh']
-    },
-    'Mombasa': {
-        'coordinates': { 'latitude': -4.0435, 'longitude': 39.6682 },
-        'districts': ['Mombasa Island', 'Nyali', 'Bamburi', 'Diani']
-    },
-    'Kisumu': {
-        'coordinates': { 'latitude': -0.0917, 'longitude': 34.7680 },
-        'districts': ['Kisumu Central', 'Kondele', 'Mamboleo']
-    },
-    'Nakuru': {
-        'coordinates': { 'latitude': -0.3072, 'longitude': 36.0800 },
-        'districts': ['Nakuru Town', 'Lanet', 'Kiamunyi']
-    },
-    'Eldoret': {
-        'coordinates': { 'latitude': 0.5143, 'longitude': 35.2698 },
-        'districts': ['Eldoret Central', 'Langas', 'Huruma']
-    },
-    'Thika': {
-        'coordinates': { 'latitude': -1.0333, 'longitude': 37.0833 },
-        'districts': ['Thika Town', 'Makongeni', 'Kiganjo']
-    },
-    'Malindi': {
-        'coordinates': { 'latitude': -3.2175, 'longitude': 40.1191 },
-        'districts': ['Malindi Town', 'Watamu', 'Kilifi']
-    },
-    'Nyeri': {
-        'coordinates': { 'latitude': -0.4201, 'longitude': 36.9476 },
-        'districts': ['Nyeri Town', 'Karatina', 'Mukurwe-ini']
-    },
-    'Meru': {
-        'coordinates': { 'latitude': 0.0463, 'longitude': 37.6559 },
-        'districts': ['Meru Town', 'Maua', 'Chuka']
-    },
-    'Kakamega': {
-        'coordinates': { 'latitude': 0.2827, 'longitude': 34.7519 },
-        'districts': ['Kakamega Town', 'Mumias', 'Butere']
-    },
-}
+
+def _since(period: int) -> date:
+    return datetime.utcnow().date() - timedelta(days=period)
 
 
 @router.get('/jobs')
 async def jobs(startDate: str | None = None, endDate: str | None = None, category: str | None = None, location: str | None = None, minPrice: float | None = None, maxPrice: float | None = None, limit: int = 1000):
-    # Stub: return static/empty heatmap with schema matching frontend
-    points: list[dict] = []
-    area_counts: dict[str, int] = {k: 0 for k in KENYA_AREAS.keys()}
+    start, end = _parse_date(startDate, 'startDate'), _parse_date(endDate, 'endDate')
+    if minPrice is None and maxPrice is None:
+        # Served from the per-cell aggregates; cost follows populated cells, not jobs
+        buckets = await JobHeatmap.buckets(start.date() if start else None, end.date() if end else None)
+        buckets = hm.filter_buckets(buckets, category, location)
+    else:
+        # Price ranges aren't in the aggregates: fold the matching jobs the same way
+        found = await JobsRepo.query(start, end, category, location, minPrice, maxPrice, limit)
+        buckets = hm.filter_buckets(hm.jobs_to_buckets(found), location=location)
+    stats = hm.statistics(buckets)
     return {
         'success': True,
         'data': {
             'heatmap': {
-                'points': points,
-                'areaCounts': area_counts,
-                'totalJobs': len(points)
-            },
-            'statistics': {
-                'totalJobs': len(points),
-                'averagePrice': 0,
-                'priceRange': {'min': 0, 'max': 0},
-                'categoryDistribution': {k: {'count': 0, 'percentage': 0, 'averagePrice': 0} for k in JOB_CATEGORIES.keys()},
-                'areaDistribution': {k: 0 for k in KENYA_AREAS.keys()},
-                'timeDistribution': {}
+                'points': hm.points(buckets, limit),
+                'areaCounts': stats['areaDistribution'],
+                'totalJobs': stats['totalJobs']
             },
+            'statistics': stats,
             'filters': {
                 'startDate': startDate,
                 'endDate': endDate,
@@ -96,27 +60,16 @@ async def jobs(startDate: str | None = None, endDate: str | None = None, categor
 
 @router.get('/density')
 async def density(period: int = 30):
-    density = {
-        area: {
-            'totalJobs': 0,
-            'averagePrice': 0,
-            'categories': {k: {'count': 0, 'percentage': 0, 'averagePrice': 0} for k in JOB_CATEGORIES.keys()},
-            'coordinates': data['coordinates'],
-            'districts': data['districts'],
-        }
-        for area, data in KENYA_AREAS.items()
-    }
-    return {'success': True, 'data': {'density': density, 'period': period, 'generatedAt': datetime.utcnow().isoformat()}}
+    buckets = await JobHeatmap.buckets(_since(period))
+    return {'success': True, 'data': {'density': hm.area_density(buckets), 'period': period, 'generatedAt': datetime.utcnow().isoformat()}}
 
 
 @router.get('/categories')
 async def categories(period: int = 30, location: str | None = None):
+    buckets = hm.filter_buckets(await JobHeatmap.buckets(_since(period)), location=location)
+    distribution = hm.category_distribution(buckets, with_totals=True)
     cats = {
-        k: {
-            'count': 0,
-            'percentage': 0,
-            'averagePrice': 0,
-            'totalValue': 0,
+        k: distribution[k] | {
             'color': v['color'],
             'icon': v['icon'],
             'intensity': v['intensity'],
@@ -127,4 +80,5 @@ async def categories(period: int = 30, location: str | None = None):
 
 @router.get('/trending')
 async def trending(period: int = 7):
-    return {'success': True, 'data': {'trending': {}, 'period': period, 'generatedAt': datetime.utcnow().isoformat()}}
+    trending = await area_trends(period)
+    return {'success': True, 'data': {'trending': trending, 'period': period, 'generatedAt': datetime.utcnow().isoformat()}}
@@ -1,23 +1,19 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from pydantic import BaseModel, Field
 from typing import Optional, List
-from datetime import datetime
 from ..middleware.auth import get_current_user
-import firebase_admin
 from firebase_admin import firestore
+from google.api_core.exceptions import AlreadyExists, NotFound
+from ..services.firebase import get_async_db
+from ..services.ids import new_id
+from ..services.repos import JobsRepo
+from ..services.job_search import job_index
+from ..services.trends import JobTrends
+from ..services.unit_of_work import UnitOfWork, run_transaction
+from ..services.views import job_views
 
 router = APIRouter()
 
-# Lazy load firestore client
-def get_db():
-    try:
-        return firestore.client()
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail="Firebase not configured. Please add service-account.json to secrets folder."
-        )
-
 
 class JobCreate(BaseModel):
     title: str
@@ -54,47 +50,69 @@ async def get_jobs(
     maxPrice: Optional[float] = None,
     urgency: Optional[str] = None,
     q: Optional[str] = None,
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get all jobs with filters"""
+    """Get all jobs with filters, ranked by relevance when searching"""
+    if minPrice is not None and maxPrice is not None and minPrice > maxPrice:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="minPrice must not exceed maxPrice")
     try:
-        query = db.collection("jobs").where("status", "==", "active")
-        
-        if category:
-            query = query.where("category", "==", category)
-        if urgency:
-            query = query.where("urgency", "==", urgency)
-        
-        query = query.order_by("createdAt", direction=firestore.Query.DESCENDING).limit(limit)
-        
-        jobs = []
-        for doc in query.stream():
-            job_data = doc.to_dict()
-            job_data["id"] = doc.id
-            
-            # Apply additional filters
-            if minPrice and job_data.get("priceKes", 0) < minPrice:
-                continue
-            if maxPrice and job_data.get("priceKes", 0) > maxPrice:
-                continue
-            if location and location.lower() not in job_data.get("location", {}).get("address", "").lower():
-                continue
-            if q and q.lower() not in job_data.get("title", "").lower() and q.lower() not in job_data.get("description", "").lower():
-                continue
-            
-            jobs.append(job_data)
+        if q and job_index.ready:
+            try:
+                found = job_index.search(
+                    q, category=category, urgency=urgency, location=location,
+                    min_price=minPrice, max_price=maxPrice, limit=limit,
+                    cursor=cursor, offset=(max(page, 1) - 1) * limit,
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+            db = get_async_db()
+            refs = [db.collection("jobs").document(job_id) for job_id in found["ids"]]
+            by_id = {}
+            async for doc in db.get_all(refs):
+                if doc.exists:
+                    by_id[doc.id] = doc.to_dict() | {"id": doc.id}
+            jobs = [by_id[job_id] for job_id in found["ids"] if job_id in by_id]
+            return {
+                "success": True,
+                "data": {
+                    "jobs": jobs,
+                    "pagination": {
+                        "page": page,
+                        "limit": limit,
+                        "total": found["total"],
+                        "hasMore": found["hasMore"],
+                        "nextCursor": found["nextCursor"]
+                    }
+                }
+            }
+
+        # Browsing (or searching before the index is built): filtered, newest-first pages from Firestore
+        try:
+            listing = await JobsRepo.list_active(
+                category=category, urgency=urgency, location=location,
+                min_price=minPrice, max_price=maxPrice, text=q,
+                limit=limit, cursor=cursor, page=max(page, 1),
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        total = None if q else await JobsRepo.count_active(category, urgency, location, minPrice, maxPrice)
         
         return {
             "success": True,
             "data": {
-                "jobs": jobs,
+                "jobs": listing["jobs"],
                 "pagination": {
                     "page": page,
                     "limit": limit,
-                    "total": len(jobs)
+                    "total": total,
+                    "hasMore": listing["hasMore"],
+                    "nextCursor": listing["nextCursor"]
                 }
             }
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -106,8 +124,8 @@ async def get_jobs(
 async def get_job(job_id: str, current_user: dict = Depends(get_current_user)):
     """Get job by ID"""
     try:
-        job_ref = db.collection("jobs").document(job_id)
-        job = job_ref.get()
+        job_ref = get_async_db().collection("jobs").document(job_id)
+        job = await job_ref.get()
         
         if not job.exists:
             raise HTTPException(
@@ -118,8 +136,9 @@ async def get_job(job_id: str, current_user: dict = Depends(get_current_user)):
         job_data = job.to_dict()
         job_data["id"] = job.id
         
-        # Increment views
-        job_ref.update({"views": firestore.Increment(1)})
+        # Count the view in the background; shards are summed for the total
+        job_views.add(job_id)
+        job_data["views"] = await job_views.count(job_id, job_data.get("views"))
         
         return {
             "success": True,
@@ -138,7 +157,7 @@ async def get_job(job_id: str, current_user: dict = Depends(get_current_user)):
 async def post_job(job_data: JobCreate, current_user: dict = Depends(get_current_user)):
     """Post a new job"""
     try:
-        job_id = f"JOB_{int(datetime.now().timestamp() * 1000)}"
+        job_id = new_id("JOB")
         
         job_doc = {
             "jobId": job_id,
@@ -163,7 +182,7 @@ async def post_job(job_data: JobCreate, current_user: dict = Depends(get_current
             "updatedAt": firestore.SERVER_TIMESTAMP
         }
         
-        get_db().collection("jobs").document(job_id).set(job_doc)
+        job_doc = await JobsRepo.create(job_id, job_doc)
         
         return {
             "success": True,
@@ -185,30 +204,25 @@ async def apply_for_job(
 ):
     """Apply for a job"""
     try:
-        job_ref = db.collection("jobs").document(job_id)
-        job = job_ref.get()
+        job_ref = get_async_db().collection("jobs").document(job_id)
         
-        if not job.exists:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Job not found"
-            )
-        
-        # Check if already applied
-        existing_app = db.collection("job_applications").where(
+        # Applications made before ids were derived from job and applicant have
+        # timestamp ids, so the create below can't see them
+        legacy = await get_async_db().collection("job_applications").where(
             "jobId", "==", job_id
         ).where(
             "applicantId", "==", current_user["userId"]
         ).limit(1).get()
         
-        if existing_app:
+        if legacy:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Already applied for this job"
             )
         
-        # Create application
-        app_id = f"APP_{int(datetime.now().timestamp() * 1000)}"
+        # One application per applicant and job: the id is derived from both,
+        # so a repeat (even a concurrent one) fails the create below
+        app_id = f"APP_{job_id}_{current_user['userId']}"
         app_doc = {
             "applicationId": app_id,
             "jobId": job_id,
@@ -220,15 +234,27 @@ async def apply_for_job(
             "appliedAt": firestore.SERVER_TIMESTAMP
         }
         
-        get_db().collection("job_applications").document(app_id).set(app_doc)
-        
-        # Update job application count
-        job_ref.update({"applicationCount": firestore.Increment(1)})
+        # Application and the job's count are written together in one round-trip;
+        # the update fails the whole batch if the job doesn't exist
+        try:
+            async with UnitOfWork() as uow:
+                uow.create(get_async_db().collection("job_applications").document(app_id), app_doc)
+                uow.update(job_ref, {"applicationCount": firestore.Increment(1)})
+        except AlreadyExists:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Already applied for this job"
+            )
+        except NotFound:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Job not found"
+            )
         
         return {
             "success": True,
             "message": "Application submitted successfully",
-            "data": {"application": app_doc}
+            "data": {"application": uow.resolved(app_doc)}
         }
     except HTTPException:
         raise
@@ -247,33 +273,47 @@ async def complete_job(
 ):
     """Complete a job and add review"""
     try:
-        job_ref = db.collection("jobs").document(job_id)
-        job = job_ref.get()
+        job_ref = get_async_db().collection("jobs").document(job_id)
         
-        if not job.exists:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Job not found"
-            )
-        
-        job_data = job.to_dict()
-        
-        # Check if user owns or is assigned to the job
-        if (job_data.get("postedBy") != current_user["userId"] and 
-            job_data.get("assignedTo") != current_user["userId"]):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Access denied"
-            )
+        # Status check, update and completion count commit together, so a job
+        # completed twice concurrently is only counted once
+        async def apply(transaction):
+            job = await job_ref.get(transaction=transaction)
+            if not job.exists:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Job not found"
+                )
+            
+            job_data = job.to_dict() or {}
+            
+            # Check if user owns or is assigned to the job
+            if (job_data.get("postedBy") != current_user["userId"] and 
+                job_data.get("assignedTo") != current_user["userId"]):
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Access denied"
+                )
+            if job_data.get("status") == "completed":
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Job is already completed"
+                )
+            
+            transaction.update(job_ref, {
+                "status": "completed",
+                "rating": review.rating,
+                "review": review.review,
+                "completionNotes": review.completionNotes,
+                "completedAt": firestore.SERVER_TIMESTAMP,
+                "updatedAt": firestore.SERVER_TIMESTAMP
+            })
+            trends_ref, trends_data = JobTrends.bucket_write(job_data, "completed")
+            transaction.set(trends_ref, trends_data, merge=True)
+            return job_data
         
-        # Update job
-        job_ref.update({
-            "status": "completed",
-            "rating": review.rating,
-            "review": review.review,
-            "completionNotes": review.completionNotes,
-            "completedAt": firestore.SERVER_TIMESTAMP
-        })
+        job_data = await run_transaction(apply)
+        job_index.remove(job_id)
         
         return {
             "success": True,
@@ -306,7 +346,7 @@ async def get_user_jobs(
             )
         
         field = "postedBy" if type == "posted" else "assignedTo"
-        query = db.collection("jobs").where(field, "==", current_user["userId"])
+        query = get_async_db().collection("jobs").where(field, "==", current_user["userId"])
         
         if status_filter:
             query = query.where("status", "==", status_filter)
@@ -314,7 +354,7 @@ async def get_user_jobs(
         query = query.order_by("createdAt", direction=firestore.Query.DESCENDING).limit(limit)
         
         jobs = []
-        for doc in query.stream():
+        async for doc in query.stream():
             job_data = doc.to_dict()
             job_data["id"] = doc.id
             jobs.append(job_data)
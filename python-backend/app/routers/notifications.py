@@ -1,23 +1,14 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from pydantic import BaseModel
 from typing import Optional
-from datetime import datetime
 from ..middleware.auth import get_current_user
-import firebase_admin
 from firebase_admin import firestore
+from ..services.firebase import get_async_db
+from ..services.ids import new_id
+from ..services.repos import UsersRepo
 
 router = APIRouter()
 
-# Lazy load firestore client
-def get_db():
-    try:
-        return firestore.client()
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail="Firebase not configured. Please add service-account.json to secrets folder."
-        )
-
 
 class NotificationSettings(BaseModel):
     overspendingAlerts: Optional[bool] = None
@@ -49,9 +40,10 @@ async def update_notification_settings(
             "updatedAt": firestore.SERVER_TIMESTAMP
         }
         
-        get_db().collection("users").document(current_user["userId"]).update({
+        await get_async_db().collection("users").document(current_user["userId"]).update({
             "notificationSettings": settings_data
         })
+        await UsersRepo.invalidate(current_user["userId"])
         
         return {
             "success": True,
@@ -69,8 +61,8 @@ async def update_notification_settings(
 async def get_notification_settings(current_user: dict = Depends(get_current_user)):
     """Get notification settings"""
     try:
-        user_ref = db.collection("users").document(current_user["userId"])
-        user = user_ref.get()
+        user_ref = get_async_db().collection("users").document(current_user["userId"])
+        user = await user_ref.get()
         
         if not user.exists:
             raise HTTPException(
@@ -111,12 +103,12 @@ async def get_access_logs(
 ):
     """Get access logs"""
     try:
-        query = db.collection("access_logs").where(
+        query = get_async_db().collection("access_logs").where(
             "userId", "==", current_user["userId"]
         ).order_by("timestamp", direction=firestore.Query.DESCENDING).limit(limit)
         
         logs = []
-        for doc in query.stream():
+        async for doc in query.stream():
             log_data = doc.to_dict()
             log_data["id"] = doc.id
             logs.append(log_data)
@@ -142,7 +134,7 @@ async def get_access_logs(
 async def log_access(user_id: str, action: str, metadata: dict = None):
     """Log user access (helper function)"""
     try:
-        log_id = f"LOG_{int(datetime.now().timestamp() * 1000)}"
+        log_id = new_id("LOG")
         log_data = {
             "logId": log_id,
             "userId": user_id,
@@ -151,7 +143,7 @@ async def log_access(user_id: str, action: str, metadata: dict = None):
             "metadata": metadata or {}
         }
         
-        get_db().collection("access_logs").document(log_id).set(log_data)
+        await get_async_db().collection("access_logs").document(log_id).set(log_data)
     except Exception as e:
         print(f"Error logging access: {e}")
 
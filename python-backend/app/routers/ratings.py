@@ -1,23 +1,16 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from pydantic import BaseModel, Field
 from typing import Optional
-from datetime import datetime
 from ..middleware.auth import get_current_user
-import firebase_admin
 from firebase_admin import firestore
+from google.api_core.exceptions import AlreadyExists
+from ..services.firebase import get_async_db
+from ..services.ids import new_id
+from ..services.rating_stats import RatingStats
+from ..services.unit_of_work import UnitOfWork
 
 router = APIRouter()
 
-# Lazy load firestore client
-def get_db():
-    try:
-        return firestore.client()
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail="Firebase not configured. Please add service-account.json to secrets folder."
-        )
-
 
 class JobRating(BaseModel):
     rating: float = Field(ge=0, le=5)
@@ -30,26 +23,6 @@ class UserRating(BaseModel):
     context: Optional[str] = None
 
 
-async def update_user_rating(user_id: str):
-    """Update user's average rating"""
-    try:
-        ratings_query = db.collection("ratings").where("ratedUser", "==", user_id).stream()
-        
-        ratings = [doc.to_dict()["rating"] for doc in ratings_query]
-        
-        if not ratings:
-            return
-        
-        avg_rating = sum(ratings) / len(ratings)
-        
-        get_db().collection("users").document(user_id).update({
-            "averageRating": round(avg_rating, 2),
-            "totalRatings": len(ratings)
-        })
-    except Exception as e:
-        print(f"Error updating user rating: {e}")
-
-
 @router.post("/job/{job_id}")
 async def rate_job(
     job_id: str,
@@ -59,8 +32,8 @@ async def rate_job(
     """Rate a job"""
     try:
         # Get job
-        job_ref = db.collection("jobs").document(job_id)
-        job = job_ref.get()
+        job_ref = get_async_db().collection("jobs").document(job_id)
+        job = await job_ref.get()
         
         if not job.exists:
             raise HTTPException(
@@ -78,21 +51,23 @@ async def rate_job(
                 detail="You can only rate jobs you were involved in"
             )
         
-        # Check if already rated
-        existing_rating = db.collection("ratings").where(
+        # Ratings made before ids were derived from job and rater have timestamp
+        # ids, so the create below can't see them
+        legacy = await get_async_db().collection("ratings").where(
             "jobId", "==", job_id
         ).where(
             "ratedBy", "==", current_user["userId"]
         ).limit(1).get()
         
-        if existing_rating:
+        if legacy:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="You have already rated this job"
             )
         
-        # Create rating
-        rating_id = f"RATING_{int(datetime.now().timestamp() * 1000)}"
+        # One rating per rater and job: the id is derived from both, so a repeat
+        # (even a concurrent one) fails the create below
+        rating_id = f"RATING_{job_id}_{current_user['userId']}"
         rated_user = (job_data.get("postedBy") if job_data.get("assignedTo") == current_user["userId"] 
                      else job_data.get("assignedTo"))
         
@@ -107,21 +82,25 @@ async def rate_job(
             "createdAt": firestore.SERVER_TIMESTAMP
         }
         
-        get_db().collection("ratings").document(rating_id).set(rating_doc)
-        
-        # Update job with rating
-        job_ref.update({
-            "rating": rating_data.rating,
-            "review": rating_data.comment
-        })
-        
-        # Update user's average rating
-        await update_user_rating(rated_user)
+        # Rating, job review and the rated user's aggregates are written together
+        try:
+            async with UnitOfWork() as uow:
+                uow.create(get_async_db().collection("ratings").document(rating_id), rating_doc)
+                uow.update(job_ref, {
+                    "rating": rating_data.rating,
+                    "review": rating_data.comment
+                })
+                await RatingStats.record(rated_user, rating_data.rating, uow=uow)
+        except AlreadyExists:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="You have already rated this job"
+            )
         
         return {
             "success": True,
             "message": "Rating submitted successfully",
-            "data": {"rating": rating_doc}
+            "data": {"rating": uow.resolved(rating_doc)}
         }
     except HTTPException:
         raise
@@ -147,7 +126,7 @@ async def rate_user(
             )
         
         # Create rating
-        rating_id = f"RATING_{int(datetime.now().timestamp() * 1000)}"
+        rating_id = new_id("RATING")
         
         rating_doc = {
             "ratingId": rating_id,
@@ -160,15 +139,15 @@ async def rate_user(
             "createdAt": firestore.SERVER_TIMESTAMP
         }
         
-        get_db().collection("ratings").document(rating_id).set(rating_doc)
-        
-        # Update user's average rating
-        await update_user_rating(user_id)
+        # Rating and the rated user's aggregates are written together
+        async with UnitOfWork() as uow:
+            uow.set(get_async_db().collection("ratings").document(rating_id), rating_doc)
+            await RatingStats.record(user_id, rating_data.rating, uow=uow)
         
         return {
             "success": True,
             "message": "Rating submitted successfully",
-            "data": {"rating": rating_doc}
+            "data": {"rating": uow.resolved(rating_doc)}
         }
     except HTTPException:
         raise
@@ -188,31 +167,27 @@ async def get_user_ratings(
 ):
     """Get ratings for a user"""
     try:
-        query = db.collection("ratings").where(
+        query = get_async_db().collection("ratings").where(
             "ratedUser", "==", user_id
         ).order_by("createdAt", direction=firestore.Query.DESCENDING).limit(limit)
         
         ratings = []
-        total_rating = 0
-        
-        for doc in query.stream():
+        async for doc in query.stream():
             rating_data = doc.to_dict()
             rating_data["id"] = doc.id
             ratings.append(rating_data)
-            total_rating += rating_data["rating"]
         
-        avg_rating = total_rating / len(ratings) if ratings else 0
+        stats = await RatingStats.get(user_id)
         
         return {
             "success": True,
             "data": {
                 "ratings": ratings,
-                "averageRating": round(avg_rating, 2),
-                "totalRatings": len(ratings),
+                **stats,
                 "pagination": {
                     "page": page,
                     "limit": limit,
-                    "total": len(ratings)
+                    "total": stats["totalRatings"]
                 }
             }
         }
@@ -3,6 +3,7 @@ from fastapi import APIRouter, Depends
 from pydantic import BaseModel
 from datetime import datetime
 from ..middleware.auth import get_current_user
+from ..services.ids import new_id
 
 router = APIRouter()
 
@@ -23,7 +24,7 @@ async def goals(page: int = 1, limit: int = 20, user=Depends(get_current_user)):
 @router.post('/goals')
 async def create_goal(req: CreateGoalRequest, user=Depends(get_current_user)):
     goal = {
-        'id': f'goal_{int(datetime.utcnow().timestamp())}',
+        'id': new_id('goal'),
         'userId': user['userId'],
         'name': req.name,
         'target': req.target,
@@ -43,7 +44,7 @@ class ContributeRequest(BaseModel):
 @router.post('/goals/{goalId}/contribute')
 async def contribute(goalId: str, req: ContributeRequest, user=Depends(get_current_user)):
     txn = {
-        'id': f'contrib_{int(datetime.utcnow().timestamp())}',
+        'id': new_id('contrib'),
         'goalId': goalId,
         'amount': req.amount,
         'date': datetime.utcnow().isoformat(),
@@ -67,7 +68,7 @@ class LoanRequest(BaseModel):
 @router.post('/loans')
 async def request_loan(req: LoanRequest, user=Depends(get_current_user)):
     loan = {
-        'id': f'loan_{int(datetime.utcnow().timestamp())}',
+        'id': new_id('loan'),
         'amount': req.amount,
         'purpose': req.purpose,
         'termMonths': req.termMonths,
@@ -2,6 +2,7 @@ from __future__ import annotations
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
 from ..middleware.auth import get_current_user
+from ..services.rating_stats import summary as rating_summary
 from ..services.repos import UsersRepo
 
 router = APIRouter()
@@ -32,13 +33,15 @@ class UserProfile(BaseModel):
 
 @router.get('/profile')
 async def get_profile(user=Depends(get_current_user)):
-    u = UsersRepo.find_by_id(user['userId']) or {}
+    u = await UsersRepo.find_by_id(user['userId']) or {}
+    ratings = rating_summary(u.get('ratingStats'))
     profile = UserProfile(
         userId=user['userId'],
         fullName=str(u.get('fullName', '')) or 'User',
         skills=list(u.get('skills', [])),
         location=str(u.get('location', 'Unknown')),
         email=u.get('email'),
+        **({'rating': ratings['averageRating']} if ratings['totalRatings'] else {}),
     )
     return {'success': True, 'data': {'profile': profile.model_dump()}}
 
@@ -62,7 +65,7 @@ async def update_profile(req: UpdateProfileRequest, user=Depends(get_current_use
     if req.coordinates is not None:
         updates['coordinates'] = req.coordinates
     if updates:
-        UsersRepo.update_profile(user['userId'], updates)
+        await UsersRepo.update_profile(user['userId'], updates)
     return await get_profile(user)
 
 
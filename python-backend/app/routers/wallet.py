@@ -1,4 +1,5 @@
 from __future__ import annotations
+import asyncio
 from datetime import datetime
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
@@ -6,6 +7,8 @@ from pydantic import BaseModel, Field
 from ..middleware.auth import get_current_user
 from ..utils.security import mask_balance
 from ..services.repos import WalletsRepo, TransactionsRepo
+from ..services.rollups import WalletRollups
+from ..services import analytics
 from passlib.context import CryptContext
 
 from typing import Any, Dict, List
@@ -49,76 +52,9 @@ class AnalyticsResponse(BaseModel):
 
 # ---------- Helpers ----------
 
-IN_TYPES = {"deposit", "transfer_in", "convert_in", "airtime_cashback", "refund"}
-OUT_TYPES = {"withdraw", "transfer_out", "convert_out", "payment", "bill"}
-
-def _parse_date(dt: Any) -> Optional[datetime]:
-    if not dt:
-        return None
-    if isinstance(dt, datetime):
-        return dt
-    if isinstance(dt, str):
-        # Try common ISO formats
-        try:
-            return datetime.fromisoformat(dt.replace("Z", "+00:00"))
-        except Exception:
-            pass
-    # Firestore-like timestamp dict support
-    if isinstance(dt, dict):
-        # Try { "_seconds": 123, "_nanoseconds": 0 } or { "seconds": 123 }
-        seconds = dt.get("_seconds") or dt.get("seconds")
-        if seconds is not None:
-            try:
-                return datetime.utcfromtimestamp(int(seconds))
-            except Exception:
-                return None
-    return None
-
-def _tx_direction(tx_type: Optional[str]) -> Optional[str]:
-    if not tx_type:
-        return None
-    t = str(tx_type).lower()
-    if t in IN_TYPES:
-        return "in"
-    if t in OUT_TYPES:
-        return "out"
-    # Heuristic fallback
-    if "deposit" in t or "in" in t:
-        return "in"
-    if "withdraw" in t or "out" in t or "payment" in t:
-        return "out"
-    return None
-
-def _coerce_float(val: Any, default: float = 0.0) -> float:
-    try:
-        return float(val)
-    except Exception:
-        return default
-
-def _build_simple_tx(raw: Dict[str, Any]) -> SimpleTransaction:
-    date = _parse_date(raw.get("date"))
-    return SimpleTransaction(
-        id=raw.get("id"),
-        type=raw.get("type"),
-        amount=_coerce_float(raw.get("amount", 0)),
-        currencyCode=str(raw.get("currencyCode") or "KES"),
-        date=(date or datetime.utcnow()).isoformat(),
-        status=raw.get("status"),
-        description=raw.get("description"),
-        category=raw.get("category"),
-        method=raw.get("method"),
-        hustle=raw.get("hustle"),
-    )
-
-async def _maybe_await(val):
-    # Utility to support either sync or async helpers
-    if hasattr(val, "__await__"):
-        return await val
-    return val
-
 async def _get_user_wallet(user_id: str) -> Dict[str, Any]:
     # Reuse existing internal wallet fetcher if available
-    wallet = await _maybe_await(_get_wallet(user_id))  # type: ignore[name-defined]
+    wallet = await WalletsRepo.get_or_create(user_id)
     if not wallet:
         raise HTTPException(status_code=404, detail={"success": False, "message": "Wallet not found"})
     return wallet
@@ -147,88 +83,23 @@ def _extract_balances(wallet: Dict[str, Any]) -> Dict[str, float]:
                 pass
     return balances
 
-def _filter_and_normalize_transactions(
-    transactions: List[Dict[str, Any]],
-    start_at: Optional[datetime],
-    end_at: Optional[datetime],
-    limit: int,
-) -> List[SimpleTransaction]:
-    # Normalize, sort desc by date, filter by date window, apply limit
-    normalized: List[SimpleTransaction] = []
-    for raw in transactions:
-        stx = _build_simple_tx(raw)
-        dt = _parse_date(stx.date)
-        if start_at and dt and dt < start_at:
-            continue
-        if end_at and dt and dt > end_at:
-            continue
-        normalized.append(stx)
-
-    normalized.sort(key=lambda t: t.date, reverse=True)
-    return normalized[:limit]
-
-def _analyze_transactions(txs: List[SimpleTransaction]) -> Dict[str, Any]:
-    totals_by_currency: Dict[str, Dict[str, float]] = {}
-    sums_for_avg: Dict[str, List[float]] = {}
-    category_counts: Dict[str, int] = {}
-    success_count = 0
-    total_count = len(txs)
-    last_activity: Optional[str] = None
-
-    for tx in txs:
-        cur = tx.currencyCode or "KES"
-        dirn = _tx_direction(tx.type)
-        amt = _coerce_float(tx.amount, 0.0)
-
-        # Initialize currency bucket
-        bucket = totals_by_currency.setdefault(cur, {"inflow": 0.0, "outflow": 0.0, "net": 0.0})
-
-        if dirn == "in":
-            bucket["inflow"] += amt
-            bucket["net"] += amt
-        elif dirn == "out":
-            bucket["outflow"] += amt
-            bucket["net"] -= amt
-
-        # For averages, include absolute amounts to avoid sign issues
-        sums_for_avg.setdefault(cur, []).append(abs(amt))
-
-        # Category counts
-        cat = (tx.category or "uncategorized").lower()
-        category_counts[cat] = category_counts.get(cat, 0) + 1
-
-        # Success rate
-        st = (tx.status or "").lower()
-        if st in ("success", "completed", "complete", "ok"):
-            success_count += 1
-
-        # Last activity
-        if not last_activity or tx.date > last_activity:
-            last_activity = tx.date
-
-    averages = [
-        CurrencyAverage(currencyCode=cur, averageAmount=(sum(vals) / max(len(vals), 1)))
-        for cur, vals in sums_for_avg.items()
-    ]
-    categories = [CategoryCount(category=k, count=v) for k, v in sorted(category_counts.items(), key=lambda x: (-x[1], x[0]))]
-
-    success_rate = (success_count / total_count) if total_count > 0 else 0.0
+def _simple_transactions(frame) -> List[SimpleTransaction]:
+    # Only the rows being returned are turned into models
+    return [SimpleTransaction(**row) for row in analytics.to_records(frame.drop(columns=["userId"]))]
 
+def _analysis_lists(summary: Dict[str, Any]) -> Dict[str, Any]:
     return {
-        "totalsByCurrency": totals_by_currency,
-        "averagesByCurrency": averages,
-        "categoryCounts": categories,
-        "successRate": success_rate,
-        "totalTransactions": total_count,
-        "lastActivity": last_activity,
+        **summary,
+        "averagesByCurrency": [CurrencyAverage(currencyCode=cur, averageAmount=avg) for cur, avg in summary["averagesByCurrency"].items()],
+        "categoryCounts": [CategoryCount(category=k, count=v) for k, v in sorted(summary["categoryCounts"].items(), key=lambda x: (-x[1], x[0]))],
     }
 
 # ---------- Route: GET /analytics ----------
 
 @router.get("/analytics", response_model=AnalyticsResponse, summary="Get analytics for the current user's wallet")  # type: ignore[name-defined]
 async def get_user_analytics(
-    days: int = Query(30),
-    limit: int = Query(50),
+    days: int = Query(30, ge=1, le=365),
+    limit: int = Query(50, ge=1, le=100),
     current_user: Dict[str, str] = Depends(get_current_user),
 ):
     user_id = current_user.get("userId")
@@ -243,24 +114,21 @@ async def get_user_analytics(
     wallet = await _get_user_wallet(user_id)
     balances = _extract_balances(wallet)
 
-    # Collect transactions
-    raw_transactions: List[Dict[str, Any]] = []
-
-    # Preferred: read from wallet object if available
+    # Legacy wallets embed their transactions; analyze those directly
     wallet_txs = wallet.get("transactions")
     if isinstance(wallet_txs, list):
-        raw_transactions = wallet_txs
-
-    # If none were found, you can plug in your datastore read here
-    # Example (pseudo):
-    # raw_transactions = await transactions_repo.list_for_user(user_id, start_at, end_at, limit)
-    # Make sure each item has fields: amount, currencyCode, type, date, status, description, category
-
-    # Normalize, filter, and limit
-    recent = _filter_and_normalize_transactions(raw_transactions, start_at, end_at, limit)
-
-    # Analyze
-    analysis = _analyze_transactions(recent)
+        frame = analytics.window(analytics.load_frame(wallet_txs), start_at, end_at)
+        recent = _simple_transactions(analytics.latest(frame, limit))
+        analysis = _analysis_lists(analytics.summarize(frame))
+    else:
+        # Totals come from the daily rollups; only the `limit` most recent transactions are read
+        summary, (page, _) = await asyncio.gather(
+            WalletRollups.summarize(user_id, days, end_at),
+            TransactionsRepo.list_by_user_after(user_id, limit),
+        )
+        frame = analytics.window(analytics.load_frame(_format_transaction(t) for t in page), start_at, end_at)
+        recent = _simple_transactions(analytics.latest(frame, limit))
+        analysis = _analysis_lists(summary)
 
     return AnalyticsResponse(
         success=True,
@@ -272,4 +140,65 @@ async def get_user_analytics(
         totalTransactions=analysis["totalTransactions"],
         lastActivity=analysis["lastActivity"],
         recent=recent,
-    )
\ No newline at end of file
+    )
+
+# ---------- Route: GET /transactions ----------
+
+def _format_transaction(txn: Dict[str, Any]) -> Dict[str, Any]:
+    # Shape expected by the Flutter WalletTransaction model
+    return {
+        "id": txn.get("transactionId"),
+        "type": txn.get("type"),
+        "amount": txn.get("amount"),
+        "currencyCode": txn.get("currencyCode"),
+        "date": txn.get("initiatedAt"),
+        "status": txn.get("status"),
+        "description": txn.get("description"),
+        "category": txn.get("category"),
+        "method": txn.get("paymentMethod") or txn.get("method"),
+        "hustle": (txn.get("metadata") or {}).get("hustle") or txn.get("hustle"),
+    }
+
+@router.get("/transactions", summary="Get the current user's transaction history")
+async def get_transactions(
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=100),
+    type: Optional[str] = None,
+    status: Optional[str] = None,
+    startDate: Optional[str] = None,
+    endDate: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="nextCursor from the previous page"),
+    includeTotal: bool = Query(False, description="Also return the (cached) total count"),
+    current_user: Dict[str, str] = Depends(get_current_user),
+):
+    user_id = current_user.get("userId")
+    if not user_id:
+        raise HTTPException(status_code=401, detail={"success": False, "message": "Unauthorized"})
+
+    filters = {"type": type, "status": status, "startDate": startDate, "endDate": endDate}
+    next_cursor: Optional[str] = None
+    if page > 1 and not cursor:
+        # Legacy offset paging; clients should follow nextCursor instead
+        items, total = await TransactionsRepo.list_by_user(user_id, page, limit, filters)
+        has_more = page * limit < total
+    else:
+        try:
+            items, next_cursor = await TransactionsRepo.list_by_user_after(user_id, limit, cursor, filters)
+        except ValueError:
+            raise HTTPException(status_code=400, detail={"success": False, "message": "Invalid cursor", "code": "INVALID_CURSOR"})
+        has_more = next_cursor is not None
+        total = await TransactionsRepo.count_by_user(user_id, filters) if includeTotal else None
+
+    return {
+        "success": True,
+        "data": {
+            "transactions": [_format_transaction(t) for t in items],
+            "pagination": {
+                "page": page,
+                "limit": limit,
+                "total": total,
+                "hasMore": has_more,
+                "nextCursor": next_cursor,
+            },
+        },
+    }
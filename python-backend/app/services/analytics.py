@@ -0,0 +1,168 @@
+"""
+Columnar transaction analytics.
+
+Transactions are loaded into a DataFrame once (one row per transaction, typed
+columns) and every report is a vectorized group-by over it, so the same code
+serves a single user's analytics request and batch reports over all wallets.
+"""
+from __future__ import annotations
+from typing import Any, Iterable, Optional
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from .firebase import get_db
+from .ledger import IN_TYPES, OUT_TYPES, SUCCESS_STATUSES
+
+
+FRAME_COLUMNS = ["id", "userId", "type", "amount", "currencyCode", "date", "status", "description", "category", "method", "hustle"]
+
+
+def _timestamp(val: Any) -> Any:
+    # Firestore REST-style {"_seconds": ...} dicts; everything else is left to pandas
+    if isinstance(val, dict):
+        seconds = val.get("_seconds") or val.get("seconds")
+        return pd.Timestamp(int(seconds), unit="s", tz="UTC") if seconds is not None else None
+    return val
+
+
+def _direction(types: pd.Series) -> np.ndarray:
+    """Vectorized ledger.tx_direction: 1 for inflow, -1 for outflow, 0 unknown"""
+    t = types.fillna("").astype(str).str.lower()
+    return np.select(
+        [
+            t.isin(IN_TYPES),
+            t.isin(OUT_TYPES),
+            t.str.contains("deposit", regex=False) | t.str.contains("in", regex=False),
+            t.str.contains("withdraw", regex=False) | t.str.contains("out", regex=False) | t.str.contains("payment", regex=False),
+        ],
+        [1, -1, 1, -1],
+        default=0,
+    )
+
+
+def load_frame(records: Iterable[dict[str, Any]]) -> pd.DataFrame:
+    """Normalize raw transaction dicts (wallet-embedded or `transactions` docs) into typed columns"""
+    df = pd.DataFrame.from_records(list(records))
+    if df.empty:
+        df = pd.DataFrame(columns=FRAME_COLUMNS)
+    if "id" not in df and "transactionId" in df:
+        df["id"] = df["transactionId"]
+    if "method" not in df and "paymentMethod" in df:
+        df["method"] = df["paymentMethod"]
+    # First available timestamp column wins, as in the per-row parser
+    date = pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns, UTC]")
+    for col in ("date", "initiatedAt", "createdAt"):
+        if col in df:
+            date = date.fillna(pd.to_datetime(df[col].map(_timestamp), errors="coerce", utc=True, format="mixed"))
+    for col in FRAME_COLUMNS:
+        if col not in df:
+            df[col] = None
+    df["date"] = date
+    df["amount"] = pd.to_numeric(df["amount"], errors="coerce").fillna(0.0).astype(float)
+    df["currencyCode"] = df["currencyCode"].fillna("KES").astype(str)
+    df["category"] = df["category"].fillna("uncategorized").astype(str).str.lower()
+    df["direction"] = _direction(df["type"])
+    df["success"] = df["status"].fillna("").astype(str).str.lower().isin(SUCCESS_STATUSES)
+    return df[FRAME_COLUMNS + ["direction", "success"]]
+
+
+def window(df: pd.DataFrame, start_at: Optional[datetime] = None, end_at: Optional[datetime] = None) -> pd.DataFrame:
+    """Rows inside [start_at, end_at]; rows without a date are kept, as before"""
+    mask = np.ones(len(df), dtype=bool)
+    if start_at is not None:
+        mask &= ~(df["date"] < pd.Timestamp(start_at, tz="UTC")).to_numpy()
+    if end_at is not None:
+        mask &= ~(df["date"] > pd.Timestamp(end_at, tz="UTC")).to_numpy()
+    return df[mask]
+
+
+def latest(df: pd.DataFrame, limit: int) -> pd.DataFrame:
+    """Most recent `limit` rows, newest first"""
+    return df.sort_values("date", ascending=False, na_position="last").head(limit)
+
+
+def to_records(df: pd.DataFrame) -> list[dict[str, Any]]:
+    """Rows as plain dicts: ISO dates (now when missing), None for missing values"""
+    now = datetime.utcnow().isoformat()
+    out = df.drop(columns=["direction", "success"], errors="ignore").astype(object)
+    out["date"] = [d.isoformat() if pd.notna(d) else now for d in df["date"]]
+    return out.where(out.notna(), None).to_dict("records")
+
+
+def summarize(df: pd.DataFrame) -> dict[str, Any]:
+    """Totals, averages, category counts and success rate for a frame"""
+    if df.empty:
+        return {"totalsByCurrency": {}, "averagesByCurrency": {}, "categoryCounts": {}, "successRate": 0.0, "totalTransactions": 0, "lastActivity": None}
+    signed = df["amount"] * df["direction"]
+    by_cur = pd.DataFrame({
+        "currencyCode": df["currencyCode"],
+        "inflow": np.where(df["direction"] > 0, df["amount"], 0.0),
+        "outflow": np.where(df["direction"] < 0, df["amount"], 0.0),
+        "net": signed,
+        "abs": df["amount"].abs(),
+    }).groupby("currencyCode", sort=False)
+    sums = by_cur[["inflow", "outflow", "net"]].sum()
+    averages = by_cur["abs"].mean()
+    categories = df["category"].value_counts()
+    last = df["date"].max()
+    return {
+        "totalsByCurrency": {cur: {k: float(v) for k, v in row.items()} for cur, row in sums.iterrows()},
+        "averagesByCurrency": {cur: float(v) for cur, v in averages.items()},
+        "categoryCounts": {cat: int(n) for cat, n in categories.items()},
+        "successRate": float(df["success"].mean()),
+        "totalTransactions": int(len(df)),
+        "lastActivity": last.isoformat() if pd.notna(last) else None,
+    }
+
+
+def time_series(df: pd.DataFrame, freq: str = "D") -> pd.DataFrame:
+    """Inflow/outflow/net/count per currency per time bucket (pandas offset alias, e.g. D, W, MS)"""
+    dated = df[df["date"].notna()]
+    frame = pd.DataFrame({
+        "date": dated["date"],
+        "currencyCode": dated["currencyCode"],
+        "inflow": np.where(dated["direction"] > 0, dated["amount"], 0.0),
+        "outflow": np.where(dated["direction"] < 0, dated["amount"], 0.0),
+        "net": dated["amount"] * dated["direction"],
+        "count": 1,
+    })
+    return frame.groupby(["currencyCode", pd.Grouper(key="date", freq=freq)]).sum().reset_index()
+
+
+def summarize_by_user(df: pd.DataFrame) -> pd.DataFrame:
+    """One row per (userId, currencyCode) with totals, averages, counts and success rate"""
+    frame = pd.DataFrame({
+        "userId": df["userId"],
+        "currencyCode": df["currencyCode"],
+        "inflow": np.where(df["direction"] > 0, df["amount"], 0.0),
+        "outflow": np.where(df["direction"] < 0, df["amount"], 0.0),
+        "net": df["amount"] * df["direction"],
+        "amount": df["amount"].abs(),
+        "success": df["success"].astype(float),
+        "date": df["date"],
+    })
+    return frame.groupby(["userId", "currencyCode"]).agg(
+        inflow=("inflow", "sum"),
+        outflow=("outflow", "sum"),
+        net=("net", "sum"),
+        averageAmount=("amount", "mean"),
+        transactions=("amount", "size"),
+        successRate=("success", "mean"),
+        lastActivity=("date", "max"),
+    ).reset_index()
+
+
+def load_transactions(user_ids: Optional[list[str]] = None, start_at: Optional[datetime] = None, end_at: Optional[datetime] = None) -> pd.DataFrame:
+    """Load transactions for some users (or everyone) straight into a frame"""
+    col = get_db().collection("transactions")
+    if user_ids is None:
+        docs = col.stream()
+    else:
+        # `in` filters accept at most 30 values
+        docs = (d for i in range(0, len(user_ids), 30) for d in col.where("userId", "in", user_ids[i:i + 30]).stream())
+    rows = []
+    for d in docs:
+        row = d.to_dict() or {}
+        row.setdefault("transactionId", d.id)
+        rows.append(row)
+    return window(load_frame(rows), start_at, end_at)
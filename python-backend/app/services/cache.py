@@ -0,0 +1,224 @@
+from __future__ import annotations
+import asyncio
+import copy
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Optional
+from ..config import settings
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # only needed when REDIS_URL is set
+    aioredis = None
+
+
+def dumps(value: Any) -> str:
+    """JSON with datetimes tagged so they round-trip (Firestore timestamps included)"""
+    def default(o):
+        if isinstance(o, datetime):
+            return {"$dt": o.isoformat()}
+        raise TypeError(f"Not cacheable: {type(o).__name__}")
+    return json.dumps(value, separators=(",", ":"), default=default)
+
+
+def loads(raw: str | bytes) -> Any:
+    return json.loads(raw, object_hook=lambda d: datetime.fromisoformat(d["$dt"]) if len(d) == 1 and "$dt" in d else d)
+
+
+class FakeRedis:
+    """In-process stand-in for the subset of redis.asyncio.Redis the app uses (tests, single-worker dev).
+
+    Holds at most `max_keys` keys: when full, expired keys are swept and then
+    the oldest writes are dropped, like Redis under an allkeys-lru policy.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._data: dict[str, tuple[Optional[float], Any]] = {}
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        for key in [k for k, (exp, _) in self._data.items() if exp is not None and exp <= now]:
+            del self._data[key]
+        # Free a tenth of the space at once so a full store doesn't sweep on every write
+        target = self.max_keys - self.max_keys // 10
+        while len(self._data) > target:
+            del self._data[next(iter(self._data))]
+
+    def _live(self, key: str) -> Optional[tuple[Optional[float], Any]]:
+        entry = self._data.get(key)
+        if entry is not None and entry[0] is not None and entry[0] <= time.monotonic():
+            del self._data[key]
+            return None
+        return entry
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._live(key)
+        return entry[1] if entry else None
+
+    async def set(self, key: str, value: str | bytes, ex: Optional[int] = None) -> bool:
+        raw = value.encode() if isinstance(value, str) else value
+        self._data.pop(key, None)
+        self._data[key] = (time.monotonic() + ex if ex else None, raw)
+        if len(self._data) > self.max_keys:
+            self._evict()
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        return sum(self._data.pop(k, None) is not None for k in keys)
+
+    async def expire(self, key: str, seconds: int) -> bool:
+        entry = self._live(key)
+        if entry is None:
+            return False
+        self._data[key] = (time.monotonic() + seconds, entry[1])
+        return True
+
+    async def ping(self) -> bool:
+        return True
+
+
+_redis = None
+
+
+def get_redis():
+    """Shared Redis client from settings.redis_url, or a process-wide FakeRedis when unset"""
+    global _redis
+    if _redis is None:
+        if settings.redis_url:
+            if aioredis is None:
+                raise RuntimeError("REDIS_URL is set but the redis package is not installed")
+            _redis = aioredis.from_url(settings.redis_url)
+        else:
+            _redis = FakeRedis()
+    return _redis
+
+
+async def check_redis() -> None:
+    """Fail fast when a configured REDIS_URL can't be reached, rather than on the first request"""
+    if not settings.redis_url:
+        return
+    try:
+        await get_redis().ping()
+    except Exception as e:
+        raise RuntimeError(f"Redis at REDIS_URL is unavailable: {e}") from e
+
+
+class ReadThroughCache:
+    """Per-worker LRU/TTL cache in front of an optional shared (Redis-compatible) tier.
+
+    get_or_load() serves from the local LRU, then the shared tier, then the
+    loader; concurrent misses for one key share a single load. A load that
+    was overtaken by invalidate() or set() still answers its callers but
+    isn't stored. Values are deep-copied in and out so callers can mutate
+    what they get back.
+    """
+
+    def __init__(self, max_entries: int, shared=None, prefix: str = "cache:"):
+        self.max_entries = max_entries
+        self.shared = shared
+        self.prefix = prefix
+        self._local: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        # In-flight loads; invalidate()/set() detach a key's load so its result isn't stored
+        self._loading: dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def _put_local(self, key: str, value: Any, ttl: float) -> None:
+        self._local[key] = (time.monotonic() + ttl, copy.deepcopy(value))
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    async def get_or_load(self, key: str, ttl: float, loader: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._local.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._local.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+            del self._local[key]
+
+        pending = self._loading.get(key)
+        if pending is not None:
+            return copy.deepcopy(await asyncio.shield(pending))
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        try:
+            value = await self._load(key, ttl, loader, future)
+            future.set_result(value)
+            return copy.deepcopy(value)
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            if self._loading.get(key) is future:
+                del self._loading[key]
+
+    async def _load(self, key: str, ttl: float, loader: Callable[[], Awaitable[Any]], future: asyncio.Future) -> Any:
+        if self.shared is not None:
+            try:
+                raw = await self.shared.get(self.prefix + key)
+            except Exception as e:
+                print(f"[WARNING] Shared cache read failed: {e}")
+                raw = None
+            if raw is not None:
+                self.shared_hits += 1
+                value = loads(raw)
+                if self._loading.get(key) is future:
+                    self._put_local(key, value, ttl)
+                return value
+        self.misses += 1
+        value = await loader()
+        if value is not None and self._loading.get(key) is future:
+            await self._store(key, value, ttl)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        """Write-through: store a value the caller just wrote to the database"""
+        self._loading.pop(key, None)
+        await self._store(key, value, ttl)
+
+    async def _store(self, key: str, value: Any, ttl: float) -> None:
+        self._put_local(key, value, ttl)
+        if self.shared is not None:
+            try:
+                await self.shared.set(self.prefix + key, dumps(value), ex=max(int(ttl), 1))
+            except Exception as e:
+                print(f"[WARNING] Shared cache write failed: {e}")
+
+    async def invalidate(self, *keys: str) -> None:
+        for key in keys:
+            self._local.pop(key, None)
+            self._loading.pop(key, None)
+        if self.shared is not None and keys:
+            try:
+                await self.shared.delete(*(self.prefix + k for k in keys))
+            except Exception as e:
+                print(f"[WARNING] Shared cache invalidation failed: {e}")
+
+    def clear(self) -> None:
+        self._local.clear()
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "entries": len(self._local),
+            "maxEntries": self.max_entries,
+            "hits": self.hits,
+            "sharedHits": self.shared_hits,
+            "misses": self.misses,
+            "hitRate": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+            "shared": type(self.shared).__name__ if self.shared is not None else None,
+        }
+
+
+doc_cache = ReadThroughCache(
+    settings.cache_max_entries,
+    shared=get_redis() if settings.cache_shared else None,
+)
@@ -1,69 +1,121 @@
 from __future__ import annotations
-from typing import Optional
+from typing import Any, Optional
 import os
+import time
 import firebase_admin
-from firebase_admin import credentials, firestore, storage
+from firebase_admin import credentials, firestore, firestore_async, storage
 from ..config import settings
-from .mock_db import get_mock_db
+from .mock_db import get_mock_db, get_async_mock_db
 
 
 _initialized = False
 _db = None
+_async_db = None
 _bucket = None
 _use_mock = False
+_health: dict[str, Any] = {"warm": False, "warmupMs": None, "initError": None, "lastError": None}
+
+
+def _credentials_path() -> Optional[str]:
+    """Explicit setting, then GOOGLE_APPLICATION_CREDENTIALS, then ../secrets/service-account.json"""
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    for path in (
+        settings.firebase_credentials,
+        os.getenv("GOOGLE_APPLICATION_CREDENTIALS"),
+        os.path.join(base_dir, "secrets", "service-account.json"),
+    ):
+        if path and os.path.exists(path):
+            return path
+    return None
 
 
 def init_firebase() -> None:
     global _initialized, _db, _bucket, _use_mock
     if _initialized:
         return
-    
-    # Check if Firebase is already initialized by main.py
-    if firebase_admin._apps:
-        try:
-            _db = firestore.client()
-            if settings.firebase_storage_bucket:
-                _bucket = storage.bucket(settings.firebase_storage_bucket)
-            _initialized = True
-            _use_mock = False
-            print("[SUCCESS] Firebase client connected")
-            return
-        except Exception as e:
-            print(f"[WARNING] Firebase client error: {e}")
-    
-    # Try to initialize Firebase
-    cred_path = settings.firebase_credentials or os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+
+    if settings.use_mock_db:
+        print("[INFO] Using MOCK DATABASE (USE_MOCK_DB is set)")
+        _db = get_mock_db()
+        _use_mock = True
+        _initialized = True
+        return
+
     try:
-        if cred_path and os.path.exists(cred_path):
-            cred = credentials.Certificate(cred_path)
-            firebase_admin.initialize_app(cred, {
-                'storageBucket': settings.firebase_storage_bucket
-            } if settings.firebase_storage_bucket else None)
-        else:
-            # Application default credentials
-            firebase_admin.initialize_app()
+        if not firebase_admin._apps:
+            cred_path = _credentials_path()
+            options = {"storageBucket": settings.firebase_storage_bucket} if settings.firebase_storage_bucket else None
+            if cred_path:
+                firebase_admin.initialize_app(credentials.Certificate(cred_path), options)
+                print(f"[SUCCESS] Firebase initialized with service account from: {cred_path}")
+            else:
+                # Application default credentials
+                firebase_admin.initialize_app(options=options)
+                print("[SUCCESS] Firebase initialized with default credentials")
+        # firebase_admin caches the client per app, so this is the process-wide client
         _db = firestore.client()
         if settings.firebase_storage_bucket:
             _bucket = storage.bucket(settings.firebase_storage_bucket)
-        _initialized = True
         _use_mock = False
-        print("[SUCCESS] Firebase initialized successfully")
+        print("[SUCCESS] Firebase client connected")
     except Exception as e:
         # Use mock database as fallback
         print(f"[WARNING] Firebase unavailable: {e}")
         print("[INFO] Using MOCK DATABASE for development")
         _db = get_mock_db()
-        _initialized = True
         _use_mock = True
+        _health["initError"] = str(e)
+    _initialized = True
+
+
+async def warm_up() -> dict[str, Any]:
+    """Open the channel, authenticate and make one cheap read so the first request doesn't pay for it"""
+    started = time.perf_counter()
+    try:
+        db = get_async_db()
+        # A point read of a document that needn't exist; a missing one costs the same single read
+        await db.collection("_warmup").document("ping").get()
+        _health.update(warm=True, lastError=None)
+    except Exception as e:
+        _health.update(warm=False, lastError=str(e))
+        print(f"[WARNING] Firestore warm-up failed: {e}")
+    _health["warmupMs"] = round((time.perf_counter() - started) * 1000, 1)
+    return db_health()
+
+
+def db_health() -> dict[str, Any]:
+    """Backend and warm-up result for /health"""
+    return {
+        "backend": ("mock" if _use_mock else "firestore") if _initialized else None,
+        "initialized": _initialized,
+        **_health,
+        "poolSize": settings.firestore_pool_size,
+    }
 
 
 def get_db():
-    """Get database (Firebase or Mock)"""
+    """Get the synchronous database (Firebase or Mock), for scripts and batch jobs"""
     if not _initialized:
         init_firebase()
     return _db
 
 
+def get_async_db():
+    """Get the async database (firestore.AsyncClient or the mock's async twin) used by request handlers.
+
+    The gRPC channel binds to the running event loop, so call this from inside it.
+    """
+    global _async_db
+    if not _initialized:
+        init_firebase()
+    if _async_db is None:
+        if _use_mock:
+            _async_db = get_async_mock_db()
+        else:
+            _async_db = firestore_async.client()
+    return _async_db
+
+
 def get_bucket():
     """Get storage bucket (Firebase only)"""
     if not _initialized:
@@ -0,0 +1,192 @@
+from __future__ import annotations
+import math
+import re
+from typing import Any, Optional
+
+
+JOB_CATEGORIES = {
+    'Boda Boda': { 'color': '#FF6B6B', 'icon': '🏍️', 'intensity': 1.0 },
+    'Mama Fua': { 'color': '#4ECDC4', 'icon': '👩‍💼', 'intensity': 0.8 },
+    'Delivery': { 'color': '#45B7D1', 'icon': '📦', 'intensity': 0.9 },
+    'Cleaning': { 'color': '#96CEB4', 'icon': '🧹', 'intensity': 0.7 },
+    'Construction': { 'color': '#FFEAA7', 'icon': '🔨', 'intensity': 0.6 },
+    'Gardening': { 'color': '#DDA0DD', 'icon': '🌱', 'intensity': 0.5 },
+    'Other': { 'color': '#98D8C8', 'icon': '💼', 'intensity': 0.4 },
+}
+
+KENYA_AREAS = {
+    'Nairobi': {
+        'coordinates': { 'latitude': -1.2921, 'longitude': 36.8219 },
+        'districts': ['CBD', 'Westlands', 'Kilimani', 'Karen', 'Runda', 'Kasarani', 'Eastleigh']
+    },
+    'Mombasa': {
+        'coordinates': { 'latitude': -4.0435, 'longitude': 39.6682 },
+        'districts': ['Mombasa Island', 'Nyali', 'Bamburi', 'Diani']
+    },
+    'Kisumu': {
+        'coordinates': { 'latitude': -0.0917, 'longitude': 34.7680 },
+        'districts': ['Kisumu Central', 'Kondele', 'Mamboleo']
+    },
+    'Nakuru': {
+        'coordinates': { 'latitude': -0.3072, 'longitude': 36.0800 },
+        'districts': ['Nakuru Town', 'Lanet', 'Kiamunyi']
+    },
+    'Eldoret': {
+        'coordinates': { 'latitude': 0.5143, 'longitude': 35.2698 },
+        'districts': ['Eldoret Central', 'Langas', 'Huruma']
+    },
+    'Thika': {
+        'coordinates': { 'latitude': -1.0333, 'longitude': 37.0833 },
+        'districts': ['Thika Town', 'Makongeni', 'Kiganjo']
+    },
+    'Malindi': {
+        'coordinates': { 'latitude': -3.2175, 'longitude': 40.1191 },
+        'districts': ['Malindi Town', 'Watamu', 'Kilifi']
+    },
+    'Nyeri': {
+        'coordinates': { 'latitude': -0.4201, 'longitude': 36.9476 },
+        'districts': ['Nyeri Town', 'Karatina', 'Mukurwe-ini']
+    },
+    'Meru': {
+        'coordinates': { 'latitude': 0.0463, 'longitude': 37.6559 },
+        'districts': ['Meru Town', 'Maua', 'Chuka']
+    },
+    'Kakamega': {
+        'coordinates': { 'latitude': 0.2827, 'longitude': 34.7519 },
+        'districts': ['Kakamega Town', 'Mumias', 'Butere']
+    },
+}
+
+# Jobs with coordinates further than this from every area centre get no area
+AREA_RADIUS_KM = 60.0
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# (pattern, area, district) with districts before areas and longer names first,
+# so "Kisumu Central" wins over "Kisumu"
+_PLACES: list[tuple[re.Pattern, str, Optional[str]]] = sorted(
+    [(re.compile(r"\b" + re.escape(d.lower()) + r"\b"), area, d) for area, a in KENYA_AREAS.items() for d in a['districts']]
+    + [(re.compile(r"\b" + re.escape(area.lower()) + r"\b"), area, None) for area in KENYA_AREAS],
+    key=lambda p: (p[2] is None, -len(p[0].pattern)),
+)
+
+
+def geohash(lat: float, lng: float, precision: int) -> str:
+    """Standard base32 geohash; precision 5 is a ~4.9km square at the equator"""
+    lat_lo, lat_hi, lng_lo, lng_hi = -90.0, 90.0, -180.0, 180.0
+    out, bits, ch, even = [], 0, 0, True
+    while len(out) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            ch = ch << 1 | (lng >= mid)
+            lng_lo, lng_hi = (mid, lng_hi) if lng >= mid else (lng_lo, mid)
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            ch = ch << 1 | (lat >= mid)
+            lat_lo, lat_hi = (mid, lat_hi) if lat >= mid else (lat_lo, mid)
+        even = not even
+        bits += 1
+        if bits == 5:
+            out.append(_BASE32[ch])
+            bits, ch = 0, 0
+    return "".join(out)
+
+
+def geohash_center(cell: str) -> tuple[float, float]:
+    lat_lo, lat_hi, lng_lo, lng_hi = -90.0, 90.0, -180.0, 180.0
+    even = True
+    for c in cell:
+        ch = _BASE32.index(c)
+        for shift in range(4, -1, -1):
+            bit = ch >> shift & 1
+            if even:
+                mid = (lng_lo + lng_hi) / 2
+                lng_lo, lng_hi = (mid, lng_hi) if bit else (lng_lo, mid)
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                lat_lo, lat_hi = (mid, lat_hi) if bit else (lat_lo, mid)
+            even = not even
+    return (lat_lo + lat_hi) / 2, (lng_lo + lng_hi) / 2
+
+
+def _km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 6371.0 * 2 * math.asin(math.sqrt(a))
+
+
+def nearest_area(lat: float, lng: float) -> Optional[str]:
+    best, best_km = None, AREA_RADIUS_KM
+    for area, data in KENYA_AREAS.items():
+        c = data['coordinates']
+        d = _km(lat, lng, c['latitude'], c['longitude'])
+        if d <= best_km:
+            best, best_km = area, d
+    return best
+
+
+def match_place(text: str | None) -> tuple[Optional[str], Optional[str]]:
+    """(area, district) named in free text, e.g. "Shop 4, Westlands" -> ("Nairobi", "Westlands")"""
+    if not text:
+        return None, None
+    lowered = text.lower()
+    for pattern, area, district in _PLACES:
+        if pattern.search(lowered):
+            return area, district
+    return None, None
+
+
+def _coords(location: dict[str, Any]) -> Optional[tuple[float, float]]:
+    for src in (location, location.get('coordinates') or {}):
+        if not isinstance(src, dict):
+            continue
+        lat = src.get('latitude', src.get('lat'))
+        lng = src.get('longitude', src.get('lng', src.get('lon')))
+        try:
+            if lat is not None and lng is not None:
+                return float(lat), float(lng)
+        except (TypeError, ValueError):
+            pass
+    return None
+
+
+def category_of(job: dict[str, Any]) -> str:
+    category = job.get('category')
+    return category if category in JOB_CATEGORIES else 'Other'
+
+
+def locate(location: Any, precision: int) -> dict[str, Any]:
+    """Normalized place for a job's location: geohash cell, area, district and point.
+
+    Coordinates decide the cell and area when present; otherwise the area or
+    district named in the address is used, placed at the area centre. Jobs
+    that can't be placed get all-None fields.
+    """
+    if isinstance(location, str):
+        location = {'address': location}
+    location = location if isinstance(location, dict) else {}
+    text = " ".join(str(v) for v in location.values() if isinstance(v, str))
+    named_area, named_district = match_place(text)
+    point = _coords(location)
+
+    if point is not None:
+        cell = geohash(point[0], point[1], precision)
+        # Area from the cell centre, so every job in a cell lands in the same area
+        area = nearest_area(*geohash_center(cell))
+        district = named_district if named_area == area else None
+    elif named_area is not None:
+        area, district = named_area, named_district
+        c = KENYA_AREAS[area]['coordinates']
+        point = (c['latitude'], c['longitude'])
+        cell = geohash(point[0], point[1], precision)
+    else:
+        return {'cell': None, 'area': None, 'district': None, 'lat': None, 'lng': None}
+
+    return {
+        'cell': cell,
+        'area': area,
+        'district': district,
+        'lat': round(point[0], 6),
+        'lng': round(point[1], 6),
+    }
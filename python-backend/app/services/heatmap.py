@@ -0,0 +1,277 @@
+from __future__ import annotations
+import random
+import re
+from typing import Any, Iterable, Optional
+from datetime import date, datetime, timezone
+from firebase_admin import firestore
+from .cache import doc_cache
+from .firebase import get_async_db
+from .unit_of_work import UnitOfWork
+from .geo import JOB_CATEGORIES, KENYA_AREAS, category_of, geohash_center, locate, match_place
+from ..config import settings
+
+
+def job_time(job: dict[str, Any]) -> datetime:
+    """Job creation time as an aware UTC datetime (now for SERVER_TIMESTAMP or missing values)"""
+    value = job.get("createdAt")
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            value = None
+    if isinstance(value, datetime):
+        return value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    return datetime.now(timezone.utc)
+
+
+def job_geo(job: dict[str, Any]) -> dict[str, Any]:
+    """The job's stored geo fields, or computed from its location for jobs written before they existed"""
+    return job.get("geo") or locate(job.get("location"), settings.heatmap_geohash_precision)
+
+
+def _price(job: dict[str, Any]) -> float:
+    try:
+        return float(job.get("priceKes") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def bucket_key(geo: dict[str, Any]) -> str:
+    district = re.sub(r"[^a-z0-9]+", "-", geo["district"].lower()).strip("-") if geo.get("district") else "-"
+    return f"{geo.get('cell') or 'none'}_{district}"
+
+
+def _bucket(geo: dict[str, Any]) -> dict[str, Any]:
+    # Points sit at the cell centre so every writer to a bucket agrees on them
+    lat, lng = geohash_center(geo["cell"]) if geo.get("cell") else (None, None)
+    return {
+        "key": bucket_key(geo),
+        "cell": geo.get("cell"),
+        "area": geo.get("area"),
+        "district": geo.get("district"),
+        "lat": round(lat, 6) if lat is not None else None,
+        "lng": round(lng, 6) if lng is not None else None,
+        "categories": {},
+    }
+
+
+def _merge_category(into: dict[str, Any], c: dict[str, Any]) -> None:
+    if not into:
+        into.update(count=0, total=0.0, min=c.get("min"), max=c.get("max"), hours={})
+    into["count"] += int(c.get("count", 0))
+    into["total"] += float(c.get("total", 0))
+    for bound, pick in (("min", min), ("max", max)):
+        if c.get(bound) is not None:
+            into[bound] = c[bound] if into[bound] is None else pick(into[bound], c[bound])
+    for hour, n in (c.get("hours") or {}).items():
+        into["hours"][hour] = into["hours"].get(hour, 0) + int(n)
+
+
+def fold(jobs: Iterable[dict[str, Any]]) -> tuple[dict[str, dict], dict[str, dict]]:
+    """Plain (daily, all-time) bucket documents by id for a set of jobs, as record() would build them (all in shard 0)"""
+    daily: dict[str, dict] = {}
+    cells: dict[str, dict] = {}
+    for job in jobs:
+        geo = job_geo(job)
+        when = job_time(job)
+        price = _price(job)
+        one = {"count": 1, "total": price, "min": price, "max": price, "hours": {str(when.hour): 1}}
+        key = bucket_key(geo)
+        day_id = f"{key}_{when.strftime('%Y%m%d')}_0"
+        for docs, doc_id, extra in ((daily, day_id, {"day": when.strftime("%Y-%m-%d")}), (cells, f"{key}_0", {})):
+            doc = docs.get(doc_id)
+            if doc is None:
+                doc = docs[doc_id] = _bucket(geo) | extra
+            _merge_category(doc["categories"].setdefault(category_of(job), {}), one)
+    return daily, cells
+
+
+class JobHeatmap:
+    """Job counts and prices per geohash cell, maintained when jobs are written.
+
+    Each job increments one daily bucket (`job_heatmap_daily/{cell}_{district}_{YYYYMMDD}_{n}`)
+    and one all-time bucket (`job_heatmap_cells/{cell}_{district}_{n}`) with per-category
+    count/total/min/max and an hour-of-day histogram, so the heatmap endpoints read
+    a number of documents proportional to populated cells, not jobs. `n` is a random
+    one of `heatmap_shards` so a busy cell spreads its writes; readers merge the
+    shards of a cell by its `key` field.
+    """
+
+    @staticmethod
+    def daily_col():
+        return get_async_db().collection("job_heatmap_daily")
+
+    @staticmethod
+    def cells_col():
+        return get_async_db().collection("job_heatmap_cells")
+
+    @staticmethod
+    async def record(job: dict[str, Any], uow: Optional[UnitOfWork] = None) -> None:
+        if uow is None:
+            async with UnitOfWork() as uow:
+                return await JobHeatmap.record(job, uow)
+        geo = job_geo(job)
+        when = job_time(job)
+        price = _price(job)
+        base = {k: v for k, v in _bucket(geo).items() if k != "categories"}
+        increments = {
+            "categories": {
+                category_of(job): {
+                    "count": firestore.Increment(1),
+                    "total": firestore.Increment(price),
+                    "min": firestore.Minimum(price),
+                    "max": firestore.Maximum(price),
+                    "hours": {str(when.hour): firestore.Increment(1)},
+                }
+            }
+        }
+        key = base["key"]
+        shard = random.randrange(max(1, settings.heatmap_shards))
+        uow.set(JobHeatmap.daily_col().document(f"{key}_{when.strftime('%Y%m%d')}_{shard}"),
+                base | {"day": when.strftime("%Y-%m-%d")} | increments, merge=True)
+        uow.set(JobHeatmap.cells_col().document(f"{key}_{shard}"), base | increments, merge=True)
+
+    @staticmethod
+    async def buckets(start: Optional[date] = None, end: Optional[date] = None) -> list[dict[str, Any]]:
+        """Cell buckets for jobs created in [start, end] (all time when both are None), briefly cached"""
+        async def load():
+            if start is None and end is None:
+                q = JobHeatmap.cells_col()
+            else:
+                q = JobHeatmap.daily_col()
+                if start is not None:
+                    q = q.where("day", ">=", start.isoformat())
+                if end is not None:
+                    q = q.where("day", "<=", end.isoformat())
+            merged: dict[str, dict] = {}
+            async for d in q.stream():
+                doc = d.to_dict() or {}
+                bucket = merged.get(doc["key"])
+                if bucket is None:
+                    bucket = merged[doc["key"]] = {k: v for k, v in doc.items() if k not in ("day", "categories")} | {"categories": {}}
+                for cat, c in (doc.get("categories") or {}).items():
+                    _merge_category(bucket["categories"].setdefault(cat, {}), c)
+            return list(merged.values())
+        return await doc_cache.get_or_load(f"heatmap:{start}:{end}", settings.heatmap_cache_ttl_seconds, load)
+
+
+def jobs_to_buckets(jobs: Iterable[dict[str, Any]]) -> list[dict[str, Any]]:
+    return list(fold(jobs)[1].values())
+
+
+def filter_buckets(buckets: list[dict[str, Any]], category: Optional[str] = None, location: Optional[str] = None) -> list[dict[str, Any]]:
+    """Restrict buckets to one category and/or the area or district named by `location`"""
+    if location:
+        area, district = match_place(location)
+        if area is None:
+            needle = location.lower()
+            buckets = [b for b in buckets if needle in (b.get("area") or "").lower() or needle in (b.get("district") or "").lower()]
+        else:
+            buckets = [b for b in buckets if b.get("area") == area and (district is None or b.get("district") == district)]
+    if category:
+        buckets = [b | {"categories": {category: b["categories"][category]}} for b in buckets if category in (b.get("categories") or {})]
+    return buckets
+
+
+def _totals(buckets: list[dict[str, Any]]) -> dict[str, Any]:
+    t: dict[str, Any] = {}
+    for b in buckets:
+        for c in (b.get("categories") or {}).values():
+            _merge_category(t, c)
+    return t or {"count": 0, "total": 0.0, "min": None, "max": None, "hours": {}}
+
+
+def category_distribution(buckets: list[dict[str, Any]], with_totals: bool = False) -> dict[str, dict[str, Any]]:
+    per: dict[str, dict] = {}
+    for b in buckets:
+        for cat, c in (b.get("categories") or {}).items():
+            _merge_category(per.setdefault(cat, {}), c)
+    total = sum(c["count"] for c in per.values())
+    out = {}
+    for cat in JOB_CATEGORIES:
+        c = per.get(cat) or {"count": 0, "total": 0.0}
+        out[cat] = {
+            "count": c["count"],
+            "percentage": c["count"] / total * 100 if total else 0,
+            "averagePrice": c["total"] / c["count"] if c["count"] else 0,
+        }
+        if with_totals:
+            out[cat]["totalValue"] = c["total"]
+    return out
+
+
+def area_counts(buckets: list[dict[str, Any]]) -> dict[str, int]:
+    counts = {area: 0 for area in KENYA_AREAS}
+    for b in buckets:
+        if b.get("area") in counts:
+            counts[b["area"]] += _totals([b])["count"]
+    return counts
+
+
+def statistics(buckets: list[dict[str, Any]]) -> dict[str, Any]:
+    t = _totals(buckets)
+    return {
+        "totalJobs": t["count"],
+        "averagePrice": t["total"] / t["count"] if t["count"] else 0,
+        "priceRange": {"min": t["min"] or 0, "max": t["max"] or 0},
+        "categoryDistribution": category_distribution(buckets),
+        "areaDistribution": area_counts(buckets),
+        "timeDistribution": {int(h): n for h, n in sorted(t["hours"].items(), key=lambda kv: int(kv[0]))},
+    }
+
+
+def intensity(price: float) -> float:
+    if price >= 2000:
+        return 1.0
+    if price >= 1000:
+        return 0.8
+    if price >= 500:
+        return 0.6
+    if price >= 200:
+        return 0.4
+    return 0.2
+
+
+def points(buckets: list[dict[str, Any]], limit: int) -> list[dict[str, Any]]:
+    """One map point per located bucket, busiest first, styled by its dominant category"""
+    out = []
+    for b in buckets:
+        if b.get("lat") is None:
+            continue
+        t = _totals([b])
+        top = max(b["categories"].items(), key=lambda kv: kv[1].get("count", 0))[0]
+        average = t["total"] / t["count"] if t["count"] else 0
+        out.append({
+            "id": b["key"],
+            "cell": b["cell"],
+            "coordinates": {"latitude": b["lat"], "longitude": b["lng"]},
+            "count": t["count"],
+            "category": top,
+            "categories": {cat: c["count"] for cat, c in b["categories"].items()},
+            "price": average,
+            "intensity": intensity(average),
+            "color": JOB_CATEGORIES[top]["color"],
+            "icon": JOB_CATEGORIES[top]["icon"],
+            "area": b.get("area"),
+            "district": b.get("district"),
+        })
+    out.sort(key=lambda p: p["count"], reverse=True)
+    return out[:limit]
+
+
+def area_density(buckets: list[dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    by_area: dict[str, list] = {area: [] for area in KENYA_AREAS}
+    for b in buckets:
+        if b.get("area") in by_area:
+            by_area[b["area"]].append(b)
+    out = {}
+    for area, data in KENYA_AREAS.items():
+        t = _totals(by_area[area])
+        out[area] = {
+            "totalJobs": t["count"],
+            "averagePrice": t["total"] / t["count"] if t["count"] else 0,
+            "categories": category_distribution(by_area[area]),
+            "coordinates": data["coordinates"],
+            "districts": data["districts"],
+        }
+    return out
@@ -0,0 +1,98 @@
+from __future__ import annotations
+import secrets
+import threading
+import time
+from typing import Optional
+from datetime import datetime, timezone
+from ..config import settings
+
+
+# Crockford base32: no I, L, O or U, and sorts the same as the numbers it encodes
+_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_DECODE = {c: i for i, c in enumerate(_ALPHABET)}
+_LENGTH = 26  # 130 bits, top two always zero
+
+_WORKER_BITS = 16
+_SEQUENCE_BITS = 64
+_TIME_SHIFT = _WORKER_BITS + _SEQUENCE_BITS
+
+
+def _encode(value: int) -> str:
+    out = []
+    for _ in range(_LENGTH):
+        out.append(_ALPHABET[value & 31])
+        value >>= 5
+    return "".join(reversed(out))
+
+
+def _decode(text: str) -> int:
+    value = 0
+    for c in text.upper():
+        value = value << 5 | _DECODE[c]
+    return value
+
+
+class IdGenerator:
+    """ULID-layout document IDs: 48-bit ms timestamp, 16-bit worker id, 64-bit sequence.
+
+    IDs sort by creation time, so a document-id range scan replaces an
+    order_by("createdAt"). Within a worker they are strictly increasing: a
+    second ID in the same millisecond (or after the clock steps back) bumps
+    the sequence, which starts each millisecond at a random value. Distinct
+    worker ids make IDs from different processes collision-free; without one
+    a random worker id is drawn, leaving collisions to ~2^-79 odds.
+    """
+
+    def __init__(self, worker_id: Optional[int] = None):
+        if worker_id is None:
+            worker_id = secrets.randbits(_WORKER_BITS)
+        if not 0 <= worker_id < 1 << _WORKER_BITS:
+            raise ValueError(f"worker_id must be in [0, {1 << _WORKER_BITS})")
+        self.worker_id = worker_id
+        self._last_ms = 0
+        self._sequence = 0
+        # Repos are also called from threads (sync scripts, to_thread helpers)
+        self._lock = threading.Lock()
+
+    def _next(self) -> tuple[int, int]:
+        with self._lock:
+            ms = int(time.time() * 1000)
+            if ms > self._last_ms:
+                # Leave the top bit free so same-millisecond bumps can't overflow
+                self._last_ms, self._sequence = ms, secrets.randbits(_SEQUENCE_BITS - 1)
+            else:
+                self._sequence += 1
+                if self._sequence >> _SEQUENCE_BITS:
+                    self._last_ms, self._sequence = self._last_ms + 1, 0
+            return self._last_ms, self._sequence
+
+    def new(self, prefix: Optional[str] = None) -> str:
+        ms, sequence = self._next()
+        ulid = _encode(ms << _TIME_SHIFT | self.worker_id << _SEQUENCE_BITS | sequence)
+        return f"{prefix}_{ulid}" if prefix else ulid
+
+
+ids = IdGenerator(settings.worker_id)
+
+
+def new_id(prefix: Optional[str] = None) -> str:
+    """A new time-ordered document ID, e.g. new_id("JOB") -> "JOB_01JAB3..." """
+    return ids.new(prefix)
+
+
+def id_time(doc_id: str) -> datetime:
+    """Creation time encoded in an ID from new_id (prefixed or not)"""
+    ulid = doc_id.rsplit("_", 1)[-1]
+    if len(ulid) != _LENGTH:
+        raise ValueError(f"Not a generated ID: {doc_id!r}")
+    return datetime.fromtimestamp((_decode(ulid) >> _TIME_SHIFT) / 1000, tz=timezone.utc)
+
+
+def id_bounds(prefix: Optional[str], start: Optional[datetime] = None, end: Optional[datetime] = None) -> tuple[str, str]:
+    """[low, high) document IDs covering IDs created in [start, end), for
+    where(FieldPath.document_id(), ">=", low).where(FieldPath.document_id(), "<", high)"""
+    def at(when: Optional[datetime], default_ms: int) -> str:
+        ms = int(when.timestamp() * 1000) if when is not None else default_ms
+        ulid = _encode(ms << _TIME_SHIFT)
+        return f"{prefix}_{ulid}" if prefix else ulid
+    return at(start, 0), at(end, (1 << 48) - 1)
@@ -0,0 +1,370 @@
+from __future__ import annotations
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import re
+import unicodedata
+from typing import Any, Optional
+from datetime import datetime, timedelta, timezone
+from .firebase import get_async_db
+from .geo import match_place
+from .heatmap import _price, job_geo, job_time
+from ..config import settings
+
+
+# Field weights: a match in the title counts for more than one in the description
+FIELD_WEIGHTS = {"title": 3.0, "skills": 2.0, "category": 2.0, "location": 1.5, "description": 1.0}
+
+STOPWORDS = {
+    # English
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it", "of", "on", "or",
+    "the", "to", "with", "need", "needed", "looking", "job", "jobs", "work",
+    # Swahili
+    "na", "ya", "wa", "za", "la", "cha", "vya", "kwa", "katika", "ni", "au", "kazi", "hii", "hiyo",
+    "huu", "yangu", "wangu", "tafadhali", "nina", "ninahitaji", "nahitaji", "anahitajika",
+}
+
+# Common Swahili gig vocabulary mapped onto the English term it should match
+SYNONYMS = {
+    "usafi": "clean", "safisha": "clean", "kusafisha": "clean", "msafishaji": "cleaner", "wasafishaji": "cleaner",
+    "fua": "laundry", "kufua": "laundry", "nguo": "laundry", "dobi": "laundry",
+    "dereva": "driver", "madereva": "driver", "pikipiki": "boda", "bodaboda": "boda",
+    "usafirishaji": "delivery", "kusafirisha": "delivery", "mzigo": "parcel", "mizigo": "parcel",
+    "ujenzi": "construction", "kujenga": "construction", "mjenzi": "builder", "wajenzi": "builder", "fundi": "technician",
+    "bustani": "garden", "shamba": "farm", "kulima": "farm",
+    "kupika": "cook", "mpishi": "cook", "wapishi": "cook",
+    "mlinzi": "guard", "walinzi": "guard", "ulinzi": "security",
+    "rangi": "paint", "kupaka": "paint", "mabomba": "plumbing", "bomba": "plumbing", "umeme": "electrical",
+}
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_VOWELS = set("aeiou")
+_K1, _B = 1.2, 0.75
+
+
+def _fold(text: str) -> str:
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().lower()
+
+
+def _english(word: str) -> Optional[str]:
+    """Light suffix stripping (cleaning/cleaner/cleans -> clean); None when no rule applies"""
+    for suffix, repl, min_len in (("ies", "y", 5), ("ing", "", 6), ("ers", "", 5), ("er", "", 5), ("ed", "", 5), ("es", "e", 5)):
+        if word.endswith(suffix) and len(word) >= min_len:
+            return word[: -len(suffix)] + repl
+    if word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+        return word[:-1]
+    return None
+
+
+def _swahili(word: str) -> str:
+    """Strip the infinitive ku-, plural/person noun-class prefixes and the agentive -aji (kusafisha, wasafishaji -> safisha)"""
+    if word.startswith("ku") and len(word) > 5:
+        word = word[2:]
+    else:
+        for prefix in ("wa", "ma", "mw", "m"):
+            rest = word[len(prefix):]
+            if word.startswith(prefix) and len(rest) >= 4 and rest[0] not in _VOWELS:
+                word = rest
+                break
+    if word.endswith("aji") and len(word) > 6:
+        word = word[:-2]
+    return word
+
+
+def normalize(word: str) -> str:
+    word = SYNONYMS.get(word, word)
+    stemmed = _english(word)
+    if stemmed is not None:
+        return stemmed.rstrip("e") or stemmed
+    word = _swahili(word)
+    word = SYNONYMS.get(word, word)
+    return (_english(word) or word).rstrip("e") or word
+
+
+def tokenize(text: Any) -> list[str]:
+    """Normalized search terms in `text`, stopwords dropped"""
+    if not text:
+        return []
+    if isinstance(text, (list, tuple)):
+        text = " ".join(str(t) for t in text if t)
+    return [normalize(w) for w in _TOKEN.findall(_fold(str(text))) if w not in STOPWORDS and len(w) > 1]
+
+
+def _job_terms(job: dict[str, Any]) -> dict[str, float]:
+    location = job.get("location")
+    address = location.get("address") if isinstance(location, dict) else location
+    geo = job_geo(job)
+    fields = {
+        "title": job.get("title"),
+        "description": job.get("description"),
+        "skills": job.get("skills"),
+        "category": job.get("category"),
+        "location": [address, geo.get("area"), geo.get("district")],
+    }
+    terms: dict[str, float] = {}
+    for field, text in fields.items():
+        for term in tokenize(text):
+            terms[term] = terms.get(term, 0.0) + FIELD_WEIGHTS[field]
+    return terms
+
+
+def _digest(job_id: str, terms: dict[str, float], meta: dict[str, Any]) -> int:
+    """Process-independent 64-bit hash of what a job contributes to the index"""
+    raw = json.dumps([job_id, terms, meta], sort_keys=True, default=str).encode()
+    return int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), "big")
+
+
+def _encode_cursor(generation: str, key: tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps([generation, *key]).encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[str, tuple]:
+    """Inverse of _encode_cursor: (generation, sort key). Raises ValueError for malformed tokens."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    # [generation, -score, -created, job id], as built by search()
+    if (not isinstance(key, list) or len(key) != 4 or not isinstance(key[0], str) or not isinstance(key[3], str)
+            or any(isinstance(v, bool) or not isinstance(v, (int, float)) for v in key[1:3])):
+        raise ValueError("Invalid cursor")
+    return key[0], tuple(key[1:])
+
+
+class JobSearchIndex:
+    """In-process inverted index over active jobs for ranked, filtered search.
+
+    Terms come from the title, description, skills, category and location
+    (English and Swahili normalized), weighted per field and ranked with BM25.
+    The index is rebuilt from Firestore on startup, updated directly by
+    writes in this worker, and catches up with other workers' writes by
+    polling for jobs whose updatedAt moved past the last one seen.
+    Mutations never span an await, so the event loop is the only lock needed.
+
+    BM25 scores depend on the whole index (job count, average length), so
+    `generation` fingerprints its contents: an XOR of per-job digests, equal
+    on every worker holding the same jobs. Search cursors carry it and are
+    rejected once it changes, rather than paging on shifted scores.
+    """
+
+    def __init__(self):
+        self._postings: dict[str, dict[str, float]] = {}
+        self._terms: dict[str, dict[str, float]] = {}
+        self._meta: dict[str, dict[str, Any]] = {}
+        self._total_length = 0.0
+        self._fingerprint = 0
+        self._watermark: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self.ready = False
+        self.searches = 0
+        self.refreshes = 0
+
+    def __len__(self) -> int:
+        return len(self._meta)
+
+    @property
+    def generation(self) -> str:
+        return f"{self._fingerprint:016x}"
+
+    def upsert(self, job_id: str, job: dict[str, Any]) -> None:
+        """Index (or re-index) a job; jobs that are no longer active are dropped"""
+        self.remove(job_id)
+        if job.get("status") != "active":
+            return
+        terms = _job_terms(job)
+        geo = job_geo(job)
+        location = job.get("location")
+        address = location.get("address") if isinstance(location, dict) else location
+        self._terms[job_id] = terms
+        self._meta[job_id] = {
+            "category": job.get("category"),
+            "urgency": job.get("urgency"),
+            "price": _price(job),
+            "area": geo.get("area"),
+            "district": geo.get("district"),
+            "address": _fold(str(address or "")),
+            "created": job_time(job).timestamp(),
+            "length": sum(terms.values()),
+        }
+        self._meta[job_id]["digest"] = _digest(job_id, terms, self._meta[job_id])
+        self._fingerprint ^= self._meta[job_id]["digest"]
+        self._total_length += self._meta[job_id]["length"]
+        for term, weight in terms.items():
+            self._postings.setdefault(term, {})[job_id] = weight
+
+    def remove(self, job_id: str) -> None:
+        terms = self._terms.pop(job_id, None)
+        if terms is None:
+            return
+        meta = self._meta.pop(job_id)
+        self._total_length -= meta["length"]
+        self._fingerprint ^= meta["digest"]
+        for term in terms:
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(job_id, None)
+                if not posting:
+                    del self._postings[term]
+
+    def _matches(self, meta: dict[str, Any], category, urgency, min_price, max_price, place) -> bool:
+        if category and meta["category"] != category:
+            return False
+        if urgency and meta["urgency"] != urgency:
+            return False
+        if min_price is not None and meta["price"] < min_price:
+            return False
+        if max_price is not None and meta["price"] > max_price:
+            return False
+        if place is not None:
+            area, district, needle = place
+            if area is not None:
+                return meta["area"] == area and (district is None or meta["district"] == district)
+            return needle in meta["address"]
+        return True
+
+    def _scores(self, terms: list[str]) -> dict[str, float]:
+        """BM25 scores for jobs containing every term, or any term when none contain them all"""
+        postings = [self._postings.get(t, {}) for t in dict.fromkeys(terms)]
+        if not any(postings):
+            return {}
+        by_size = sorted(postings, key=len)
+        candidates = set(by_size[0]).intersection(*by_size[1:]) if by_size[0] else set()
+        if not candidates:
+            candidates = set().union(*postings)
+        n = len(self._meta)
+        avg = self._total_length / n if n else 1.0
+        scores: dict[str, float] = {}
+        for posting in postings:
+            if not posting:
+                continue
+            idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for job_id in candidates.intersection(posting):
+                w = posting[job_id]
+                norm = 1 - _B + _B * self._meta[job_id]["length"] / avg
+                scores[job_id] = scores.get(job_id, 0.0) + idf * w * (_K1 + 1) / (w + _K1 * norm)
+        return scores
+
+    def search(self, q: Optional[str] = None, *, category: Optional[str] = None, urgency: Optional[str] = None,
+               location: Optional[str] = None, min_price: Optional[float] = None, max_price: Optional[float] = None,
+               limit: int = 20, cursor: Optional[str] = None, offset: int = 0) -> dict[str, Any]:
+        """One page of matching job ids, best match first (newest first without a query).
+
+        `cursor` is the nextCursor of the previous page; ValueError if it is malformed or
+        the index has changed since it was issued (start again from the first page).
+        `offset` is only used when no cursor is given.
+        """
+        self.searches += 1
+        terms = tokenize(q)
+        if terms:
+            scores = self._scores(terms)
+            ids = scores.keys()
+        else:
+            scores = {}
+            ids = self._meta.keys()
+        place = None
+        if location:
+            area, district = match_place(location)
+            place = (area, district, _fold(location))
+
+        def sort_key(job_id):
+            return (-round(scores.get(job_id, 0.0), 9), -self._meta[job_id]["created"], job_id)
+
+        hits = sorted((sort_key(j) for j in ids if self._matches(self._meta[j], category, urgency, min_price, max_price, place)))
+        start = 0
+        after = None
+        if cursor:
+            generation, after = _decode_cursor(cursor)
+            if generation != self.generation:
+                raise ValueError("Cursor expired: search results have changed, start again from the first page")
+        if after is not None:
+            # First key strictly after the cursor
+            lo, hi = 0, len(hits)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if hits[mid] <= after:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            start = lo
+        elif offset:
+            start = offset
+        page = hits[start:start + limit]
+        has_more = start + limit < len(hits)
+        return {
+            "ids": [key[2] for key in page],
+            "total": len(hits),
+            "hasMore": has_more,
+            "nextCursor": _encode_cursor(self.generation, page[-1]) if has_more and page else None,
+        }
+
+    async def rebuild(self) -> int:
+        """Replace the index with every active job in Firestore"""
+        fresh = JobSearchIndex()
+        latest = None
+        async for doc in get_async_db().collection("jobs").where("status", "==", "active").stream():
+            job = doc.to_dict() or {}
+            fresh.upsert(doc.id, job)
+            updated = job.get("updatedAt")
+            if isinstance(updated, datetime) and (latest is None or updated > latest):
+                latest = updated
+        self._postings, self._terms, self._meta = fresh._postings, fresh._terms, fresh._meta
+        self._total_length = fresh._total_length
+        self._fingerprint = fresh._fingerprint
+        self._watermark = latest or datetime.now(timezone.utc) - timedelta(seconds=settings.job_search_refresh_seconds)
+        self.ready = True
+        return len(self._meta)
+
+    async def refresh(self) -> int:
+        """Apply jobs written since the last one seen (by any worker); returns how many"""
+        if self._watermark is None:
+            return await self.rebuild()
+        # Re-read a little before the watermark: equal timestamps and late commits are cheap to re-apply
+        since = self._watermark - timedelta(seconds=1)
+        changed = 0
+        async for doc in get_async_db().collection("jobs").where("updatedAt", ">", since).stream():
+            job = doc.to_dict() or {}
+            self.upsert(doc.id, job)
+            updated = job.get("updatedAt")
+            if isinstance(updated, datetime) and updated > self._watermark:
+                self._watermark = updated
+            changed += 1
+        self.refreshes += 1
+        return changed
+
+    async def _poll(self) -> None:
+        while True:
+            await asyncio.sleep(settings.job_search_refresh_seconds)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"[WARNING] Job search refresh failed: {e}")
+
+    async def start(self) -> None:
+        """Build the index and keep it in sync in the background"""
+        try:
+            count = await self.rebuild()
+            print(f"[INFO] Job search index built: {count} active jobs")
+        except Exception as e:
+            print(f"[WARNING] Job search index build failed, falling back to Firestore scans: {e}")
+        if self._task is None and settings.job_search_refresh_seconds > 0:
+            self._task = asyncio.get_running_loop().create_task(self._poll())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "jobs": len(self._meta),
+            "generation": self.generation,
+            "terms": len(self._postings),
+            "searches": self.searches,
+            "refreshes": self.refreshes,
+        }
+
+
+job_index = JobSearchIndex()
@@ -0,0 +1,265 @@
+from __future__ import annotations
+from typing import Any, Optional
+import random
+from datetime import datetime, timezone
+from firebase_admin import firestore
+from google.api_core.exceptions import AlreadyExists
+from .firebase import get_async_db
+from .unit_of_work import UnitOfWork
+
+
+# Transaction types by direction of money relative to the user's wallet
+IN_TYPES = {"deposit", "transfer_in", "convert_in", "airtime_cashback", "refund"}
+OUT_TYPES = {"withdraw", "transfer_out", "convert_out", "payment", "bill"}
+SUCCESS_STATUSES = {"success", "completed", "complete", "ok"}
+
+# Write a balance snapshot for an account every N journal lines
+SNAPSHOT_EVERY = 100
+
+# Counter-accounts every wallet posts against (e.g. external:mpesa) are spread
+# over this many documents so they aren't a single-document write hotspot
+SHARDED_PREFIXES = ("external:",)
+ACCOUNT_SHARDS = 8
+
+
+def tx_direction(tx_type: Optional[str]) -> Optional[str]:
+    if not tx_type:
+        return None
+    t = str(tx_type).lower()
+    if t in IN_TYPES:
+        return "in"
+    if t in OUT_TYPES:
+        return "out"
+    # Heuristic fallback
+    if "deposit" in t or "in" in t:
+        return "in"
+    if "withdraw" in t or "out" in t or "payment" in t:
+        return "out"
+    return None
+
+
+def as_utc(at: datetime | str) -> datetime:
+    """Aware UTC datetime for a datetime or ISO-8601 string; naive values are taken as UTC"""
+    if isinstance(at, str):
+        at = datetime.fromisoformat(at.replace("Z", "+00:00"))
+    return at.astimezone(timezone.utc) if at.tzinfo else at.replace(tzinfo=timezone.utc)
+
+
+def wallet_account(user_id: str) -> str:
+    return f"wallet:{user_id}"
+
+
+def slots(account: str) -> list[str]:
+    """Account documents holding an account's balance: the account itself, or its shards"""
+    if account.startswith(SHARDED_PREFIXES):
+        return [f"{account}#{n}" for n in range(ACCOUNT_SHARDS)]
+    return [account]
+
+
+def balance_diffs(wallet_balances: dict[str, Any], ledger_balances: dict[str, Any]) -> dict[str, float]:
+    """Per-currency wallet minus ledger balance (non-zero only)"""
+    diffs = {}
+    for cur in set(ledger_balances) | set(wallet_balances):
+        diff = float(wallet_balances.get(cur, 0) or 0) - float(ledger_balances.get(cur, 0) or 0)
+        if abs(diff) > 1e-9:
+            diffs[cur] = diff
+    return diffs
+
+
+class Ledger:
+    """Double-entry ledger.
+
+    Every movement is an append-only entry in `ledger_entries` whose postings
+    sum to zero per currency, plus one `ledger_lines` document per posting for
+    per-account replay. `ledger_accounts` holds balances materialized with
+    Increment in the same batch as the entry; counter-accounts are split over
+    ACCOUNT_SHARDS slot documents (see slots()) and each line records the slot
+    it landed in. `ledger_snapshots` holds periodic per-slot copies of those
+    balances so historical queries replay about SNAPSHOT_EVERY lines.
+
+    Lines and slot documents are stamped with the commit time (SERVER_TIMESTAMP)
+    in the same batch, so a slot's `updatedAt` is exactly the point up to which
+    its lines are included in its balances, independent of any server's clock.
+    """
+
+    @staticmethod
+    def entries_col():
+        return get_async_db().collection("ledger_entries")
+
+    @staticmethod
+    def lines_col():
+        return get_async_db().collection("ledger_lines")
+
+    @staticmethod
+    def accounts_col():
+        return get_async_db().collection("ledger_accounts")
+
+    @staticmethod
+    def snapshots_col():
+        return get_async_db().collection("ledger_snapshots")
+
+    @staticmethod
+    async def post(entry_id: str, postings: list[dict[str, Any]], description: str | None = None,
+                   transaction_id: str | None = None, uow: Optional[UnitOfWork] = None) -> Optional[dict[str, Any]]:
+        """Append a balanced entry and materialize it, in `uow` if given.
+
+        Returns None if entry_id was already posted (when this opens its own
+        unit of work; otherwise the caller's commit raises AlreadyExists).
+        """
+        if uow is None:
+            try:
+                async with UnitOfWork() as uow:
+                    return await Ledger.post(entry_id, postings, description, transaction_id, uow)
+            except AlreadyExists:
+                return None
+
+        totals: dict[str, float] = {}
+        for p in postings:
+            totals[p["currency"]] = totals.get(p["currency"], 0.0) + float(p["amount"])
+        if any(abs(v) > 1e-9 for v in totals.values()):
+            raise ValueError(f"Unbalanced ledger entry {entry_id}: {totals}")
+
+        entry = {
+            "entryId": entry_id,
+            "transactionId": transaction_id,
+            "description": description,
+            "postings": postings,
+            "accounts": sorted({p["account"] for p in postings}),
+            "createdAt": firestore.SERVER_TIMESTAMP,
+        }
+        deltas: dict[str, dict[str, float]] = {}
+        line_counts: dict[str, int] = {}
+        line_slots: list[str] = []
+        for p in postings:
+            slot = random.choice(slots(p["account"]))
+            line_slots.append(slot)
+            slot_deltas = deltas.setdefault(slot, {})
+            slot_deltas[p["currency"]] = slot_deltas.get(p["currency"], 0.0) + float(p["amount"])
+            line_counts[slot] = line_counts.get(slot, 0) + 1
+        current = await Ledger._accounts(list(deltas))
+
+        # Entry, lines and materialized balances land together or not at all
+        uow.create(Ledger.entries_col().document(entry_id), entry)
+        for i, (p, slot) in enumerate(zip(postings, line_slots)):
+            uow.set(Ledger.lines_col().document(f"{entry_id}_{i}"), {
+                "entryId": entry_id,
+                "account": p["account"],
+                "slot": slot,
+                "currency": p["currency"],
+                "amount": float(p["amount"]),
+                "createdAt": firestore.SERVER_TIMESTAMP,
+            })
+        for slot, slot_deltas in deltas.items():
+            uow.set(Ledger.accounts_col().document(slot), {
+                "account": slot.split("#", 1)[0],
+                "slot": slot,
+                "balances": {cur: firestore.Increment(d) for cur, d in slot_deltas.items()},
+                "lineCount": firestore.Increment(line_counts[slot]),
+                "updatedAt": firestore.SERVER_TIMESTAMP,
+            }, merge=True)
+            if Ledger._snapshot_due(current.get(slot), line_counts[slot]):
+                uow.after_commit(lambda slot=slot: Ledger.write_snapshot(slot))
+        return entry
+
+    @staticmethod
+    async def _accounts(account_slots: list[str]) -> dict[str, dict[str, Any]]:
+        """Current account (slot) documents, read in one round-trip"""
+        refs = [Ledger.accounts_col().document(a) for a in account_slots]
+        found = {}
+        async for snap in get_async_db().get_all(refs):
+            if snap.exists:
+                found[snap.id] = snap.to_dict() or {}
+        return found
+
+    @staticmethod
+    def _snapshot_due(account: Optional[dict[str, Any]], new_lines: int) -> bool:
+        """Whether a slot reaches SNAPSHOT_EVERY lines past its last snapshot with this posting.
+
+        Counted from the last snapshot rather than from multiples of the line
+        count, so a posting that raced past a threshold is caught by the next one.
+        """
+        account = account or {}
+        since = int(account.get("lineCount", 0)) - int(account.get("snapshotLine", 0))
+        return since + new_lines >= SNAPSHOT_EVERY
+
+    @staticmethod
+    async def record_transaction(txn: dict[str, Any], uow: Optional[UnitOfWork] = None) -> Optional[dict[str, Any]]:
+        """Post a completed wallet transaction against its external counter-account"""
+        direction = tx_direction(txn.get("type"))
+        if direction is None or str(txn.get("status") or "").lower() not in SUCCESS_STATUSES:
+            return None
+        try:
+            amount = abs(float(txn.get("amount") or 0))
+        except (TypeError, ValueError):
+            return None
+        if not amount or not txn.get("userId"):
+            return None
+        currency = str(txn.get("currencyCode") or "KES")
+        counter = f"external:{txn.get('paymentMethod') or txn.get('method') or txn.get('type')}"
+        sign = 1 if direction == "in" else -1
+        postings = [
+            {"account": wallet_account(txn["userId"]), "currency": currency, "amount": sign * amount},
+            {"account": counter, "currency": currency, "amount": -sign * amount},
+        ]
+        return await Ledger.post(f"LE_{txn['transactionId']}", postings, txn.get("description"), txn["transactionId"], uow)
+
+    @staticmethod
+    async def balance(account: str) -> dict[str, float]:
+        """Current materialized balances for an account, summed over its slots"""
+        balances: dict[str, float] = {}
+        for doc in (await Ledger._accounts(slots(account))).values():
+            for cur, amount in (doc.get("balances") or {}).items():
+                balances[cur] = balances.get(cur, 0.0) + float(amount)
+        return balances
+
+    @staticmethod
+    async def _replay(slot: str, until: datetime) -> dict[str, float]:
+        """Start from the slot's latest snapshot at or before `until` and add the lines committed after it"""
+        q = Ledger.snapshots_col().where("slot", "==", slot).where("at", "<=", until)
+        snaps = await q.order_by("at", direction="DESCENDING").limit(1).get()
+        balances: dict[str, float] = {}
+        lines = Ledger.lines_col().where("slot", "==", slot)
+        if snaps:
+            snap = snaps[0].to_dict() or {}
+            balances = dict(snap.get("balances", {}))
+            lines = lines.where("createdAt", ">", snap["at"])
+        lines = lines.where("createdAt", "<=", until)
+        async for d in lines.stream():
+            line = d.to_dict() or {}
+            cur = line.get("currency", "KES")
+            balances[cur] = balances.get(cur, 0.0) + float(line.get("amount", 0))
+        return balances
+
+    @staticmethod
+    async def balance_at(account: str, at: datetime | str) -> dict[str, float]:
+        """Balances as of a point in time, replayed per slot from the nearest earlier snapshot"""
+        until = as_utc(at)
+        balances: dict[str, float] = {}
+        for slot in slots(account):
+            for cur, amount in (await Ledger._replay(slot, until)).items():
+                balances[cur] = balances.get(cur, 0.0) + amount
+        return balances
+
+    @staticmethod
+    async def write_snapshot(slot: str) -> Optional[dict[str, Any]]:
+        """Copy a slot's materialized balances; its updatedAt is the commit time they are exact for"""
+        doc = await Ledger.accounts_col().document(slot).get()
+        if not doc.exists:
+            return None
+        current = doc.to_dict() or {}
+        line_count = int(current.get("lineCount", 0))
+        snap = {
+            "account": current.get("account"),
+            "slot": slot,
+            "at": current.get("updatedAt"),
+            "balances": current.get("balances", {}),
+            "lineCount": line_count,
+        }
+        await Ledger.snapshots_col().document(f"{slot}_{line_count:012d}").set(snap)
+        await Ledger.accounts_col().document(slot).set({"snapshotLine": firestore.Maximum(line_count)}, merge=True)
+        return snap
+
+    @staticmethod
+    async def reconcile_wallet(user_id: str, wallet_balances: dict[str, Any]) -> dict[str, float]:
+        """Per-currency difference between a wallet document and its ledger account (non-zero only)"""
+        return balance_diffs(wallet_balances, await Ledger.balance(wallet_account(user_id)))
@@ -1,8 +1,258 @@
 """
 Mock database for development/testing when Firebase is unavailable
 """
-from typing import Dict, Any, Optional, List
-from datetime import datetime
+from typing import Dict, Any, Optional, List, Iterable, Set, Tuple
+from datetime import datetime, timezone
+from bisect import bisect_left, insort
+from functools import cmp_to_key
+from contextlib import nullcontext
+import copy
+import heapq
+import threading
+
+try:
+    from google.cloud.firestore_v1.transforms import Increment, Maximum, Minimum, SERVER_TIMESTAMP, DELETE_FIELD
+    from google.api_core.exceptions import NotFound, AlreadyExists, Aborted
+except ImportError:  # the mock also runs without the Firestore SDK installed
+    Increment = Maximum = Minimum = None
+    SERVER_TIMESTAMP = object()
+    DELETE_FIELD = object()
+    NotFound = AlreadyExists = LookupError
+    Aborted = RuntimeError
+
+
+# Fields kept in a hash index for every collection (login, USSD, wallet and ledger lookups)
+INDEXED_FIELDS = ("email", "phoneNumber", "userId", "status", "account")
+
+# Above this many index candidates an ordered + limited query walks the sorted index instead
+SORT_CANDIDATES_THRESHOLD = 256
+
+# Documents are locked through a fixed pool of striped locks
+LOCK_STRIPES = 64
+
+# Attempts run_transaction makes before giving up on a contended transaction (as the SDK does)
+TRANSACTION_ATTEMPTS = 5
+
+# Field path Firestore uses for the document id (FieldPath.document_id())
+DOCUMENT_ID = "__name__"
+
+_MISSING = object()
+
+
+def _is_hashable(value: Any) -> bool:
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+def _get_field(doc_data: Dict[str, Any], path: str) -> Any:
+    """Read a (possibly dotted) field path, returning _MISSING when absent"""
+    if path in doc_data:
+        return doc_data[path]
+    value: Any = doc_data
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _transform(old_value: Any, value: Any) -> Any:
+    """Resolve Firestore write transforms (Increment, Maximum, SERVER_TIMESTAMP...) against the stored value"""
+    numeric = isinstance(old_value, (int, float)) and not isinstance(old_value, bool)
+    if Increment is not None and isinstance(value, Increment):
+        return (old_value if numeric else 0) + value.value
+    if Maximum is not None and isinstance(value, Maximum):
+        return max(old_value, value.value) if numeric else value.value
+    if Minimum is not None and isinstance(value, Minimum):
+        return min(old_value, value.value) if numeric else value.value
+    if value is SERVER_TIMESTAMP:
+        return datetime.now(timezone.utc)
+    return value
+
+
+def _set_path(doc_data: Dict[str, Any], path: List[str], value: Any) -> None:
+    """Write a nested field, copying intermediate maps so stored snapshots are never mutated"""
+    target = doc_data
+    for part in path[:-1]:
+        child = target.get(part)
+        child = dict(child) if isinstance(child, dict) else {}
+        target[part] = child
+        target = child
+    if value is DELETE_FIELD:
+        target.pop(path[-1], None)
+    elif isinstance(value, dict):
+        child: Dict[str, Any] = {}
+        _merge(child, value)
+        target[path[-1]] = child
+    else:
+        target[path[-1]] = _transform(target.get(path[-1]), value)
+
+
+def _merge(doc_data: Dict[str, Any], data: Dict[str, Any]) -> None:
+    """Copy data into doc_data; nested maps are merged (set(merge=True) semantics)"""
+    for key, value in data.items():
+        if isinstance(value, dict):
+            child = dict(doc_data[key]) if isinstance(doc_data.get(key), dict) else {}
+            _merge(child, value)
+            doc_data[key] = child
+        else:
+            _set_path(doc_data, [key], list(value) if isinstance(value, list) else value)
+
+
+def _order_key(value: Any) -> Tuple:
+    """Cross-type ordering key following Firestore's type order"""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return (3, value.timestamp())
+    if isinstance(value, str):
+        return (4, value)
+    if isinstance(value, bytes):
+        return (5, value)
+    if isinstance(value, MockDocument):
+        return (6, value.doc_id)
+    if isinstance(value, (list, tuple)):
+        return (7, tuple(_order_key(v) for v in value))
+    if isinstance(value, dict):
+        return (8, tuple((k, _order_key(v)) for k, v in sorted(value.items())))
+    return (9, str(value))
+
+
+def _compare(a: List[Tuple], b: List[Tuple], directions: List[str]) -> int:
+    """Compare two key lists field by field, honouring per-field direction"""
+    for x, y, direction in zip(a, b, directions):
+        if x == y:
+            continue
+        result = -1 if x < y else 1
+        return -result if direction == MockQuery.DESCENDING else result
+    return 0
+
+
+class MockSortedIndex:
+    """Sorted (order key, document id) entries for one field"""
+    
+    def __init__(self, field: str):
+        self.field = field
+        self.entries: List[Tuple[Tuple, str]] = []
+    
+    def add(self, doc_id: str, doc_data: Dict[str, Any]) -> None:
+        value = _get_field(doc_data, self.field)
+        if value is not _MISSING:
+            insort(self.entries, (_order_key(value), doc_id))
+    
+    def remove(self, doc_id: str, doc_data: Dict[str, Any]) -> None:
+        value = _get_field(doc_data, self.field)
+        if value is _MISSING:
+            return
+        entry = (_order_key(value), doc_id)
+        pos = bisect_left(self.entries, entry)
+        if pos < len(self.entries) and self.entries[pos] == entry:
+            del self.entries[pos]
+    
+    def walk(self, direction: str, start_key: Optional[Tuple] = None):
+        """Yield document ids in order, optionally starting at a primary key"""
+        if direction == MockQuery.DESCENDING:
+            end = len(self.entries)
+            if start_key is not None:
+                # First entry whose key is greater than start_key
+                end = bisect_left(self.entries, (start_key, chr(0x10FFFF)))
+            for pos in range(end - 1, -1, -1):
+                yield self.entries[pos][1]
+        else:
+            start = 0
+            if start_key is not None:
+                start = bisect_left(self.entries, (start_key, ""))
+            for pos in range(start, len(self.entries)):
+                yield self.entries[pos][1]
+
+
+class MockIndex:
+    """Per-collection hash index: field -> value -> set of document ids"""
+    
+    def __init__(self, fields: Iterable[str]):
+        self.entries: Dict[str, Dict[Any, Set[str]]] = {field: {} for field in fields}
+        self.sorted: Dict[str, MockSortedIndex] = {}
+    
+    def covers(self, field: str) -> bool:
+        """Check if a field is indexed"""
+        return field in self.entries
+    
+    def add_field(self, field: str, data: Dict[str, Dict[str, Any]]) -> None:
+        """Start indexing a field, backfilling from existing documents"""
+        if field in self.entries:
+            return
+        self.entries[field] = {}
+        for doc_id, doc_data in data.items():
+            self._add_value(field, doc_id, doc_data)
+    
+    def sorted_index(self, field: str, data: Dict[str, Dict[str, Any]]) -> MockSortedIndex:
+        """Get (building on first use) the sorted index for an order_by field"""
+        if field not in self.sorted:
+            index = MockSortedIndex(field)
+            index.entries = sorted(
+                (_order_key(value), doc_id)
+                for doc_id, doc_data in data.items()
+                for value in [_get_field(doc_data, field)]
+                if value is not _MISSING
+            )
+            self.sorted[field] = index
+        return self.sorted[field]
+    
+    def add(self, doc_id: str, doc_data: Dict[str, Any]) -> None:
+        """Index a document"""
+        for field in self.entries:
+            self._add_value(field, doc_id, doc_data)
+        for index in self.sorted.values():
+            index.add(doc_id, doc_data)
+    
+    def remove(self, doc_id: str, doc_data: Dict[str, Any]) -> None:
+        """Drop a document from the index"""
+        for field, buckets in self.entries.items():
+            value = doc_data.get(field)
+            if field not in doc_data or not _is_hashable(value):
+                continue
+            ids = buckets.get(value)
+            if ids is None:
+                continue
+            ids.discard(doc_id)
+            if not ids:
+                del buckets[value]
+        for index in self.sorted.values():
+            index.remove(doc_id, doc_data)
+    
+    def lookup(self, field: str, op: str, value: Any) -> Optional[Set[str]]:
+        """Document ids matching an equality or `in` predicate, None if the index can't answer"""
+        if field not in self.entries:
+            return None
+        buckets = self.entries[field]
+        if op == '==':
+            if not _is_hashable(value):
+                return None
+            return set(buckets.get(value, ()))
+        if op == 'in':
+            values = list(value)
+            if not all(_is_hashable(v) for v in values):
+                return None
+            ids: Set[str] = set()
+            for v in values:
+                ids.update(buckets.get(v, ()))
+            return ids
+        return None
+    
+    def _add_value(self, field: str, doc_id: str, doc_data: Dict[str, Any]) -> None:
+        value = doc_data.get(field)
+        if field not in doc_data or not _is_hashable(value):
+            return
+        self.entries[field].setdefault(value, set()).add(doc_id)
 
 
 class MockDatabase:
@@ -14,11 +264,39 @@ class MockDatabase:
         self.credit_scores: Dict[str, Dict[str, Any]] = {}
         self.jobs: Dict[str, Dict[str, Any]] = {}
         self.transactions: List[Dict[str, Any]] = []
-        
+        self._indexes: Dict[str, MockIndex] = {}
+        self._lock_stripes = [threading.RLock() for _ in range(LOCK_STRIPES)]
+    
     def collection(self, name: str):
         """Mock collection"""
         return MockCollection(self, name)
     
+    def get_all(self, references: Iterable["MockDocument"]):
+        """Fetch several documents, yielding a snapshot per reference"""
+        for ref in references:
+            yield ref.get()
+    
+    def batch(self) -> "MockWriteBatch":
+        """Mock WriteBatch over this database"""
+        return MockWriteBatch(self)
+    
+    def get_collection_index(self, name: str) -> MockIndex:
+        """Get (building on first use) the hash index for a collection"""
+        if name not in self._indexes:
+            index = MockIndex(INDEXED_FIELDS)
+            for doc_id, doc_data in self.get_collection_data(name).items():
+                index.add(doc_id, doc_data)
+            self._indexes[name] = index
+        return self._indexes[name]
+    
+    def document_lock(self, name: str, doc_id: str) -> threading.RLock:
+        """Lock serializing read-modify-write on one document"""
+        return self._lock_stripes[hash((name, doc_id)) % LOCK_STRIPES]
+    
+    def ensure_index(self, name: str, field: str) -> None:
+        """Add an extra indexed field to a collection"""
+        self.get_collection_index(name).add_field(field, self.get_collection_data(name))
+    
     def get_collection_data(self, name: str) -> Dict[str, Dict[str, Any]]:
         """Get the actual data store for a collection"""
         if name == 'users':
@@ -43,32 +321,54 @@ class MockCollection:
         self.db = db
         self.name = name
         self.data = db.get_collection_data(name)
+        self.index = db.get_collection_index(name)
     
     def document(self, doc_id: str):
         """Get a document reference"""
-        return MockDocument(self.data, doc_id)
+        return MockDocument(self.data, doc_id, self.index, self.db.document_lock(self.name, doc_id))
+    
+    def _query(self) -> "MockQuery":
+        return MockQuery(self.data, self.index)
     
     def where(self, field: str, op: str, value: Any):
         """Mock where query"""
-        return MockQuery(self.data, field, op, value)
+        return self._query().where(field, op, value)
+    
+    def order_by(self, field: str, direction: str = "ASCENDING"):
+        """Mock ordered query"""
+        return self._query().order_by(field, direction=direction)
+    
+    def limit(self, count: int):
+        """Mock limited query"""
+        return self._query().limit(count)
+    
+    def start_after(self, cursor: Any):
+        """Mock query starting after a cursor"""
+        return self._query().start_after(cursor)
     
     def stream(self):
         """Stream all documents"""
-        for doc_id, doc_data in self.data.items():
+        for doc_id, doc_data in list(self.data.items()):
             yield MockDocumentSnapshot(doc_id, doc_data)
     
     def get(self):
         """Get all documents"""
-        return [MockDocumentSnapshot(doc_id, doc_data) 
+        return [MockDocumentSnapshot(doc_id, doc_data)
                 for doc_id, doc_data in self.data.items()]
 
 
 class MockDocument:
     """Mock Firestore document"""
     
-    def __init__(self, collection_data: Dict, doc_id: str):
+    def __init__(self, collection_data: Dict, doc_id: str, index: Optional[MockIndex] = None, lock: Optional[threading.RLock] = None):
         self.collection_data = collection_data
         self.doc_id = doc_id
+        self.index = index
+        self.lock = lock or nullcontext()
+    
+    @property
+    def id(self) -> str:
+        return self.doc_id
     
     def get(self):
         """Get document"""
@@ -76,80 +376,387 @@ class MockDocument:
             return MockDocumentSnapshot(self.doc_id, self.collection_data[self.doc_id])
         return MockDocumentSnapshot(self.doc_id, None)
     
+    def create(self, data: Dict[str, Any]):
+        """Create document, failing if it already exists"""
+        with self.lock:
+            if self.doc_id in self.collection_data:
+                raise AlreadyExists(f"Document already exists: {self.doc_id}")
+            self.set(data)
+    
     def set(self, data: Dict[str, Any], merge: bool = False):
         """Set document data"""
-        if merge and self.doc_id in self.collection_data:
-            self.collection_data[self.doc_id].update(data)
-        else:
-            self.collection_data[self.doc_id] = data
+        with self.lock:
+            new_data = dict(self.collection_data.get(self.doc_id) or {}) if merge else {}
+            _merge(new_data, data)
+            self._write(new_data)
     
     def update(self, data: Dict[str, Any]):
-        """Update document"""
-        if self.doc_id in self.collection_data:
-            self.collection_data[self.doc_id].update(data)
-        else:
-            self.collection_data[self.doc_id] = data
+        """Update document; dotted keys address nested fields"""
+        with self.lock:
+            if self.doc_id not in self.collection_data:
+                raise NotFound(f"No document to update: {self.doc_id}")
+            new_data = dict(self.collection_data.get(self.doc_id) or {})
+            for key, value in data.items():
+                _set_path(new_data, key.split("."), value)
+            self._write(new_data)
     
     def delete(self):
         """Delete document"""
-        if self.doc_id in self.collection_data:
-            del self.collection_data[self.doc_id]
+        with self.lock:
+            if self.doc_id in self.collection_data:
+                old = self.collection_data.pop(self.doc_id)
+                if self.index:
+                    self.index.remove(self.doc_id, old)
+    
+    def _write(self, new_data: Dict[str, Any]) -> None:
+        """Replace stored data and keep the collection index in sync"""
+        old = self.collection_data.get(self.doc_id)
+        if self.index and old is not None:
+            self.index.remove(self.doc_id, old)
+        self.collection_data[self.doc_id] = new_data
+        if self.index:
+            self.index.add(self.doc_id, new_data)
 
 
 class MockQuery:
-    """Mock Firestore query"""
+    """Mock Firestore query: chained filters, ordering, cursors and limits"""
+    
+    ASCENDING = "ASCENDING"
+    DESCENDING = "DESCENDING"
     
-    def __init__(self, data: Dict, field: str, op: str, value: Any):
+    def __init__(self, data: Dict, index: Optional[MockIndex] = None):
         self.data = data
-        self.field = field
-        self.op = op
-        self.value = value
+        self.index = index
+        self._filters: List[Tuple[str, str, Any]] = []
+        self._orders: List[Tuple[str, str]] = []
+        self._limit: Optional[int] = None
+        self._offset = 0
+        self._cursor: Optional[Tuple[List[Any], Optional[str]]] = None
+    
+    def _copy(self) -> "MockQuery":
+        query = MockQuery(self.data, self.index)
+        query._filters = list(self._filters)
+        query._orders = list(self._orders)
+        query._limit = self._limit
+        query._offset = self._offset
+        query._cursor = self._cursor
+        return query
+    
+    def where(self, field: str, op: str, value: Any):
+        """Add a filter"""
+        query = self._copy()
+        query._filters.append((field, op, value))
+        return query
+    
+    def order_by(self, field: str, direction: str = "ASCENDING"):
+        """Add an ordering"""
+        query = self._copy()
+        query._orders.append((field, str(direction).upper()))
+        return query
+    
+    def limit(self, count: int):
+        """Limit results"""
+        query = self._copy()
+        query._limit = count
+        return query
+    
+    def offset(self, count: int):
+        """Skip the first results"""
+        query = self._copy()
+        query._offset = count
+        return query
+    
+    def start_after(self, cursor: Any):
+        """Start after a snapshot, a dict of order_by field values or a list of values"""
+        query = self._copy()
+        if isinstance(cursor, MockDocumentSnapshot):
+            data = cursor._data or {}
+            values = [cursor.id if field == DOCUMENT_ID else _get_field(data, field) for field, _ in self._orders]
+            query._cursor = ([None if v is _MISSING else v for v in values], cursor.id)
+        elif isinstance(cursor, dict):
+            query._cursor = ([cursor.get(field) for field, _ in self._orders if field in cursor], None)
+        else:
+            query._cursor = (list(cursor), None)
+        return query
     
     def stream(self):
         """Stream query results"""
-        for doc_id, doc_data in self.data.items():
-            if self._matches(doc_data):
-                yield MockDocumentSnapshot(doc_id, doc_data)
+        remaining = self._limit
+        to_skip = self._offset
+        if remaining is not None and remaining <= 0:
+            return
+        for doc_id in self._plan():
+            doc_data = self.data.get(doc_id)
+            if doc_data is None or not self._matches(doc_data):
+                continue
+            if self._cursor is not None and not self._after_cursor(doc_id, doc_data):
+                continue
+            if to_skip:
+                to_skip -= 1
+                continue
+            yield MockDocumentSnapshot(doc_id, doc_data)
+            if remaining is not None:
+                remaining -= 1
+                if remaining == 0:
+                    return
     
     def get(self):
         """Get query results"""
-        results = []
-        for doc_id, doc_data in self.data.items():
-            if self._matches(doc_data):
-                results.append(MockDocumentSnapshot(doc_id, doc_data))
-        return results
+        return list(self.stream())
     
-    def limit(self, count: int):
-        """Limit results"""
-        return self
+    def count(self, alias: str = "count"):
+        """Count aggregation over the query"""
+        return MockAggregationQuery(self, alias)
+    
+    def _candidate_ids(self) -> Tuple[Optional[Set[str]], bool]:
+        """Intersect hash index hits for indexable filters; flag whether the index answered them all"""
+        if not self.index:
+            return None, False
+        candidates: Optional[Set[str]] = None
+        exact = True
+        for field, op, value in self._filters:
+            ids = self.index.lookup(field, op, value)
+            if ids is None:
+                exact = False
+                continue
+            candidates = ids if candidates is None else candidates & ids
+        return candidates, exact
+    
+    def _plan(self):
+        """Pick the cheapest traversal: index hits, sorted index walk or full scan"""
+        candidates, exact = self._candidate_ids()
+        if not self._orders:
+            if candidates is None:
+                return list(self.data.keys())
+            return sorted(candidates)
+    
+        field, direction = self._orders[0]
+        wanted = None if self._limit is None else self._limit + self._offset
+        walk_sorted = self.index is not None and field != DOCUMENT_ID and (
+            candidates is None
+            or (wanted is not None and len(candidates) > SORT_CANDIDATES_THRESHOLD)
+        )
+        if walk_sorted:
+            sorted_index = self.index.sorted_index(field, self.data)
+            start_key = None
+            if self._cursor is not None and self._cursor[0]:
+                start_key = _order_key(self._cursor[0][0])
+            ids = sorted_index.walk(direction, start_key)
+            if candidates is not None:
+                ids = (doc_id for doc_id in ids if doc_id in candidates)
+            if len(self._orders) == 1:
+                return ids
+            return self._resolve_ties(ids)
+    
+        if candidates is None:
+            candidates = set(self.data.keys())
+        keyed = []
+        for doc_id in candidates:
+            keys = self._sort_keys(doc_id, self.data.get(doc_id) or {})
+            if keys is not None:
+                keyed.append((keys, doc_id))
+        directions = [d for _, d in self._orders] + [self._orders[-1][1]]
+        compare = cmp_to_key(lambda a, b: _compare(a[0], b[0], directions))
+        if wanted is not None and self._cursor is None and exact:
+            keyed = heapq.nsmallest(wanted, keyed, key=compare)
+        else:
+            keyed.sort(key=compare)
+        return [doc_id for _, doc_id in keyed]
+    
+    def _resolve_ties(self, ids):
+        """Re-order runs sharing the same primary key by the remaining order_by fields"""
+        directions = [d for _, d in self._orders] + [self._orders[-1][1]]
+        compare = cmp_to_key(lambda a, b: _compare(a[0], b[0], directions))
+        group: List[Tuple[List[Tuple], str]] = []
+        for doc_id in ids:
+            keys = self._sort_keys(doc_id, self.data.get(doc_id) or {})
+            if keys is None:
+                continue
+            if group and group[0][0][0] != keys[0]:
+                group.sort(key=compare)
+                for _, gid in group:
+                    yield gid
+                group = []
+            group.append((keys, doc_id))
+        group.sort(key=compare)
+        for _, gid in group:
+            yield gid
+    
+    def _sort_keys(self, doc_id: str, doc_data: Dict[str, Any]) -> Optional[List[Tuple]]:
+        """Order keys for a document, None when it lacks an order_by field"""
+        keys = []
+        for field, _ in self._orders:
+            if field == DOCUMENT_ID:
+                keys.append((6, doc_id))
+                continue
+            value = _get_field(doc_data, field)
+            if value is _MISSING:
+                return None
+            keys.append(_order_key(value))
+        keys.append((6, doc_id))
+        return keys
+    
+    def _after_cursor(self, doc_id: str, doc_data: Dict[str, Any]) -> bool:
+        """Check if a document sorts strictly after the start_after cursor"""
+        values, cursor_id = self._cursor
+        keys = self._sort_keys(doc_id, doc_data)
+        if keys is None:
+            return False
+        cursor_keys = [_order_key(v) for v in values]
+        directions = [d for _, d in self._orders]
+        if cursor_id is not None and len(values) == len(self._orders):
+            cursor_keys.append((6, cursor_id))
+            directions.append(self._orders[-1][1] if self._orders else self.ASCENDING)
+        n = len(cursor_keys)
+        return _compare(keys[:n], cursor_keys, directions[:n]) > 0
     
     def _matches(self, doc_data: Dict) -> bool:
-        """Check if document matches query"""
-        if self.field not in doc_data:
+        """Check if document matches every filter"""
+        for field, op, value in self._filters:
+            if not self._matches_filter(doc_data, field, op, value):
+                return False
+        return True
+    
+    @staticmethod
+    def _matches_filter(doc_data: Dict, field: str, op: str, value: Any) -> bool:
+        doc_value = _get_field(doc_data, field)
+        if doc_value is _MISSING:
             return False
-        
-        doc_value = doc_data[self.field]
-        
-        if self.op == '==':
-            return doc_value == self.value
-        elif self.op == '!=':
-            return doc_value != self.value
-        elif self.op == '>':
-            return doc_value > self.value
-        elif self.op == '>=':
-            return doc_value >= self.value
-        elif self.op == '<':
-            return doc_value < self.value
-        elif self.op == '<=':
-            return doc_value <= self.value
-        elif self.op == 'in':
-            return doc_value in self.value
-        elif self.op == 'array-contains':
-            return self.value in doc_value if isinstance(doc_value, list) else False
-        
+    
+        if op == '==':
+            return doc_value == value
+        elif op == '!=':
+            return doc_value != value
+        elif op in ('>', '>=', '<', '<='):
+            # Range filters only match values of the same type, as in Firestore
+            doc_key, key = _order_key(doc_value), _order_key(value)
+            if doc_key[0] != key[0]:
+                return False
+            if op == '>':
+                return doc_key > key
+            elif op == '>=':
+                return doc_key >= key
+            elif op == '<':
+                return doc_key < key
+            return doc_key <= key
+        elif op == 'in':
+            return doc_value in value
+        elif op == 'not-in':
+            return doc_value not in value
+        elif op == 'array-contains':
+            return value in doc_value if isinstance(doc_value, list) else False
+        elif op == 'array-contains-any':
+            return any(v in doc_value for v in value) if isinstance(doc_value, list) else False
+    
         return False
 
 
+class MockAggregationResult:
+    """Mock Firestore aggregation result"""
+    
+    def __init__(self, alias: str, value: Any):
+        self.alias = alias
+        self.value = value
+
+
+class MockAggregationQuery:
+    """Mock Firestore count() aggregation"""
+    
+    def __init__(self, query: MockQuery, alias: str):
+        self.query = query
+        self.alias = alias
+    
+    def get(self):
+        """Run the aggregation, shaped like the SDK's list of result rows"""
+        count = sum(1 for _ in self.query.stream())
+        return [[MockAggregationResult(self.alias, count)]]
+
+
+class MockWriteBatch:
+    """Mock firestore.WriteBatch: writes are queued and applied all-or-nothing on commit"""
+    
+    def __init__(self, db: "MockDatabase"):
+        self._db = db
+        self._ops: List[Tuple[str, "MockDocument", Any, bool]] = []
+    
+    def __len__(self) -> int:
+        return len(self._ops)
+    
+    def create(self, ref: "MockDocument", data: Dict[str, Any]):
+        self._ops.append(("create", ref, data, False))
+        return self
+    
+    def set(self, ref: "MockDocument", data: Dict[str, Any], merge: bool = False):
+        self._ops.append(("set", ref, data, merge))
+        return self
+    
+    def update(self, ref: "MockDocument", data: Dict[str, Any]):
+        self._ops.append(("update", ref, data, False))
+        return self
+    
+    def delete(self, ref: "MockDocument"):
+        self._ops.append(("delete", ref, None, False))
+        return self
+    
+    def _locked_refs(self, ops) -> List["MockDocument"]:
+        return [ref for _, ref, _, _ in ops]
+    
+    def _check(self) -> None:
+        """Extra precondition, checked under the document locks before anything is written"""
+    
+    def commit(self) -> List[Any]:
+        """Check every precondition first, then apply; nothing is written if one fails"""
+        ops, self._ops = self._ops, []
+        # Take each document's stripe once, in a fixed order, so concurrent batches can't deadlock
+        locks = sorted({id(ref.lock): ref.lock for ref in self._locked_refs(ops)}.items())
+        for _, lock in locks:
+            lock.acquire()
+        try:
+            self._check()
+            exists = {}
+            for kind, ref, _, _ in ops:
+                key = (id(ref.collection_data), ref.doc_id)
+                present = exists.get(key, ref.doc_id in ref.collection_data)
+                if kind == "create" and present:
+                    raise AlreadyExists(f"Document already exists: {ref.doc_id}")
+                if kind == "update" and not present:
+                    raise NotFound(f"No document to update: {ref.doc_id}")
+                exists[key] = kind != "delete"
+            for kind, ref, data, merge in ops:
+                if kind == "delete":
+                    ref.delete()
+                elif kind == "update":
+                    ref.update(data)
+                else:
+                    ref.set(data, merge=merge)
+        finally:
+            for _, lock in reversed(locks):
+                lock.release()
+        return [None] * len(ops)
+
+
+class MockTransaction(MockWriteBatch):
+    """Mock firestore.Transaction: a write batch that also fails with Aborted at commit
+    if a document it read has been written since (stored data is replaced, never
+    mutated, on every write, so identity tells)"""
+    
+    def __init__(self, db: "MockDatabase"):
+        super().__init__(db)
+        self._reads: List[Tuple["MockDocument", Any]] = []
+    
+    def read(self, ref: "MockDocument") -> "MockDocumentSnapshot":
+        self._reads.append((ref, ref.collection_data.get(ref.doc_id)))
+        return ref.get()
+    
+    def _locked_refs(self, ops) -> List["MockDocument"]:
+        return super()._locked_refs(ops) + [ref for ref, _ in self._reads]
+    
+    def _check(self) -> None:
+        for ref, seen in self._reads:
+            if ref.collection_data.get(ref.doc_id) is not seen:
+                raise Aborted(f"Transaction read of {ref.doc_id} is stale")
+
+
 class MockDocumentSnapshot:
     """Mock Firestore document snapshot"""
     
@@ -157,17 +764,175 @@ class MockDocumentSnapshot:
         self.id = doc_id
         self._data = data
     
+    @property
     def exists(self) -> bool:
         """Check if document exists"""
         return self._data is not None
     
+    def get(self, field: str) -> Any:
+        """Get a single (possibly dotted) field"""
+        value = _get_field(self._data or {}, field)
+        return None if value is _MISSING else value
+    
     def to_dict(self) -> Optional[Dict[str, Any]]:
         """Get document data"""
-        return self._data.copy() if self._data else None
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+
+class AsyncMockQuery:
+    """Async view of a MockQuery, mirroring firestore.AsyncQuery"""
+    
+    def __init__(self, query):
+        self._query = query
+    
+    def where(self, field: str, op: str, value: Any):
+        return AsyncMockQuery(self._query.where(field, op, value))
+    
+    def order_by(self, field: str, direction: str = "ASCENDING"):
+        return AsyncMockQuery(self._query.order_by(field, direction=direction))
+    
+    def limit(self, count: int):
+        return AsyncMockQuery(self._query.limit(count))
+    
+    def offset(self, count: int):
+        return AsyncMockQuery(self._query.offset(count))
+    
+    def start_after(self, cursor: Any):
+        if isinstance(cursor, dict):
+            cursor = {k: v._doc if isinstance(v, AsyncMockDocument) else v for k, v in cursor.items()}
+        return AsyncMockQuery(self._query.start_after(cursor))
+    
+    async def stream(self):
+        """Async generator over the query results"""
+        for snap in self._query.stream():
+            yield snap
+    
+    async def get(self):
+        return self._query.get()
+    
+    def count(self, alias: str = "count"):
+        return AsyncMockAggregationQuery(self._query.count(alias))
+
+
+class AsyncMockAggregationQuery:
+    """Async view of a MockAggregationQuery"""
+    
+    def __init__(self, query: MockAggregationQuery):
+        self._query = query
+    
+    async def get(self):
+        return self._query.get()
+
+
+class AsyncMockCollection(AsyncMockQuery):
+    """Async view of a MockCollection, mirroring firestore.AsyncCollectionReference"""
+    
+    def __init__(self, collection: MockCollection):
+        super().__init__(collection._query())
+        self._collection = collection
+    
+    @property
+    def id(self) -> str:
+        return self._collection.name
+    
+    def document(self, doc_id: str):
+        return AsyncMockDocument(self._collection.document(doc_id))
+
+
+class AsyncMockDocument:
+    """Async view of a MockDocument, mirroring firestore.AsyncDocumentReference"""
+    
+    def __init__(self, doc: MockDocument):
+        self._doc = doc
+    
+    @property
+    def id(self) -> str:
+        return self._doc.id
+    
+    async def get(self, transaction: Optional["AsyncMockTransaction"] = None):
+        if transaction is not None:
+            return transaction._batch.read(self._doc)
+        return self._doc.get()
+    
+    async def create(self, data: Dict[str, Any]):
+        return self._doc.create(data)
+    
+    async def set(self, data: Dict[str, Any], merge: bool = False):
+        return self._doc.set(data, merge=merge)
+    
+    async def update(self, data: Dict[str, Any]):
+        return self._doc.update(data)
+    
+    async def delete(self):
+        return self._doc.delete()
+
+
+class AsyncMockWriteBatch:
+    """Async view of a MockWriteBatch, mirroring firestore.AsyncWriteBatch"""
+    
+    def __init__(self, batch: MockWriteBatch):
+        self._batch = batch
+    
+    def __len__(self) -> int:
+        return len(self._batch)
+    
+    def create(self, ref: AsyncMockDocument, data: Dict[str, Any]):
+        self._batch.create(ref._doc, data)
+        return self
+    
+    def set(self, ref: AsyncMockDocument, data: Dict[str, Any], merge: bool = False):
+        self._batch.set(ref._doc, data, merge=merge)
+        return self
+    
+    def update(self, ref: AsyncMockDocument, data: Dict[str, Any]):
+        self._batch.update(ref._doc, data)
+        return self
+    
+    def delete(self, ref: AsyncMockDocument):
+        self._batch.delete(ref._doc)
+        return self
+    
+    async def commit(self) -> List[Any]:
+        return self._batch.commit()
+
+
+class AsyncMockTransaction(AsyncMockWriteBatch):
+    """Async view of a MockTransaction; reads go through `ref.get(transaction=...)`"""
+
+
+class AsyncMockDatabase:
+    """Async twin of MockDatabase over the same in-memory data, mirroring firestore.AsyncClient"""
+    
+    def __init__(self, db: MockDatabase):
+        self._db = db
+    
+    def collection(self, name: str):
+        return AsyncMockCollection(self._db.collection(name))
+    
+    def batch(self) -> AsyncMockWriteBatch:
+        return AsyncMockWriteBatch(self._db.batch())
+    
+    async def run_transaction(self, fn):
+        """Run `await fn(transaction)` and commit, retrying from scratch when a read went stale"""
+        for attempt in range(TRANSACTION_ATTEMPTS):
+            transaction = AsyncMockTransaction(MockTransaction(self._db))
+            result = await fn(transaction)
+            try:
+                await transaction.commit()
+                return result
+            except Aborted:
+                if attempt == TRANSACTION_ATTEMPTS - 1:
+                    raise
+    
+    async def get_all(self, references: Iterable[AsyncMockDocument]):
+        """Async generator yielding a snapshot per reference"""
+        for ref in references:
+            yield ref._doc.get()
 
 
 # Global mock database instance
 _mock_db = None
+_async_mock_db = None
 
 
 def get_mock_db() -> MockDatabase:
@@ -178,3 +943,10 @@ def get_mock_db() -> MockDatabase:
         print("[INFO] Using MOCK DATABASE (Firebase unavailable)")
     return _mock_db
 
+
+def get_async_mock_db() -> AsyncMockDatabase:
+    """Async view of the global mock database (same documents as get_mock_db())"""
+    global _async_mock_db
+    if _async_mock_db is None:
+        _async_mock_db = AsyncMockDatabase(get_mock_db())
+    return _async_mock_db
@@ -0,0 +1,98 @@
+from __future__ import annotations
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+from passlib.context import CryptContext
+from ..config import settings
+
+
+# Support both argon2 (new) and bcrypt (legacy) for password hashing
+# New passwords use argon2, old bcrypt passwords still work (and are upgraded on login)
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    deprecated="auto",
+    argon2__time_cost=settings.argon2_time_cost,
+    argon2__memory_cost=settings.argon2_memory_cost_kib,
+    argon2__parallelism=settings.argon2_parallelism,
+)
+
+
+class PasswordPoolSaturated(Exception):
+    """Raised instead of queueing when the hashing pool already has `max_queue` jobs"""
+
+
+def _verify(password: str, password_hash: str) -> tuple[bool, Optional[str]]:
+    """(matches, replacement hash if the stored one uses outdated parameters)"""
+    try:
+        return pwd_context.verify_and_update(password, password_hash)
+    except Exception as e:
+        # Hash format not recognized (old/corrupted hash)
+        # Return False instead of crashing
+        print(f"[WARNING] Password hash verification failed: {e}")
+        return False, None
+
+
+class PasswordPool:
+    """Size-capped worker pool for argon2 hashing and verification.
+
+    argon2-cffi releases the GIL while hashing, so a small thread pool runs
+    hashes in parallel without stalling the event loop. At most `max_queue`
+    jobs are admitted (running plus waiting); beyond that callers get
+    PasswordPoolSaturated, which the auth routes turn into a 503.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="argon2")
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.peak_in_flight = 0
+        self._wait_total = 0.0
+        self._run_total = 0.0
+
+    async def _submit(self, fn, *args) -> Any:
+        if self.in_flight >= self.max_queue:
+            self.rejected += 1
+            raise PasswordPoolSaturated(f"{self.in_flight} password jobs pending")
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        queued_at = time.perf_counter()
+
+        def run():
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                self._wait_total += started - queued_at
+                self._run_total += time.perf_counter() - started
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, run)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(pwd_context.hash, password)
+
+    async def verify(self, password: str, password_hash: str) -> tuple[bool, Optional[str]]:
+        return await self._submit(_verify, password, password_hash)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "maxQueue": self.max_queue,
+            "inFlight": self.in_flight,
+            "queued": max(self.in_flight - self.workers, 0),
+            "peakInFlight": self.peak_in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avgWaitMs": round(self._wait_total / self.completed * 1000, 2) if self.completed else 0.0,
+            "avgRunMs": round(self._run_total / self.completed * 1000, 2) if self.completed else 0.0,
+        }
+
+
+password_pool = PasswordPool(settings.password_pool_workers, settings.password_pool_max_queue)
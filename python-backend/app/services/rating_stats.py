@@ -0,0 +1,109 @@
+from __future__ import annotations
+from typing import Any, Iterable, Optional
+from datetime import datetime, timedelta, timezone
+from firebase_admin import firestore
+from .firebase import get_async_db
+from .repos import UsersRepo
+from .unit_of_work import UnitOfWork
+from ..config import settings
+
+
+STARS = ("0", "1", "2", "3", "4", "5")
+
+
+def star(rating: float) -> str:
+    """Histogram bucket for a rating: nearest whole star, halves rounding up"""
+    return STARS[min(5, max(0, int(float(rating) + 0.5)))]
+
+
+def _day(when: datetime) -> str:
+    return when.astimezone(timezone.utc).strftime("%Y%m%d")
+
+
+def _cutoff(now: Optional[datetime] = None) -> str:
+    """First day inside the recent window"""
+    now = now or datetime.now(timezone.utc)
+    return _day(now - timedelta(days=settings.rating_recent_days - 1))
+
+
+def summary(stats: Optional[dict[str, Any]], now: Optional[datetime] = None) -> dict[str, Any]:
+    """Averages and histogram from a user's ratingStats map"""
+    stats = stats or {}
+    count, total = int(stats.get("count", 0)), float(stats.get("sum", 0))
+    cutoff = _cutoff(now)
+    recent = [d for day, d in (stats.get("days") or {}).items() if day >= cutoff]
+    recent_count = sum(int(d.get("count", 0)) for d in recent)
+    recent_sum = sum(float(d.get("sum", 0)) for d in recent)
+    histogram = stats.get("histogram") or {}
+    return {
+        "averageRating": round(total / count, 2) if count else 0,
+        "totalRatings": count,
+        "histogram": {s: int(histogram.get(s, 0)) for s in STARS},
+        "recentAverage": round(recent_sum / recent_count, 2) if recent_count else 0,
+        "recentRatings": recent_count,
+        "recentDays": settings.rating_recent_days,
+    }
+
+
+def fold(ratings: Iterable[dict[str, Any]], now: Optional[datetime] = None) -> dict[str, dict[str, Any]]:
+    """Plain ratingStats maps by rated user for a set of rating docs, as record() would build them"""
+    cutoff = _cutoff(now)
+    out: dict[str, dict[str, Any]] = {}
+    for r in ratings:
+        user_id, value = r.get("ratedUser"), r.get("rating")
+        if not user_id or value is None:
+            continue
+        value = float(value)
+        stats = out.setdefault(user_id, {"count": 0, "sum": 0.0, "histogram": {}, "days": {}})
+        stats["count"] += 1
+        stats["sum"] += value
+        stats["histogram"][star(value)] = stats["histogram"].get(star(value), 0) + 1
+        created = r.get("createdAt")
+        if isinstance(created, datetime):
+            day = _day(created if created.tzinfo else created.replace(tzinfo=timezone.utc))
+            if day >= cutoff:
+                d = stats["days"].setdefault(day, {"count": 0, "sum": 0.0})
+                d["count"] += 1
+                d["sum"] += value
+    return out
+
+
+class RatingStats:
+    """Rating aggregates kept on the rated user's document.
+
+    `ratingStats` holds count, sum, a whole-star histogram and per-day
+    count/sum for the recent window. Each new rating is one merge write of
+    Increment transforms, so concurrent ratings for a popular worker never
+    conflict or retry and the cost doesn't grow with their rating history.
+    Averages are derived from the counters when read (see summary()).
+    """
+
+    @staticmethod
+    async def record(user_id: Optional[str], rating: float, when: Optional[datetime] = None, uow: Optional[UnitOfWork] = None) -> None:
+        if not user_id:
+            return
+        if uow is None:
+            async with UnitOfWork() as uow:
+                return await RatingStats.record(user_id, rating, when, uow)
+        value = float(rating)
+        stats: dict[str, Any] = {
+            "count": firestore.Increment(1),
+            "sum": firestore.Increment(value),
+            "histogram": {star(value): firestore.Increment(1)},
+            "days": {_day(when or datetime.now(timezone.utc)): {"count": firestore.Increment(1), "sum": firestore.Increment(value)}},
+        }
+        current = await UsersRepo.find_by_id(user_id)
+        if current is None:
+            return
+        # Drop days that have left the window, as far as the cached copy knows
+        cutoff = _cutoff()
+        for day in (current.get("ratingStats") or {}).get("days") or {}:
+            if day < cutoff:
+                stats["days"][day] = firestore.DELETE_FIELD
+        uow.set(get_async_db().collection("users").document(user_id), {"ratingStats": stats}, merge=True)
+        uow.after_commit(lambda: UsersRepo.invalidate(user_id))
+
+    @staticmethod
+    async def get(user_id: str) -> dict[str, Any]:
+        user = await UsersRepo.find_by_id(user_id) or {}
+        return summary(user.get("ratingStats"))
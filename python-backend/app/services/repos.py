@@ -1,13 +1,20 @@
 from __future__ import annotations
 from typing import Any, Optional
 from datetime import datetime, timedelta
-from passlib.context import CryptContext
-from .firebase import get_db, get_bucket, is_mock_db
-
-
-# Support both argon2 (new) and bcrypt (legacy) for password hashing
-# New passwords use argon2, old bcrypt passwords still work
-pwd_context = CryptContext(schemes=["argon2", "bcrypt"], deprecated="auto")
+import base64
+import bisect
+import json
+import math
+import time
+from firebase_admin import firestore
+from google.api_core.exceptions import AlreadyExists, NotFound
+from .cache import doc_cache
+from .firebase import get_async_db, get_bucket, is_mock_db
+from .ids import new_id
+from ..config import settings
+from .passwords import password_pool
+from .ussd_sessions import session_store
+from ..utils.phone import to_e164, phone_variants
 
 
 def now_ts():
@@ -15,28 +22,75 @@ def now_ts():
     return datetime.utcnow().isoformat() + "Z"
 
 
+# Firestore's field path for the document id (FieldPath.document_id())
+DOCUMENT_ID = "__name__"
+
+
+def encode_cursor(fields: dict[str, Any]) -> str:
+    """Build an opaque, URL-safe pagination token from cursor field values"""
+    payload = {k: {"$dt": v.isoformat()} if isinstance(v, datetime) else v for k, v in fields.items()}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> dict[str, Any]:
+    """Inverse of encode_cursor. Raises ValueError for malformed tokens."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if not isinstance(payload, dict):
+        raise ValueError("Invalid cursor")
+    return {k: datetime.fromisoformat(v["$dt"]) if isinstance(v, dict) and "$dt" in v else v for k, v in payload.items()}
+
+
+async def _changed(user_id: str) -> None:
+    """Tell live USSD sessions their snapshot of this user's docs is out of date"""
+    await session_store.mark_stale(user_id)
+
+
 # Users
 class UsersRepo:
     @staticmethod
     def _col():
-        return get_db().collection("users")
+        return get_async_db().collection("users")
+
+    @staticmethod
+    def _canonical_phone(data: dict[str, Any]) -> dict[str, Any]:
+        if data.get("phoneNumber"):
+            data["phoneNumber"] = to_e164(data["phoneNumber"]) or data["phoneNumber"]
+        return data
 
     @staticmethod
-    def create_user(user_id: str, data: dict[str, Any]) -> None:
-        UsersRepo._col().document(user_id).set(data | {"createdAt": now_ts(), "updatedAt": now_ts()})
+    async def create_user(user_id: str, data: dict[str, Any]) -> None:
+        UsersRepo._canonical_phone(data)
+        await UsersRepo._col().document(user_id).set(data | {"createdAt": now_ts(), "updatedAt": now_ts()})
+        await UsersRepo.invalidate(user_id)
 
     @staticmethod
-    def find_by_email(email: str) -> Optional[dict[str, Any]]:
+    async def invalidate(user_id: str) -> None:
+        """Drop the cached profile; call after writing the users document outside this repo"""
+        await doc_cache.invalidate(f"user:{user_id}")
+        await _changed(user_id)
+
+    @staticmethod
+    async def find_by_email(email: str) -> Optional[dict[str, Any]]:
         docs = UsersRepo._col().where("email", "==", email.lower()).limit(1).stream()
-        for d in docs:
+        async for d in docs:
             obj = d.to_dict()
             obj["userId"] = d.id
             return obj
         return None
 
     @staticmethod
-    def find_by_phone(phone: str) -> Optional[dict[str, Any]]:
-        docs = UsersRepo._col().where("phoneNumber", "==", phone).limit(1).stream()
+    async def find_by_phone(phone: str) -> Optional[dict[str, Any]]:
+        """One `in` query over every stored form of the number; prefers the canonical E.164 match"""
+        variants = phone_variants(phone)
+        if not variants:
+            return None
+        docs = await UsersRepo._col().where("phoneNumber", "in", variants).limit(len(variants)).get()
+        docs.sort(key=lambda d: variants.index((d.to_dict() or {}).get("phoneNumber")))
         for d in docs:
             obj = d.to_dict()
             obj["userId"] = d.id
@@ -44,47 +98,55 @@ class UsersRepo:
         return None
 
     @staticmethod
-    def find_by_id(user_id: str) -> Optional[dict[str, Any]]:
-        doc = UsersRepo._col().document(user_id).get()
-        if doc.exists:
-            obj = doc.to_dict() or {}
-            obj["userId"] = doc.id
-            return obj
-        return None
+    async def find_by_id(user_id: str) -> Optional[dict[str, Any]]:
+        async def load():
+            doc = await UsersRepo._col().document(user_id).get()
+            if doc.exists:
+                obj = doc.to_dict() or {}
+                obj["userId"] = doc.id
+                return obj
+            return None
+        return await doc_cache.get_or_load(f"user:{user_id}", settings.user_cache_ttl_seconds, load)
 
     @staticmethod
-    def update_profile(user_id: str, updates: dict[str, Any]) -> dict[str, Any]:
+    async def update_profile(user_id: str, updates: dict[str, Any]) -> dict[str, Any]:
         updates["updatedAt"] = now_ts()
-        UsersRepo._col().document(user_id).set(updates, merge=True)
-        return UsersRepo.find_by_id(user_id) or {}
+        UsersRepo._canonical_phone(updates)
+        await UsersRepo._col().document(user_id).set(updates, merge=True)
+        # Drop rather than patch the cached doc (it may be stale); the next read loads the committed one
+        await doc_cache.invalidate(f"user:{user_id}")
+        await _changed(user_id)
+        return await UsersRepo.find_by_id(user_id) or {"userId": user_id}
 
     @staticmethod
-    def hash_password(password: str) -> str:
-        return pwd_context.hash(password)
+    async def hash_password(password: str) -> str:
+        """Hash on the password pool. Raises PasswordPoolSaturated when it is full."""
+        return await password_pool.hash(password)
 
     @staticmethod
-    def verify_password(password: str, password_hash: str) -> bool:
-        """Verify password against hash. Returns False for unrecognized hashes."""
-        try:
-            return pwd_context.verify(password, password_hash)
-        except Exception as e:
-            # Hash format not recognized (old/corrupted hash)
-            # Return False instead of crashing
-            print(f"[WARNING] Password hash verification failed: {e}")
-            return False
+    async def verify_password(password: str, password_hash: str) -> tuple[bool, Optional[str]]:
+        """Verify on the password pool: (matches, upgraded hash or None). False for unrecognized hashes."""
+        return await password_pool.verify(password, password_hash)
 
 
 # Wallets
 class WalletsRepo:
     @staticmethod
     def _col():
-        return get_db().collection("wallets")
+        return get_async_db().collection("wallets")
+
+    @staticmethod
+    async def find(user_id: str) -> Optional[dict[str, Any]]:
+        async def load():
+            doc = await WalletsRepo._col().document(user_id).get()
+            return (doc.to_dict() or {}) if doc.exists else None
+        return await doc_cache.get_or_load(f"wallet:{user_id}", settings.wallet_cache_ttl_seconds, load)
 
     @staticmethod
-    def get_or_create(user_id: str) -> dict[str, Any]:
+    async def get_or_create(user_id: str) -> dict[str, Any]:
         doc_ref = WalletsRepo._col().document(user_id)
-        doc = doc_ref.get()
-        if not doc.exists:
+        data = await WalletsRepo.find(user_id)
+        if data is None:
             data = {
                 "balances": {"KES": 0.0, "USDT": 0.0, "USD": 0.0},
                 "hasPin": False,
@@ -97,54 +159,80 @@ class WalletsRepo:
                 "createdAt": now_ts(),
                 "updatedAt": now_ts(),
             }
-            doc_ref.set(data)
-            return data
-        data = doc.to_dict() or {}
+            try:
+                # create() rather than set() so a racing writer's balance update is never reset
+                await doc_ref.create(data)
+            except AlreadyExists:
+                data = (await doc_ref.get()).to_dict() or {}
+            await doc_cache.set(f"wallet:{user_id}", data, settings.wallet_cache_ttl_seconds)
         return data
 
     @staticmethod
-    def set_pin(user_id: str, pin_hash: str) -> None:
-        WalletsRepo._col().document(user_id).set({"hasPin": True, "pinHash": pin_hash, "updatedAt": now_ts()}, merge=True)
+    async def set_pin(user_id: str, pin_hash: str) -> None:
+        await WalletsRepo._col().document(user_id).set({"hasPin": True, "pinHash": pin_hash, "updatedAt": now_ts()}, merge=True)
+        await doc_cache.invalidate(f"wallet:{user_id}")
+        await _changed(user_id)
 
     @staticmethod
-    def get_pin_hash(user_id: str) -> Optional[str]:
-        doc = WalletsRepo._col().document(user_id).get()
+    async def get_pin_hash(user_id: str) -> Optional[str]:
+        doc = await WalletsRepo._col().document(user_id).get()
         if doc.exists:
             return (doc.to_dict() or {}).get("pinHash")
         return None
 
     @staticmethod
-    def update_balance(user_id: str, currency: str, delta: float) -> dict[str, Any]:
+    async def update_balance(user_id: str, currency: str, delta: float) -> dict[str, Any]:
+        return await WalletsRepo.apply_deltas(user_id, {currency: delta})
+
+    @staticmethod
+    async def apply_deltas(user_id: str, deltas: dict[str, float]) -> dict[str, Any]:
+        """Atomically add per-currency deltas, writing only the balances.<CUR> paths via Increment"""
         doc_ref = WalletsRepo._col().document(user_id)
-        doc = doc_ref.get()
-        if not doc.exists:
-            WalletsRepo.get_or_create(user_id)
-            doc = doc_ref.get()
-        data = doc.to_dict() or {}
-        balances = data.get("balances", {})
-        balances[currency] = float(balances.get(currency, 0.0)) + float(delta)
-        data["balances"] = balances
-        data["updatedAt"] = now_ts()
-        doc_ref.set(data)
+        updates: dict[str, Any] = {f"balances.{cur}": firestore.Increment(float(d)) for cur, d in deltas.items() if d}
+        updates["updatedAt"] = now_ts()
+        try:
+            await doc_ref.update(updates)
+        except NotFound:
+            await WalletsRepo.get_or_create(user_id)
+            await doc_ref.update(updates)
+        # Increments are resolved server-side, so the fresh balances have to be read back once
+        data = (await doc_ref.get()).to_dict() or {}
+        await doc_cache.set(f"wallet:{user_id}", data, settings.wallet_cache_ttl_seconds)
+        await _changed(user_id)
         return data
 
 
 # Transactions
 class TransactionsRepo:
+    COUNT_CACHE_TTL_SECONDS = 60
+
     @staticmethod
     def _col():
-        return get_db().collection("transactions")
+        return get_async_db().collection("transactions")
 
     @staticmethod
-    def create(txn: dict[str, Any]) -> dict[str, Any]:
-        txn_id = txn.get("transactionId") or f"TXN_{int(now_ts().timestamp())}"
+    async def create(txn: dict[str, Any]) -> dict[str, Any]:
+        txn_id = txn.get("transactionId") or new_id("TXN")
         txn["transactionId"] = txn_id
         txn["createdAt"] = now_ts()
-        TransactionsRepo._col().document(txn_id).set(txn)
+        from .ledger import Ledger
+        from .rollups import WalletRollups
+        from .unit_of_work import UnitOfWork
+        # The transaction, its ledger entry and its analytics bucket commit together;
+        # a transaction id that was already posted is a replay and changes nothing
+        try:
+            async with UnitOfWork() as uow:
+                uow.set(TransactionsRepo._col().document(txn_id), txn)
+                await Ledger.record_transaction(txn, uow)
+                await WalletRollups.record(txn, uow)
+        except AlreadyExists:
+            return txn
+        if txn.get("userId"):
+            await TransactionsRepo._bump_count_generation(txn["userId"])
         return txn
 
     @staticmethod
-    def list_by_user(user_id: str, page: int, limit: int, filters: dict[str, Any] | None = None) -> tuple[list[dict], int]:
+    def _query(user_id: str, filters: dict[str, Any] | None = None):
         q = TransactionsRepo._col().where("userId", "==", user_id)
         if filters:
             if filters.get("type"):
@@ -155,41 +243,90 @@ class TransactionsRepo:
                 q = q.where("initiatedAt", ">=", filters["startDate"])  # requires composite indexes as data grows
             if filters.get("endDate"):
                 q = q.where("initiatedAt", "<=", filters["endDate"])  # ditto
-        q = q.order_by("initiatedAt", direction="DESCENDING")
-        docs = list(q.stream())
-        total = len(docs)
-        start = (page - 1) * limit
-        end = start + limit
-        sliced = docs[start:end]
+        return q
+
+    @staticmethod
+    def _to_items(docs) -> list[dict]:
         items = []
-        for d in sliced:
+        for d in docs:
             obj = d.to_dict()
             obj["transactionId"] = d.id
             items.append(obj)
-        return items, total
+        return items
+
+    @staticmethod
+    async def _count_generation(user_id: str) -> str:
+        """Token naming the user's current cached counts; a missing (or evicted) one just means a recount"""
+        async def fresh():
+            return str(time.time_ns())
+        return await doc_cache.get_or_load(f"txgen:{user_id}", TransactionsRepo.COUNT_CACHE_TTL_SECONDS, fresh)
+
+    @staticmethod
+    async def _bump_count_generation(user_id: str) -> None:
+        """Retire every cached count for the user, filtered or not"""
+        await doc_cache.set(f"txgen:{user_id}", str(time.time_ns()), TransactionsRepo.COUNT_CACHE_TTL_SECONDS)
+
+    @staticmethod
+    def _count_key(user_id: str, generation: str, filters: dict[str, Any] | None) -> str:
+        # None-valued filters don't narrow the query, so they don't change the key either
+        used = {k: v for k, v in (filters or {}).items() if v is not None}
+        return f"txcount:{user_id}:{generation}:" + json.dumps(used, sort_keys=True, default=str)
+
+    @staticmethod
+    async def count_by_user(user_id: str, filters: dict[str, Any] | None = None) -> int:
+        """Count a user's transactions with a count() aggregation, cached until their next transaction"""
+        async def load():
+            result = await TransactionsRepo._query(user_id, filters).count().get()
+            return int(result[0][0].value) if result and result[0] else 0
+        key = TransactionsRepo._count_key(user_id, await TransactionsRepo._count_generation(user_id), filters)
+        return await doc_cache.get_or_load(key, TransactionsRepo.COUNT_CACHE_TTL_SECONDS, load)
+
+    @staticmethod
+    async def list_by_user(user_id: str, page: int, limit: int, filters: dict[str, Any] | None = None) -> tuple[list[dict], int]:
+        q = TransactionsRepo._query(user_id, filters).order_by("initiatedAt", direction="DESCENDING")
+        docs = await q.offset((page - 1) * limit).limit(limit).get()
+        return TransactionsRepo._to_items(docs), await TransactionsRepo.count_by_user(user_id, filters)
+
+    @staticmethod
+    async def list_by_user_after(user_id: str, limit: int, cursor: str | None = None, filters: dict[str, Any] | None = None) -> tuple[list[dict], Optional[str]]:
+        """Keyset pagination: one page newest-first plus the token for the next page (None on the last page)"""
+        q = TransactionsRepo._query(user_id, filters)
+        q = q.order_by("initiatedAt", direction="DESCENDING").order_by(DOCUMENT_ID, direction="DESCENDING")
+        if cursor:
+            pos = decode_cursor(cursor)
+            if "id" not in pos or "initiatedAt" not in pos:
+                raise ValueError("Invalid cursor")
+            q = q.start_after({"initiatedAt": pos["initiatedAt"], DOCUMENT_ID: TransactionsRepo._col().document(pos["id"])})
+        docs = await q.limit(limit + 1).get()
+        items = TransactionsRepo._to_items(docs[:limit])
+        next_cursor = None
+        if len(docs) > limit:
+            last = items[-1]
+            next_cursor = encode_cursor({"initiatedAt": last.get("initiatedAt"), "id": last["transactionId"]})
+        return items, next_cursor
 
 
 # Savings
 class SavingsRepo:
     @staticmethod
     def goals_col():
-        return get_db().collection("savings_goals")
+        return get_async_db().collection("savings_goals")
 
     @staticmethod
     def contrib_col():
-        return get_db().collection("savings_contributions")
+        return get_async_db().collection("savings_contributions")
 
     @staticmethod
-    def create_goal(goal: dict[str, Any]) -> dict[str, Any]:
-        goal_id = goal.get("id") or f"goal_{int(now_ts().timestamp())}"
+    async def create_goal(goal: dict[str, Any]) -> dict[str, Any]:
+        goal_id = goal.get("id") or new_id("goal")
         goal["id"] = goal_id
         goal["createdAt"] = now_ts()
-        SavingsRepo.goals_col().document(goal_id).set(goal)
+        await SavingsRepo.goals_col().document(goal_id).set(goal)
         return goal
 
     @staticmethod
-    def list_goals(user_id: str, page: int, limit: int) -> tuple[list[dict], int]:
-        docs = list(SavingsRepo.goals_col().where("userId", "==", user_id).order_by("createdAt", direction="DESCENDING").stream())
+    async def list_goals(user_id: str, page: int, limit: int) -> tuple[list[dict], int]:
+        docs = await SavingsRepo.goals_col().where("userId", "==", user_id).order_by("createdAt", direction="DESCENDING").get()
         total = len(docs)
         start = (page - 1) * limit
         end = start + limit
@@ -201,11 +338,11 @@ class SavingsRepo:
         return res, total
 
     @staticmethod
-    def contribute(contrib: dict[str, Any]) -> dict[str, Any]:
-        contrib_id = contrib.get("id") or f"contrib_{int(now_ts().timestamp())}"
+    async def contribute(contrib: dict[str, Any]) -> dict[str, Any]:
+        contrib_id = contrib.get("id") or new_id("contrib")
         contrib["id"] = contrib_id
         contrib["createdAt"] = now_ts()
-        SavingsRepo.contrib_col().document(contrib_id).set(contrib)
+        await SavingsRepo.contrib_col().document(contrib_id).set(contrib)
         return contrib
 
 
@@ -213,19 +350,19 @@ class SavingsRepo:
 class ChatRepo:
     @staticmethod
     def col():
-        return get_db().collection("chat_history")
+        return get_async_db().collection("chat_history")
 
     @staticmethod
-    def add_entry(entry: dict[str, Any]) -> dict[str, Any]:
-        entry_id = entry.get("id") or f"chat_{int(now_ts().timestamp())}"
+    async def add_entry(entry: dict[str, Any]) -> dict[str, Any]:
+        entry_id = entry.get("id") or new_id("chat")
         entry["id"] = entry_id
         entry["createdAt"] = now_ts()
-        ChatRepo.col().document(entry_id).set(entry)
+        await ChatRepo.col().document(entry_id).set(entry)
         return entry
 
     @staticmethod
-    def list_by_user(user_id: str, page: int, limit: int) -> tuple[list[dict], int]:
-        docs = list(ChatRepo.col().where("userId", "==", user_id).order_by("createdAt", direction="DESCENDING").stream())
+    async def list_by_user(user_id: str, page: int, limit: int) -> tuple[list[dict], int]:
+        docs = await ChatRepo.col().where("userId", "==", user_id).order_by("createdAt", direction="DESCENDING").get()
         total = len(docs)
         start = (page - 1) * limit
         end = start + limit
@@ -237,14 +374,182 @@ class ChatRepo:
         return res, total
 
 
-# Jobs (for heatmap)
+# Lower edges (KES) of the priceBucket ranges stored on jobs; the last bucket is open-ended
+PRICE_BUCKETS = (0, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000)
+
+
+def price_bucket(price: Any) -> int:
+    """Index of the PRICE_BUCKETS range a price falls in"""
+    try:
+        value = float(price or 0)
+    except (TypeError, ValueError):
+        value = 0.0
+    return max(0, bisect.bisect_right(PRICE_BUCKETS, value) - 1)
+
+
+def price_buckets_between(min_price: Optional[float], max_price: Optional[float]) -> tuple[Optional[list[int]], bool]:
+    """Buckets covering [min_price, max_price] and whether prices still need checking.
+
+    (None, False) means no price filter and ([], False) an empty range that
+    nothing matches (Firestore rejects `in []`, so callers must not query it).
+    Buckets that straddle a bound hold prices on both sides of it, so unless
+    both bounds sit on bucket edges the exact range must still be checked on each job.
+    """
+    if min_price is None and max_price is None:
+        return None, False
+    if min_price is not None and max_price is not None and float(min_price) > float(max_price):
+        return [], False
+    lo = price_bucket(min_price) if min_price is not None else 0
+    hi = price_bucket(max_price) if max_price is not None else len(PRICE_BUCKETS) - 1
+    exact = (min_price is None or float(min_price) in PRICE_BUCKETS) and max_price is None
+    return list(range(lo, hi + 1)), not exact
+
+
+# Jobs
 class JobsRepo:
+    # Listing scans: first batch is sized from the page, later ones from the observed match rate
+    LIST_MAX_BATCH = 500
+    LIST_MAX_ROUNDS = 4
+    COUNT_CACHE_TTL_SECONDS = 30
+
     @staticmethod
     def col():
-        return get_db().collection("jobs")
+        return get_async_db().collection("jobs")
 
     @staticmethod
-    def query(start: Optional[datetime] = None, end: Optional[datetime] = None, category: Optional[str] = None, location: Optional[str] = None, min_price: Optional[float] = None, max_price: Optional[float] = None, limit: int = 1000) -> list[dict[str, Any]]:
+    async def create(job_id: str, job: dict[str, Any]) -> dict[str, Any]:
+        """Write a new job with its normalized geo and price fields, count it in the heatmap and trends and make it searchable"""
+        from .geo import locate
+        from .heatmap import JobHeatmap
+        from .job_search import job_index
+        from .trends import JobTrends
+        from .unit_of_work import UnitOfWork
+        job["geo"] = locate(job.get("location"), settings.heatmap_geohash_precision)
+        job["priceBucket"] = price_bucket(job.get("priceKes"))
+        async with UnitOfWork() as uow:
+            uow.create(JobsRepo.col().document(job_id), job)
+            await JobHeatmap.record(job, uow)
+            await JobTrends.record(job, "posted", uow=uow)
+            uow.after_commit(lambda: job_index.upsert(job_id, job))
+        return uow.resolved(job)
+
+    @staticmethod
+    def _active_query(category: Optional[str], urgency: Optional[str], location: Optional[str], min_price: Optional[float], max_price: Optional[float]):
+        """Indexed query for the listing filters, plus the checks Firestore can't do for them"""
+        from .geo import match_place
+        q = JobsRepo.col().where("status", "==", "active")
+        checks = []
+        if category:
+            q = q.where("category", "==", category)
+        if urgency:
+            q = q.where("urgency", "==", urgency)
+        area, district = match_place(location)
+        if district:
+            q = q.where("geo.district", "==", district)
+        elif area:
+            q = q.where("geo.area", "==", area)
+        elif location:
+            # Places outside KENYA_AREAS can only be matched by substring
+            needle = location.lower()
+            checks.append(lambda job: needle in str((job.get("location") or {}).get("address", "")).lower())
+        buckets, edges = price_buckets_between(min_price, max_price)
+        if buckets is not None:
+            q = q.where("priceBucket", "in", buckets)
+        if edges:
+            low = float(min_price) if min_price is not None else float("-inf")
+            high = float(max_price) if max_price is not None else float("inf")
+            checks.append(lambda job: low <= float(job.get("priceKes") or 0) <= high)
+        return q, checks
+
+    @staticmethod
+    async def count_active(category: Optional[str] = None, urgency: Optional[str] = None, location: Optional[str] = None, min_price: Optional[float] = None, max_price: Optional[float] = None) -> Optional[int]:
+        """Active jobs matching the filters via a count() aggregation, or None when some filter can't be counted in Firestore"""
+        if price_buckets_between(min_price, max_price)[0] == []:
+            return 0
+        q, checks = JobsRepo._active_query(category, urgency, location, min_price, max_price)
+        if checks:
+            return None
+
+        async def load():
+            result = await q.count().get()
+            return int(result[0][0].value) if result and result[0] else 0
+        key = "jobs:count:" + json.dumps([category, urgency, location, min_price, max_price], default=str)
+        return await doc_cache.get_or_load(key, JobsRepo.COUNT_CACHE_TTL_SECONDS, load)
+
+    @staticmethod
+    async def list_active(category: Optional[str] = None, urgency: Optional[str] = None, location: Optional[str] = None, min_price: Optional[float] = None, max_price: Optional[float] = None, text: Optional[str] = None, limit: int = 20, cursor: Optional[str] = None, page: int = 1) -> dict[str, Any]:
+        """One page of active jobs, newest first: {jobs, hasMore, nextCursor}.
+
+        Category, urgency, place and price bucket are filtered by the query
+        (requires a composite index per filter combination, ending in
+        createdAt DESC, __name__ DESC). What the index can't express (exact
+        price bounds inside the edge buckets, unknown places, `text`) is checked
+        per job; the scan then over-fetches in batches sized from the match rate
+        seen so far until the page is full. `page` is only used without a cursor.
+        """
+        limit = max(1, limit)
+        if price_buckets_between(min_price, max_price)[0] == []:
+            return {"jobs": [], "hasMore": False, "nextCursor": None}
+        q, checks = JobsRepo._active_query(category, urgency, location, min_price, max_price)
+        if text:
+            needle = text.lower()
+            checks.append(lambda job: needle in str(job.get("title", "")).lower() or needle in str(job.get("description", "")).lower())
+        q = q.order_by("createdAt", direction="DESCENDING").order_by(DOCUMENT_ID, direction="DESCENDING")
+        skip = 0
+        if cursor:
+            pos = decode_cursor(cursor)
+            if "id" not in pos or "createdAt" not in pos:
+                raise ValueError("Invalid cursor")
+            q = q.start_after({"createdAt": pos["createdAt"], DOCUMENT_ID: JobsRepo.col().document(pos["id"])})
+        elif page > 1:
+            skip = (page - 1) * limit
+            if not checks:
+                q = q.offset(skip)
+                skip = 0
+
+        want = skip + limit + 1
+        matched: list[dict[str, Any]] = []
+        scanned = 0
+        last = None
+        exhausted = False
+        batch = want if not checks else min(JobsRepo.LIST_MAX_BATCH, want * 2)
+        for _ in range(JobsRepo.LIST_MAX_ROUNDS):
+            scan = q
+            if last is not None:
+                scan = scan.start_after({"createdAt": last.get("createdAt"), DOCUMENT_ID: JobsRepo.col().document(last["id"])})
+            docs = await scan.limit(batch).get()
+            for d in docs:
+                job = d.to_dict() or {}
+                job["id"] = d.id
+                last = job
+                scanned += 1
+                if all(check(job) for check in checks):
+                    matched.append(job)
+                    if len(matched) >= want:
+                        break
+            if len(matched) >= want:
+                break
+            if len(docs) < batch:
+                exhausted = True
+                break
+            # Size the next batch to what the remaining matches should take at the rate seen so far
+            rate = max(len(matched), 1) / scanned
+            batch = min(JobsRepo.LIST_MAX_BATCH, math.ceil((want - len(matched)) / rate * 1.25))
+
+        jobs = matched[skip:skip + limit]
+        if len(matched) > skip + limit:
+            has_more, anchor = True, jobs[-1]
+        elif not exhausted and last is not None:
+            # Scan budget ran out before the page filled: resume after the last job looked at
+            has_more, anchor = True, last
+        else:
+            has_more, anchor = False, None
+        next_cursor = encode_cursor({"createdAt": anchor.get("createdAt"), "id": anchor["id"]}) if anchor else None
+        return {"jobs": jobs, "hasMore": has_more, "nextCursor": next_cursor}
+
+    @staticmethod
+    async def query(start: Optional[datetime] = None, end: Optional[datetime] = None, category: Optional[str] = None, location: Optional[str] = None, min_price: Optional[float] = None, max_price: Optional[float] = None, limit: int = 1000) -> list[dict[str, Any]]:
+        from .geo import match_place
         q = JobsRepo.col().where("status", "in", ["active", "completed"])  # requires index
         if start:
             q = q.where("createdAt", ">=", start)
@@ -252,8 +557,12 @@ class JobsRepo:
             q = q.where("createdAt", "<=", end)
         if category:
             q = q.where("category", "==", category)
-        # Firestore can't do LIKE; we can post-filter for location substring
-        docs = list(q.order_by("createdAt", direction="DESCENDING").limit(limit).stream())
+        area, district = match_place(location)
+        if district:
+            q = q.where("geo.district", "==", district)
+        elif area:
+            q = q.where("geo.area", "==", area)
+        docs = await q.order_by("createdAt", direction="DESCENDING").limit(limit).get()
         items = []
         for d in docs:
             obj = d.to_dict()
@@ -262,7 +571,8 @@ class JobsRepo:
                 continue
             if max_price is not None and obj.get("priceKes", 0) > max_price:
                 continue
-            if location and location.lower() not in str(obj.get("location", {})).lower():
+            # Places outside KENYA_AREAS can only be matched by substring
+            if location and not area and location.lower() not in str(obj.get("location", {})).lower():
                 continue
             items.append(obj)
         return items
@@ -272,13 +582,20 @@ class JobsRepo:
 class CreditRepo:
     @staticmethod
     def col():
-        return get_db().collection("credit_scores")
+        return get_async_db().collection("credit_scores")
+
+    @staticmethod
+    async def find(user_id: str) -> Optional[dict[str, Any]]:
+        async def load():
+            doc = await CreditRepo.col().document(user_id).get()
+            return (doc.to_dict() or {"currentScore": 300}) if doc.exists else None
+        return await doc_cache.get_or_load(f"credit:{user_id}", settings.credit_cache_ttl_seconds, load)
 
     @staticmethod
-    def get_or_create(user_id: str) -> dict[str, Any]:
+    async def get_or_create(user_id: str) -> dict[str, Any]:
         doc_ref = CreditRepo.col().document(user_id)
-        doc = doc_ref.get()
-        if not doc.exists:
+        data = await CreditRepo.find(user_id)
+        if data is None:
             data = {
                 "currentScore": 300,
                 "financialProfile": {
@@ -297,15 +614,16 @@ class CreditRepo:
                 },
                 "updatedAt": now_ts(),
             }
-            doc_ref.set(data)
-            return data
-        return doc.to_dict() or {"currentScore": 300}
+            await doc_ref.set(data)
+            await doc_cache.set(f"credit:{user_id}", data, settings.credit_cache_ttl_seconds)
+        return data
 
     @staticmethod
-    def update(user_id: str, updates: dict[str, Any]) -> dict[str, Any]:
+    async def update(user_id: str, updates: dict[str, Any]) -> dict[str, Any]:
         updates["updatedAt"] = now_ts()
-        CreditRepo.col().document(user_id).set(updates, merge=True)
-        doc = CreditRepo.col().document(user_id).get()
-        return doc.to_dict() or {}
+        await CreditRepo.col().document(user_id).set(updates, merge=True)
+        await doc_cache.invalidate(f"credit:{user_id}")
+        await _changed(user_id)
+        return await CreditRepo.find(user_id) or {}
 
 # Auto-reload trigger: 2025-10-12 08:01:44
@@ -0,0 +1,145 @@
+from __future__ import annotations
+from typing import Any, Iterable, Optional
+from datetime import datetime, timedelta, timezone
+from firebase_admin import firestore
+from .firebase import get_async_db
+from .ledger import tx_direction, SUCCESS_STATUSES
+from .unit_of_work import UnitOfWork
+
+
+def _txn_time(txn: dict[str, Any]) -> datetime:
+    """Transaction time as an aware UTC datetime"""
+    for key in ("initiatedAt", "date", "createdAt"):
+        value = txn.get(key)
+        if isinstance(value, str):
+            try:
+                value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            except ValueError:
+                continue
+        if isinstance(value, datetime):
+            return value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    return datetime.now(timezone.utc)
+
+
+def _bucket(txn: dict[str, Any], when: datetime, add, latest) -> dict[str, Any]:
+    """One transaction's contribution to its daily bucket; `add`/`latest` wrap values (Increment/Maximum, or plain)"""
+    try:
+        amount = abs(float(txn.get("amount") or 0))
+    except (TypeError, ValueError):
+        amount = 0.0
+    currency = str(txn.get("currencyCode") or "KES")
+    direction = tx_direction(txn.get("type"))
+    category = str(txn.get("category") or "uncategorized").lower()
+    success = str(txn.get("status") or "").lower() in SUCCESS_STATUSES
+    return {
+        "userId": txn.get("userId"),
+        "day": when.strftime("%Y-%m-%d"),
+        "count": add(1),
+        "successCount": add(1 if success else 0),
+        "lastActivityTs": latest(when.timestamp()),
+        "categories": {category: add(1)},
+        "currencies": {
+            currency: {
+                "inflow": add(amount if direction == "in" else 0.0),
+                "outflow": add(amount if direction == "out" else 0.0),
+                "absTotal": add(amount),
+                "count": add(1),
+            }
+        },
+    }
+
+
+def _merge(into: dict[str, Any], part: dict[str, Any]) -> None:
+    for key, value in part.items():
+        if isinstance(value, dict):
+            _merge(into.setdefault(key, {}), value)
+        elif key == "lastActivityTs":
+            into[key] = max(into.get(key, value), value)
+        elif isinstance(value, (int, float)):
+            into[key] = into.get(key, 0) + value
+        else:
+            into[key] = value
+
+
+def fold(txns: Iterable[dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    """Plain daily bucket documents by id for a set of transactions, as record() would build them"""
+    buckets: dict[str, dict[str, Any]] = {}
+    for txn in txns:
+        if not txn.get("userId"):
+            continue
+        when = _txn_time(txn)
+        _merge(buckets.setdefault(WalletRollups.doc_id(txn["userId"], when), {}), _bucket(txn, when, lambda v: v, lambda v: v))
+    return buckets
+
+
+class WalletRollups:
+    """Daily per-user analytics buckets maintained at transaction-write time.
+
+    One `wallet_rollups/{userId}_{YYYYMMDD}` document per user and day holds,
+    per currency, inflow/outflow/absolute total/count, plus transaction and
+    success counts and category counts, all updated with Increment so the
+    analytics endpoint reads at most `days` small documents. Success is
+    counted from the status the transaction was written with.
+    """
+
+    @staticmethod
+    def col():
+        return get_async_db().collection("wallet_rollups")
+
+    @staticmethod
+    def doc_id(user_id: str, day: datetime) -> str:
+        return f"{user_id}_{day.strftime('%Y%m%d')}"
+
+    @staticmethod
+    async def record(txn: dict[str, Any], uow: Optional[UnitOfWork] = None) -> None:
+        user_id = txn.get("userId")
+        if not user_id:
+            return
+        if uow is None:
+            async with UnitOfWork() as uow:
+                return await WalletRollups.record(txn, uow)
+        when = _txn_time(txn)
+        uow.set(WalletRollups.col().document(WalletRollups.doc_id(user_id, when)),
+                _bucket(txn, when, firestore.Increment, firestore.Maximum), merge=True)
+
+    @staticmethod
+    async def summarize(user_id: str, days: int, now: Optional[datetime] = None) -> dict[str, Any]:
+        """Sum the daily buckets covering the last `days` days (today included)"""
+        now = now or datetime.utcnow()
+        col = WalletRollups.col()
+        refs = [col.document(WalletRollups.doc_id(user_id, now - timedelta(days=i))) for i in range(max(days, 0) + 1)]
+
+        totals: dict[str, dict[str, float]] = {}
+        abs_totals: dict[str, float] = {}
+        currency_counts: dict[str, int] = {}
+        categories: dict[str, int] = {}
+        count = 0
+        success_count = 0
+        last_ts: Optional[float] = None
+        async for snap in get_async_db().get_all(refs):
+            if not snap.exists:
+                continue
+            bucket = snap.to_dict() or {}
+            count += int(bucket.get("count", 0))
+            success_count += int(bucket.get("successCount", 0))
+            ts = bucket.get("lastActivityTs")
+            if ts is not None and (last_ts is None or ts > last_ts):
+                last_ts = ts
+            for cat, n in (bucket.get("categories") or {}).items():
+                categories[cat] = categories.get(cat, 0) + int(n)
+            for cur, c in (bucket.get("currencies") or {}).items():
+                t = totals.setdefault(cur, {"inflow": 0.0, "outflow": 0.0, "net": 0.0})
+                t["inflow"] += float(c.get("inflow", 0))
+                t["outflow"] += float(c.get("outflow", 0))
+                t["net"] = t["inflow"] - t["outflow"]
+                abs_totals[cur] = abs_totals.get(cur, 0.0) + float(c.get("absTotal", 0))
+                currency_counts[cur] = currency_counts.get(cur, 0) + int(c.get("count", 0))
+
+        return {
+            "totalsByCurrency": totals,
+            "averagesByCurrency": {cur: abs_totals[cur] / max(currency_counts.get(cur, 0), 1) for cur in abs_totals},
+            "categoryCounts": categories,
+            "successRate": (success_count / count) if count else 0.0,
+            "totalTransactions": count,
+            "lastActivity": datetime.utcfromtimestamp(last_ts).isoformat() if last_ts is not None else None,
+        }
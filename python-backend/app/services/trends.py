@@ -0,0 +1,299 @@
+from __future__ import annotations
+import heapq
+import random
+import re
+from collections import OrderedDict
+from typing import Any, Iterable, Optional
+from datetime import datetime, timedelta, timezone
+from firebase_admin import firestore
+from .cache import doc_cache
+from .firebase import get_async_db
+from .geo import KENYA_AREAS, category_of, match_place
+from .heatmap import _price, category_distribution, job_geo, job_time
+from .unit_of_work import UnitOfWork
+from ..config import settings
+
+
+EVENTS = ("posted", "completed")
+
+# An hour is treated as closed (and cached for good) this long after it ends, so
+# writes from other workers with slightly skewed clocks have landed
+CLOSE_GRACE_SECONDS = 120
+
+# Skills are user-entered: at most this many per job, and each worker adds at most
+# MAX_SKILLS_PER_HOUR distinct skills to an hour's bucket; the rest count as OTHER_SKILL
+MAX_SKILLS_PER_JOB = 10
+MAX_SKILLS_PER_HOUR = 100
+OTHER_SKILL = "other"
+
+
+def hour_key(when: datetime) -> str:
+    return when.astimezone(timezone.utc).strftime("%Y%m%d%H")
+
+
+def normalize_skill(skill: Any) -> Optional[str]:
+    """Lowercase words (plus + and #, as in c++ or c#) and single spaces, at most 32 chars, so nothing odd reaches a field path"""
+    s = re.sub(r"(?:[^\w+#]|_)+", " ", str(skill or "").lower()).strip()[:32].strip()
+    return s or None
+
+
+def job_skills(job: dict[str, Any]) -> list[str]:
+    """A job's distinct normalized skills, in the order given, capped at MAX_SKILLS_PER_JOB"""
+    skills = job.get("skills")
+    if not isinstance(skills, list):
+        return []
+    out: list[str] = []
+    for s in (normalize_skill(x) for x in skills):
+        if s and s != OTHER_SKILL and s not in out:
+            out.append(s)
+            if len(out) >= MAX_SKILLS_PER_JOB:
+                break
+    return out
+
+
+def _tracked(skills: list[str], seen: set[str]) -> set[str]:
+    """Skills kept under their own key given those an hour already tracks (updated in place); the rest fold into OTHER_SKILL"""
+    tracked = set()
+    for s in skills:
+        if s not in seen and len(seen) < MAX_SKILLS_PER_HOUR:
+            seen.add(s)
+        tracked.add(s if s in seen else OTHER_SKILL)
+    return tracked
+
+
+def _add(into: dict[str, Any], src: dict[str, Any]) -> None:
+    """Sum a counter tree ({count, total, categories: {...}} nodes, or plain ints) into `into`"""
+    for k, v in src.items():
+        if isinstance(v, dict):
+            _add(into.setdefault(k, {}), v)
+        else:
+            into[k] = into.get(k, 0) + v
+
+
+def growth_rate(current: float, previous: float) -> float:
+    if previous > 0:
+        return (current - previous) / previous * 100
+    return 100.0 if current > 0 else 0.0
+
+
+def trend_label(growth: float) -> str:
+    if growth > 20:
+        return "hot"
+    if growth > 0:
+        return "rising"
+    if growth < -20:
+        return "cooling"
+    return "stable"
+
+
+def _count(node: Any) -> int:
+    return int(node.get("count", 0)) if isinstance(node, dict) else int(node or 0)
+
+
+def compare(current: dict[str, Any], previous: dict[str, Any]) -> dict[str, dict[str, Any]]:
+    """{key: {current, previous, growthRate, trend}} over the union of keys"""
+    out = {}
+    for key in set(current) | set(previous):
+        cur, prev = _count(current.get(key)), _count(previous.get(key))
+        g = growth_rate(cur, prev)
+        out[key] = {"current": cur, "previous": prev, "growthRate": g, "trend": trend_label(g)}
+    return out
+
+
+def top_k(comparison: dict[str, dict[str, Any]], k: int, min_current: int = 1) -> list[dict[str, Any]]:
+    """The k fastest-growing keys (ties broken by current volume)"""
+    rows = ({"key": key} | v for key, v in comparison.items() if v["current"] >= min_current)
+    return heapq.nlargest(k, rows, key=lambda r: (r["growthRate"], r["current"]))
+
+
+def _counters(job: dict[str, Any], one: Any, price: Any, skills: set[str]) -> dict[str, Any]:
+    """One job's contribution to an event's counters; `one`/`price` are numbers or Increment transforms"""
+    category = category_of(job)
+    counters: dict[str, Any] = {"categories": {category: {"count": one, "total": price}}}
+    area = job_geo(job).get("area")
+    if area:
+        counters["areas"] = {area: {"count": one, "total": price, "categories": {category: {"count": one, "total": price}}}}
+    if skills:
+        counters["skills"] = {s: one for s in skills}
+    return counters
+
+
+def fold(jobs: Iterable[dict[str, Any]], since: Optional[datetime] = None) -> dict[str, dict[str, Any]]:
+    """Plain hourly bucket documents by id for a set of jobs, as record() would build them (all in shard 0).
+
+    Jobs count as posted at createdAt and, when completed, as completed at completedAt.
+    """
+    hours: dict[str, dict[str, Any]] = {}
+    seen: dict[str, set[str]] = {}
+    for job in jobs:
+        events = [("posted", job_time(job))]
+        if job.get("status") == "completed" and job.get("completedAt"):
+            events.append(("completed", job_time({"createdAt": job["completedAt"]})))
+        for event, when in events:
+            if since is not None and when < since:
+                continue
+            key = hour_key(when)
+            doc = hours.setdefault(f"{key}_0", {"hour": key})
+            skills = _tracked(job_skills(job), seen.setdefault(f"{key}:{event}", set()))
+            _add(doc.setdefault(event, {}), _counters(job, 1, _price(job), skills))
+    return hours
+
+
+class JobTrends:
+    """Sliding-window job counters in hourly buckets, maintained as jobs are posted and completed.
+
+    Each hour is spread over `trends_shards` documents,
+    `job_trends_hourly/{YYYYMMDDHH}_{n}` with a random n per job, so the current
+    hour isn't a single-document write hotspot. Together they hold, per event
+    (posted/completed), count and total priceKes per category, per area (with
+    a per-category breakdown) and counts per skill (capped, see
+    MAX_SKILLS_PER_HOUR), all written with Increment.
+    A window is the sum of its hourly buckets, each the sum of its shards. Closed hours never change, so each
+    worker caches them and only re-reads the hours it hasn't seen plus the
+    current one: a window costs O(buckets) in memory and O(new hours) in reads.
+    """
+
+    # Closed hours by key, oldest first; {} for hours with no jobs
+    _closed: "OrderedDict[str, dict[str, Any]]" = OrderedDict()
+    # Skills this worker has written to the current hour, by event: (hour key, {event: skills})
+    _hour_skills: tuple[Optional[str], dict[str, set[str]]] = (None, {})
+
+    @staticmethod
+    def col():
+        return get_async_db().collection("job_trends_hourly")
+
+    @staticmethod
+    async def record(job: dict[str, Any], event: str, when: Optional[datetime] = None, uow: Optional[UnitOfWork] = None) -> None:
+        if uow is None:
+            async with UnitOfWork() as uow:
+                return await JobTrends.record(job, event, when, uow)
+        ref, data = JobTrends.bucket_write(job, event, when)
+        uow.set(ref, data, merge=True)
+
+    @staticmethod
+    def bucket_write(job: dict[str, Any], event: str, when: Optional[datetime] = None) -> tuple[Any, dict[str, Any]]:
+        """(document, data) to set with merge=True to count one event, for writers other than a UnitOfWork (transactions)"""
+        key = hour_key(when or datetime.now(timezone.utc))
+        if JobTrends._hour_skills[0] != key:
+            JobTrends._hour_skills = (key, {})
+        skills = _tracked(job_skills(job), JobTrends._hour_skills[1].setdefault(event, set()))
+        counters = _counters(job, firestore.Increment(1), firestore.Increment(_price(job)), skills)
+        shard = random.randrange(max(1, settings.trends_shards))
+        return JobTrends.col().document(f"{key}_{shard}"), {"hour": key, event: counters}
+
+    @staticmethod
+    async def _hours(keys: list[str]) -> dict[str, dict[str, Any]]:
+        """Buckets for the given (sorted) hour keys: closed ones from the cache, the rest from Firestore"""
+        closed_before = hour_key(datetime.now(timezone.utc) - timedelta(seconds=CLOSE_GRACE_SECONDS))
+        cache = JobTrends._closed
+        missing = [k for k in keys if k not in cache]
+        fetched: dict[str, dict[str, Any]] = {}
+        if missing:
+            q = JobTrends.col().where("hour", ">=", missing[0]).where("hour", "<=", missing[-1])
+            async for d in q.stream():
+                doc = d.to_dict() or {}
+                bucket = fetched.setdefault(doc["hour"], {})
+                for event in EVENTS:
+                    if doc.get(event):
+                        _add(bucket.setdefault(event, {}), doc[event])
+            for k in missing:
+                if k < closed_before:
+                    cache[k] = fetched.get(k, {})
+                    cache.move_to_end(k)
+            while len(cache) > settings.trends_max_days * 2 * 24 + 48:
+                cache.popitem(last=False)
+        return {k: cache[k] if k in cache else fetched.get(k, {}) for k in keys}
+
+    @staticmethod
+    async def windows(days: int, now: Optional[datetime] = None) -> tuple[dict[str, Any], dict[str, Any]]:
+        """(current, previous) counter trees: the last `days` days and the `days` before them"""
+        now = now or datetime.now(timezone.utc)
+        hours = days * 24
+        keys = [hour_key(now - timedelta(hours=i)) for i in range(2 * hours - 1, -1, -1)]
+        buckets = await JobTrends._hours(keys)
+        previous: dict[str, Any] = {}
+        current: dict[str, Any] = {}
+        for i, k in enumerate(keys):
+            bucket = buckets[k]
+            target = previous if i < hours else current
+            for event in EVENTS:
+                if bucket.get(event):
+                    _add(target.setdefault(event, {}), bucket[event])
+        return current, previous
+
+    @staticmethod
+    def clear_cache() -> None:
+        JobTrends._closed.clear()
+
+
+def window_days(period: int) -> int:
+    return max(1, min(int(period), settings.trends_max_days))
+
+
+def _prices(categories: dict[str, Any]) -> dict[str, dict[str, Any]]:
+    return {
+        cat: {"total": c.get("total", 0), "count": c.get("count", 0), "average": c["total"] / c["count"] if c.get("count") else 0}
+        for cat, c in categories.items()
+    }
+
+
+async def area_trends(period: int, limit: int = 10) -> dict[str, dict[str, Any]]:
+    """Posting growth per area against the preceding window of the same length, fastest-growing first"""
+    days = window_days(period)
+
+    async def load():
+        current, previous = await JobTrends.windows(days)
+        cur = (current.get("posted") or {}).get("areas") or {}
+        prev = (previous.get("posted") or {}).get("areas") or {}
+        rows = compare({a: cur.get(a, 0) for a in KENYA_AREAS}, {a: prev.get(a, 0) for a in KENYA_AREAS})
+        return {
+            r["key"]: {
+                "currentJobs": r["current"],
+                "previousJobs": r["previous"],
+                "growthRate": r["growthRate"],
+                "trend": r["trend"],
+                "coordinates": KENYA_AREAS[r["key"]]["coordinates"],
+                "categories": category_distribution([cur.get(r["key"]) or {}]),
+            }
+            for r in top_k(rows, limit, min_current=0)
+        }
+    return await doc_cache.get_or_load(f"trends:areas:{days}:{limit}", settings.trends_cache_ttl_seconds, load)
+
+
+async def market_trends(period: int, location: Optional[str] = None, limit: int = 10) -> dict[str, Any]:
+    """Category, area and skill volumes for the window, with growth and the top-k risers of each.
+
+    A recognised `location` narrows the category figures to that area; areas
+    and skills are always platform-wide.
+    """
+    days = window_days(period)
+    area, _ = match_place(location)
+
+    async def load():
+        current, previous = await JobTrends.windows(days)
+        posted, before = current.get("posted") or {}, previous.get("posted") or {}
+        completed = current.get("completed") or {}
+
+        def pick(tree):
+            if area:
+                tree = (tree.get("areas") or {}).get(area) or {}
+            return tree.get("categories") or {}
+
+        categories = pick(posted)
+        areas = posted.get("areas") or {}
+        skills = {s: n for s, n in (posted.get("skills") or {}).items() if s != OTHER_SKILL}
+        return {
+            "jobTrends": {
+                "categoryTrends": {cat: c.get("count", 0) for cat, c in categories.items()},
+                "priceTrends": _prices(categories),
+                "totalJobs": sum(c.get("count", 0) for c in categories.values()),
+                "completedJobs": sum(c.get("count", 0) for c in pick(completed).values()),
+                "trending": top_k(compare(categories, pick(before)), limit),
+            },
+            "locationTrends": {a: c.get("count", 0) for a, c in areas.items()},
+            "trendingLocations": top_k(compare(areas, before.get("areas") or {}), limit),
+            "skillTrends": dict(heapq.nlargest(limit * 5, skills.items(), key=lambda kv: kv[1])),
+            "trendingSkills": top_k(compare(skills, before.get("skills") or {}), limit),
+            "location": area or "All",
+        }
+    return await doc_cache.get_or_load(f"trends:market:{days}:{area}:{limit}", settings.trends_cache_ttl_seconds, load)
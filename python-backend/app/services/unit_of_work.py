@@ -0,0 +1,97 @@
+from __future__ import annotations
+import inspect
+from typing import Any, Awaitable, Callable, TypeVar, Union
+from datetime import datetime, timezone
+from firebase_admin import firestore
+from .firebase import get_async_db, is_mock_db
+
+T = TypeVar("T")
+
+# Firestore rejects batches with more writes than this
+MAX_WRITES = 500
+
+
+class UnitOfWork:
+    """Related writes committed together as one Firestore WriteBatch (or the mock's equivalent).
+
+        async with UnitOfWork() as uow:
+            uow.create(app_ref, application)
+            uow.update(job_ref, {"applicationCount": firestore.Increment(1)})
+            uow.after_commit(lambda: job_index.remove(job_id))
+
+    Nothing is written until the block exits without an exception; then every
+    write lands in a single round-trip, or none do (e.g. a create() whose
+    document already exists raises AlreadyExists and the batch is dropped).
+    Callbacks registered with after_commit (cache invalidation, in-process
+    indexes) run only once the commit has succeeded.
+    """
+
+    def __init__(self):
+        self._batch = get_async_db().batch()
+        self._writes = 0
+        self._callbacks: list[Callable[[], Union[None, Awaitable[None]]]] = []
+        self.committed_at: datetime | None = None
+
+    def _count(self) -> None:
+        self._writes += 1
+        if self._writes > MAX_WRITES:
+            raise ValueError(f"Unit of work exceeds {MAX_WRITES} writes")
+
+    def create(self, ref, data: dict[str, Any]) -> None:
+        self._count()
+        self._batch.create(ref, data)
+
+    def set(self, ref, data: dict[str, Any], merge: bool = False) -> None:
+        self._count()
+        self._batch.set(ref, data, merge=merge)
+
+    def update(self, ref, data: dict[str, Any]) -> None:
+        self._count()
+        self._batch.update(ref, data)
+
+    def delete(self, ref) -> None:
+        self._count()
+        self._batch.delete(ref)
+
+    def after_commit(self, callback: Callable[[], Union[None, Awaitable[None]]]) -> None:
+        self._callbacks.append(callback)
+
+    async def commit(self) -> None:
+        if self._writes:
+            await self._batch.commit()
+        self.committed_at = datetime.now(timezone.utc)
+        for callback in self._callbacks:
+            result = callback()
+            if inspect.isawaitable(result):
+                await result
+
+    def resolved(self, data: dict[str, Any]) -> dict[str, Any]:
+        """Copy of written data for a response, with SERVER_TIMESTAMP replaced by the commit time"""
+        when = (self.committed_at or datetime.now(timezone.utc)).isoformat()
+        return {k: when if v is firestore.SERVER_TIMESTAMP else v for k, v in data.items()}
+
+    async def __aenter__(self) -> "UnitOfWork":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is None:
+            await self.commit()
+        return False
+
+
+async def run_transaction(fn: Callable[[Any], Awaitable[T]]) -> T:
+    """Run `await fn(transaction)` as a Firestore transaction and return its result.
+
+    For read-modify-write that must not act on stale data: read with
+    `ref.get(transaction=transaction)`, then write with transaction.set/update.
+    If a document read has changed by commit time, fn is run again from the
+    start, so it must not have side effects beyond the transaction's writes.
+    """
+    db = get_async_db()
+    if is_mock_db():
+        return await db.run_transaction(fn)
+
+    @firestore.async_transactional
+    async def run(transaction):
+        return await fn(transaction)
+    return await run(db.transaction())
@@ -0,0 +1,160 @@
+from __future__ import annotations
+from typing import Any, Awaitable, Callable, Optional
+
+# Carriers truncate (or reject) USSD responses longer than this, "CON "/"END " included
+USSD_MAX_CHARS = 182
+
+MORE_KEY = "98"
+BACK_KEY = "0"
+_MORE_FOOTER = f"\n\n{MORE_KEY}. More\n{BACK_KEY}. Back"
+
+INVALID_CHOICE = "END Invalid choice. Please try again."
+
+
+class Menu:
+    """Numbered options; each routes to another node by id"""
+
+    def __init__(self, id: str, title: str, options: list[tuple[str, str, str]], otherwise: str = INVALID_CHOICE):
+        self.id = id
+        self.title = title
+        self.options = options  # (key, label, target node id)
+        self.otherwise = otherwise
+        self.text = "CON " + title + "".join(f"\n{key}. {label}" for key, label, _ in options)
+
+
+class Text:
+    """Fixed END response"""
+
+    def __init__(self, id: str, text: str):
+        self.id = id
+        self.text = text
+
+
+class Action:
+    """END (or CON) response computed from the session and user"""
+
+    def __init__(self, id: str, run: Callable[[dict, dict], Awaitable[str]]):
+        self.id = id
+        self.run = run
+
+
+class Listing:
+    """Loaded list of items, paged under USSD_MAX_CHARS with 98 for more and 0 for back"""
+
+    def __init__(self, id: str, header: str, load: Callable[[dict, dict], Awaitable[list[str]]],
+                 empty: str, note: str = ""):
+        self.id = id
+        self.header = header
+        self.load = load
+        self.empty = empty
+        self.note = note
+
+
+def _fit(text: str, room: int) -> str:
+    return text if len(text) <= room else text[:max(room - 3, 0)] + "..."
+
+
+def paginate(header: str, items: list[str], note: str = "", limit: int = USSD_MAX_CHARS) -> list[str]:
+    """Pack items into as few responses as fit the limit: CON pages with a More footer, then one END page"""
+    # Reserve room for whichever footer the page ends up with
+    reserve = max(len(_MORE_FOOTER), len("\n\n" + note) if note else 0)
+    head = "CON " + header + "\n"
+    room = limit - len(head) - reserve
+    pages: list[list[str]] = [[]]
+    used = 0
+    for item in items:
+        line = "\n" + _fit(item, room - 1)
+        if pages[-1] and used + len(line) > room:
+            pages.append([])
+            used = 0
+        pages[-1].append(line)
+        used += len(line)
+    out = [head + "".join(lines) + _MORE_FOOTER for lines in pages[:-1]]
+    out.append("END " + header + "\n" + "".join(pages[-1]) + ("\n\n" + note if note else ""))
+    return out
+
+
+class MenuEngine:
+    """USSD menu tree compiled to a (node, key) -> node table.
+
+    The session remembers the node and the inputs already consumed, so each hop
+    only applies the new keys instead of re-walking the tree from the root.
+    Listing pages are rendered once when entered and kept on the session.
+    """
+
+    def __init__(self, root: str, nodes: list[Any]):
+        self.root = root
+        self.nodes: dict[str, Any] = {}
+        for node in nodes:
+            if node.id in self.nodes:
+                raise ValueError(f"Duplicate USSD node {node.id!r}")
+            self.nodes[node.id] = node
+        if root not in self.nodes or not isinstance(self.nodes[root], Menu):
+            raise ValueError(f"USSD root {root!r} must be a Menu")
+
+        for node in nodes:
+            if isinstance(node, (Menu, Text)) and len(node.text) > USSD_MAX_CHARS:
+                raise ValueError(f"USSD node {node.id!r} is {len(node.text)} chars, over {USSD_MAX_CHARS}")
+
+        self.routes: dict[tuple[str, str], str] = {}
+        for node in nodes:
+            if not isinstance(node, Menu):
+                continue
+            for key, _, target in node.options:
+                if target not in self.nodes:
+                    raise ValueError(f"USSD node {node.id!r} option {key} targets unknown node {target!r}")
+                self.routes[(node.id, key)] = target
+                if isinstance(self.nodes[target], Listing):
+                    self.routes.setdefault((target, BACK_KEY), node.id)
+
+    async def _enter(self, node_id: str, session: dict, user: dict) -> Optional[str]:
+        """Move to a node; returns the response if the node ends the dialog"""
+        node = self.nodes[node_id]
+        if isinstance(node, Text):
+            return node.text
+        if isinstance(node, Action):
+            return await node.run(session, user)
+        session["node"] = node_id
+        session["page"] = 0
+        session["pages"] = None
+        if isinstance(node, Listing):
+            items = await node.load(session, user)
+            if not items:
+                return node.empty
+            session["pages"] = paginate(node.header, items, node.note)
+        return None
+
+    async def _step(self, key: str, session: dict, user: dict) -> Optional[str]:
+        node_id = session["node"]
+        node = self.nodes[node_id]
+        if isinstance(node, Listing) and key == MORE_KEY and session["page"] + 1 < len(session["pages"]):
+            session["page"] += 1
+            return None
+        target = self.routes.get((node_id, key))
+        if target is None:
+            return node.otherwise if isinstance(node, Menu) else INVALID_CHOICE
+        return await self._enter(target, session, user)
+
+    def _render(self, session: dict) -> str:
+        node = self.nodes[session["node"]]
+        if isinstance(node, Listing):
+            return session["pages"][session["page"]]
+        return node.text
+
+    async def handle(self, session: dict, user: dict, inputs: list[str]) -> str:
+        """Response for the dialog's full input list (USSD resends every key pressed so far)"""
+        consumed = session.get("path") or []
+        if session.get("node") and inputs[:len(consumed)] == consumed:
+            pending = inputs[len(consumed):]
+        else:
+            session["node"] = self.root
+            session["page"] = 0
+            session["pages"] = None
+            pending = inputs
+        session["path"] = inputs
+
+        for key in pending:
+            response = await self._step(key, session, user)
+            if response is not None:
+                return response
+        return self._render(session)
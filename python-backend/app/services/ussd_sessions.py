@@ -0,0 +1,137 @@
+from __future__ import annotations
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Optional
+from ..config import settings
+from .cache import dumps, get_redis, loads
+
+
+def new_session(phone_number: str, ttl: float) -> dict[str, Any]:
+    """Fresh session state: the caller's user lookup, doc snapshot and menu path are filled in by the router"""
+    return {
+        "phoneNumber": phone_number,
+        "user": None,
+        # Slimmed wallet/credit docs loaded on first use; dropped when the user's docs are written
+        "snapshot": {},
+        "cachedAt": None,
+        # Menu position: current node, inputs consumed so far, rendered pages of a list node
+        "node": None,
+        "path": [],
+        "page": 0,
+        "pages": None,
+        "data": {},
+        "startTime": datetime.now(),
+        "expiresAt": time.time() + ttl,
+    }
+
+
+async def drop_if_stale(store, session: dict[str, Any]) -> None:
+    """Forget the cached user and snapshot if the user's docs were written since they were loaded"""
+    if session["user"] is None:
+        return
+    stale = await store.stale_since(session["user"]["userId"])
+    if stale is not None and stale >= session["cachedAt"]:
+        session["user"] = None
+        session["snapshot"] = {}
+
+
+class MemorySessionStore:
+    """Per-worker sessions that expire a fixed TTL after they start.
+
+    Every session gets the same TTL at creation, so insertion order is expiry
+    order: expired sessions are popped off the front of the OrderedDict on each
+    call, which is O(1) amortized instead of scanning every live session.
+    """
+
+    backend = "memory"
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._sessions: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        # userId -> last write time, oldest first; entries older than the TTL can't matter to any session
+        self._stale: OrderedDict[str, float] = OrderedDict()
+        self.expired = 0
+
+    def _expire(self) -> None:
+        now = time.time()
+        while self._sessions:
+            sid, session = next(iter(self._sessions.items()))
+            if session["expiresAt"] > now:
+                break
+            del self._sessions[sid]
+            self.expired += 1
+
+    async def get(self, session_id: str) -> Optional[dict[str, Any]]:
+        self._expire()
+        return self._sessions.get(session_id)
+
+    async def save(self, session_id: str, session: dict[str, Any]) -> None:
+        self._expire()
+        # Re-saving keeps the original position, which is still the right expiry slot
+        self._sessions[session_id] = session
+
+    async def delete(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+
+    async def mark_stale(self, user_id: str) -> None:
+        now = time.time()
+        self._stale.pop(user_id, None)
+        self._stale[user_id] = now
+        while next(iter(self._stale.values())) <= now - self.ttl:
+            self._stale.popitem(last=False)
+
+    async def stale_since(self, user_id: str) -> Optional[float]:
+        return self._stale.get(user_id)
+
+    def stats(self) -> dict[str, Any]:
+        return {"backend": self.backend, "active": len(self._sessions), "expired": self.expired, "staleUsers": len(self._stale)}
+
+
+class RedisSessionStore:
+    """Sessions shared by all workers; Redis drops each key when its session expires"""
+
+    backend = "redis"
+
+    def __init__(self, redis, ttl: float, prefix: str = "ussd:session:", stale_prefix: str = "ussd:stale:"):
+        self.redis = redis
+        self.ttl = ttl
+        self.prefix = prefix
+        self.stale_prefix = stale_prefix
+
+    async def get(self, session_id: str) -> Optional[dict[str, Any]]:
+        raw = await self.redis.get(self.prefix + session_id)
+        return loads(raw) if raw is not None else None
+
+    async def save(self, session_id: str, session: dict[str, Any]) -> None:
+        remaining = math.ceil(session["expiresAt"] - time.time())
+        if remaining <= 0:
+            await self.delete(session_id)
+            return
+        await self.redis.set(self.prefix + session_id, dumps(session), ex=remaining)
+
+    async def delete(self, session_id: str) -> None:
+        await self.redis.delete(self.prefix + session_id)
+
+    async def mark_stale(self, user_id: str) -> None:
+        await self.redis.set(self.stale_prefix + user_id, repr(time.time()), ex=math.ceil(self.ttl))
+
+    async def stale_since(self, user_id: str) -> Optional[float]:
+        raw = await self.redis.get(self.stale_prefix + user_id)
+        return float(raw) if raw is not None else None
+
+    def stats(self) -> dict[str, Any]:
+        return {"backend": self.backend, "redis": type(self.redis).__name__}
+
+
+def _make_store():
+    ttl = settings.ussd_session_ttl_seconds
+    if settings.ussd_session_store == "redis":
+        return RedisSessionStore(get_redis(), ttl)
+    if settings.ussd_session_store != "memory":
+        print(f"[WARNING] Unknown USSD_SESSION_STORE {settings.ussd_session_store!r}, using memory")
+    return MemorySessionStore(ttl)
+
+
+session_store = _make_store()
@@ -0,0 +1,92 @@
+from __future__ import annotations
+import asyncio
+import random
+from typing import Any, Optional
+from firebase_admin import firestore
+from .cache import doc_cache
+from .firebase import get_async_db
+from ..config import settings
+
+
+class ViewCounter:
+    """Job view counts, buffered per worker and written to sharded counter documents.
+
+    A view only bumps an in-memory delta; every `flush_seconds` the deltas are
+    written as one Increment per job to a random one of its `shards` documents
+    (`job_view_shards/{jobId}_{n}`), so a popular job spreads its writes over
+    several documents and a page view never waits on a write. Counts are read
+    by summing the shards, cached briefly, plus this worker's unflushed views.
+    """
+
+    def __init__(self, shards: int, flush_seconds: float):
+        self.shards = max(1, shards)
+        self.flush_seconds = flush_seconds
+        self._pending: dict[str, int] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set[asyncio.Task] = set()
+        self.views = 0
+        self.writes = 0
+
+    @staticmethod
+    def col():
+        return get_async_db().collection("job_view_shards")
+
+    def add(self, job_id: str) -> None:
+        """Count a view; written on the next flush"""
+        self._pending[job_id] = self._pending.get(job_id, 0) + 1
+        self.views += 1
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.flush_seconds, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        task = asyncio.get_running_loop().create_task(self.flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self) -> int:
+        """Write all buffered deltas; returns the number of shard writes"""
+        batch, self._pending = self._pending, {}
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        async def write(job_id: str, delta: int) -> int:
+            shard = random.randrange(self.shards)
+            try:
+                await ViewCounter.col().document(f"{job_id}_{shard}").set(
+                    {"jobId": job_id, "shard": shard, "count": firestore.Increment(delta)}, merge=True)
+                return 1
+            except Exception as e:
+                print(f"[WARNING] View flush failed for {job_id}, requeueing: {e}")
+                self._pending[job_id] = self._pending.get(job_id, 0) + delta
+                return 0
+
+        written = sum(await asyncio.gather(*(write(j, d) for j, d in batch.items())))
+        self.writes += written
+        if self._pending and self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.flush_seconds, self._on_timer)
+        return written
+
+    async def count(self, job_id: str, base: Any = 0) -> int:
+        """Total views: `base` (the job's legacy views field) plus all shards plus unflushed views here"""
+        async def load():
+            refs = [ViewCounter.col().document(f"{job_id}_{n}") for n in range(self.shards)]
+            total = 0
+            async for snap in get_async_db().get_all(refs):
+                if snap.exists:
+                    total += int((snap.to_dict() or {}).get("count", 0))
+            return total
+        shards = await doc_cache.get_or_load(f"views:{job_id}", settings.job_views_cache_ttl_seconds, load)
+        return int(base or 0) + shards + self._pending.get(job_id, 0)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "views": self.views,
+            "writes": self.writes,
+            "pendingJobs": len(self._pending),
+            "coalescingRatio": (self.views / self.writes) if self.writes else 0.0,
+        }
+
+
+job_views = ViewCounter(settings.job_view_shards, settings.job_views_flush_seconds)
@@ -0,0 +1,55 @@
+from __future__ import annotations
+import re
+from ..config import settings
+
+
+# Country codes whose numbers may be stored with the national trunk '0' after the code (+2540..., +270...)
+TRUNK_ZERO_COUNTRIES = ("254", "27")
+
+_SEPARATORS = re.compile(r"[\s\-().]")
+
+
+def to_e164(raw: str | None, default_country: str | None = None) -> str | None:
+    """Canonical +<country><national> form, or None if it can't be a phone number.
+
+    Accepts international (+254..., 00254..., 254...), local trunk (07..., 01...)
+    and bare national (7xxxxxxxx) numbers; the trunk '0' after a country code is dropped.
+    """
+    if not raw:
+        return None
+    s = _SEPARATORS.sub("", str(raw))
+    cc = default_country or settings.default_phone_country
+    if s.startswith("00"):
+        s = "+" + s[2:]
+    if s.startswith("+"):
+        digits = s[1:]
+    elif any(s.startswith(c) for c in TRUNK_ZERO_COUNTRIES) and len(s) > 9:
+        digits = s
+    elif s.startswith("0"):
+        digits = cc + s[1:]
+    elif len(s) == 9:
+        digits = cc + s
+    else:
+        digits = s
+    for c in TRUNK_ZERO_COUNTRIES:
+        if digits.startswith(c + "0"):
+            digits = c + digits[len(c) + 1:]
+    if not digits.isdigit() or not 8 <= len(digits) <= 15:
+        return None
+    return "+" + digits
+
+
+def phone_variants(raw: str | None) -> list[str]:
+    """Forms a number may have been stored in before canonicalization, canonical first"""
+    if not raw:
+        return []
+    stripped = _SEPARATORS.sub("", str(raw))
+    canonical = to_e164(stripped)
+    if not canonical:
+        return [stripped]
+    variants = [canonical, stripped, canonical[1:]]
+    cc = next((c for c in TRUNK_ZERO_COUNTRIES if canonical[1:].startswith(c)), None)
+    if cc:
+        national = canonical[1 + len(cc):]
+        variants += ["0" + national, f"+{cc}0{national}"]
+    return list(dict.fromkeys(variants))
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Backfill script to canonicalize stored user phone numbers to E.164 (+254712345678).
+New and updated users are canonicalized on write; this fixes accounts created before that.
+
+Usage: python backfill_phone_numbers.py [--dry-run]
+"""
+
+import argparse
+import sys
+
+from app.services.firebase import get_db
+from app.utils.phone import to_e164
+
+
+def backfill_phone_numbers(dry_run=False):
+    """Rewrite every non-canonical phoneNumber, reporting numbers that can't be parsed."""
+
+    db = get_db()
+    users = db.collection('users').stream()
+
+    updated_count = 0
+    skipped_count = 0
+    invalid = []
+    canonical_owners = {}
+
+    for user in users:
+        data = user.to_dict() or {}
+        phone = data.get('phoneNumber')
+        if not phone:
+            skipped_count += 1
+            continue
+
+        canonical = to_e164(phone)
+        if not canonical:
+            invalid.append((user.id, phone))
+            continue
+
+        if canonical in canonical_owners and canonical_owners[canonical] != user.id:
+            print(f"  ⚠️  {user.id} and {canonical_owners[canonical]} share {canonical}")
+        canonical_owners[canonical] = user.id
+
+        if canonical == phone:
+            skipped_count += 1
+            continue
+
+        print(f"  ✏️  {user.id}: {phone} -> {canonical}")
+        if not dry_run:
+            db.collection('users').document(user.id).update({'phoneNumber': canonical})
+        updated_count += 1
+
+    print(f"\n📊 Backfill Complete{' (dry run)' if dry_run else ''}:")
+    print(f"   ✏️  Updated: {updated_count} users")
+    print(f"   ✅ Already canonical / no phone: {skipped_count} users")
+    print(f"   ❌ Unparseable: {len(invalid)} users")
+    for user_id, phone in invalid:
+        print(f"      {user_id}: {phone!r}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Canonicalize user phone numbers to E.164")
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without writing")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("   JASHO - Phone Number Backfill Script")
+    print("="*60)
+
+    try:
+        backfill_phone_numbers(args.dry_run)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Backfill cancelled by user")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ Error during backfill: {e}")
+        sys.exit(1)
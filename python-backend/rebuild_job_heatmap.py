@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Rebuild script for the job heatmap: recomputes each job's geo and priceBucket fields and
+rewrites the per-cell aggregates (job_heatmap_daily, job_heatmap_cells) from the jobs collection.
+Run after changing HEATMAP_GEOHASH_PRECISION, the area list or PRICE_BUCKETS, or to backfill
+old jobs (jobs without these fields don't show up in filtered job listings).
+
+Usage: python rebuild_job_heatmap.py [--dry-run]
+"""
+
+import argparse
+import sys
+
+from app.config import settings
+from app.services.firebase import get_db
+from app.services.geo import locate
+from app.services.heatmap import fold
+from app.services.repos import price_bucket
+
+AGGREGATE_COLLECTIONS = ("job_heatmap_daily", "job_heatmap_cells")
+
+
+def rebuild_job_heatmap(dry_run=False):
+    """Re-locate and re-bucket every active/completed job, then replace the aggregates with a fresh fold."""
+
+    db = get_db()
+    jobs = []
+    relocated = 0
+    unplaced = 0
+
+    for doc in db.collection('jobs').where('status', 'in', ['active', 'completed']).stream():
+        job = doc.to_dict() or {}
+        geo = locate(job.get('location'), settings.heatmap_geohash_precision)
+        bucket = price_bucket(job.get('priceKes'))
+        if geo['cell'] is None:
+            unplaced += 1
+        if job.get('geo') != geo or job.get('priceBucket') != bucket:
+            relocated += 1
+            if not dry_run:
+                db.collection('jobs').document(doc.id).update({'geo': geo, 'priceBucket': bucket})
+        job['geo'] = geo
+        job['priceBucket'] = bucket
+        jobs.append(job)
+
+    daily, cells = fold(jobs)
+    print(f"  🗺️  {len(jobs)} jobs -> {len(cells)} cells, {len(daily)} daily buckets")
+
+    if not dry_run:
+        for name in AGGREGATE_COLLECTIONS:
+            removed = 0
+            for doc in db.collection(name).stream():
+                db.collection(name).document(doc.id).delete()
+                removed += 1
+            print(f"  🧹 Cleared {removed} docs from {name}")
+        for name, docs in zip(AGGREGATE_COLLECTIONS, (daily, cells)):
+            for doc_id, doc in docs.items():
+                db.collection(name).document(doc_id).set(doc)
+
+    print(f"\n📊 Rebuild Complete{' (dry run)' if dry_run else ''}:")
+    print(f"   ✏️  Geo/price fields updated: {relocated} jobs")
+    print(f"   ❓ Outside known areas: {unplaced} jobs")
+    print(f"   🗺️  Buckets written: {len(cells)} cells, {len(daily)} daily")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild job geo/price fields and heatmap aggregates")
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without writing")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("   JASHO - Job Heatmap Rebuild Script")
+    print("="*60)
+
+    try:
+        rebuild_job_heatmap(args.dry_run)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Rebuild cancelled by user")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ Error during rebuild: {e}")
+        sys.exit(1)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Rebuild script for job trends: rewrites the hourly trend buckets (job_trends_hourly)
+from the jobs collection, covering the longest comparison window (2 x TRENDS_MAX_DAYS).
+Run once to backfill jobs posted before the buckets existed, or after changing areas.
+
+Usage: python rebuild_job_trends.py [--dry-run]
+"""
+
+import argparse
+import sys
+from datetime import datetime, timedelta, timezone
+
+from app.config import settings
+from app.services.firebase import get_db
+from app.services.trends import fold
+
+TRENDS_COLLECTION = "job_trends_hourly"
+
+
+def rebuild_job_trends(dry_run=False):
+    """Fold every active/completed job in the window into hourly buckets and replace the old ones."""
+
+    db = get_db()
+    since = datetime.now(timezone.utc) - timedelta(days=2 * settings.trends_max_days)
+    jobs = [doc.to_dict() or {} for doc in db.collection('jobs').where('status', 'in', ['active', 'completed']).stream()]
+    hours = fold(jobs, since)
+    print(f"  📈 {len(jobs)} jobs -> {len(hours)} hourly buckets since {since:%Y-%m-%d}")
+
+    if not dry_run:
+        removed = 0
+        for doc in db.collection(TRENDS_COLLECTION).stream():
+            db.collection(TRENDS_COLLECTION).document(doc.id).delete()
+            removed += 1
+        print(f"  🧹 Cleared {removed} docs from {TRENDS_COLLECTION}")
+        for doc_id, doc in hours.items():
+            db.collection(TRENDS_COLLECTION).document(doc_id).set(doc)
+
+    print(f"\n📊 Rebuild Complete{' (dry run)' if dry_run else ''}:")
+    print(f"   📝 Jobs scanned: {len(jobs)}")
+    print(f"   📈 Buckets written: {0 if dry_run else len(hours)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild hourly job trend buckets")
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without writing")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("   JASHO - Job Trends Rebuild Script")
+    print("="*60)
+
+    try:
+        rebuild_job_trends(args.dry_run)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Rebuild cancelled by user")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ Error during rebuild: {e}")
+        sys.exit(1)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Rebuild script for wallet analytics: rewrites the daily per-user buckets (wallet_rollups)
+from the transactions collection. Run once to backfill wallets whose history predates
+the buckets (their analytics totals read as zero until then), or to repair drift.
+
+Usage: python rebuild_wallet_rollups.py [--dry-run]
+"""
+
+import argparse
+import sys
+
+from app.services.firebase import get_db
+from app.services.rollups import fold
+
+ROLLUPS_COLLECTION = "wallet_rollups"
+
+
+def rebuild_wallet_rollups(dry_run=False):
+    """Fold every transaction into daily buckets and replace the old ones."""
+
+    db = get_db()
+    txns = [doc.to_dict() or {} for doc in db.collection('transactions').stream()]
+    buckets = fold(txns)
+    users = {doc['userId'] for doc in buckets.values()}
+    print(f"  💳 {len(txns)} transactions -> {len(buckets)} daily buckets for {len(users)} users")
+
+    if not dry_run:
+        removed = 0
+        for doc in db.collection(ROLLUPS_COLLECTION).stream():
+            db.collection(ROLLUPS_COLLECTION).document(doc.id).delete()
+            removed += 1
+        print(f"  🧹 Cleared {removed} docs from {ROLLUPS_COLLECTION}")
+        for doc_id, doc in buckets.items():
+            db.collection(ROLLUPS_COLLECTION).document(doc_id).set(doc)
+
+    print(f"\n📊 Rebuild Complete{' (dry run)' if dry_run else ''}:")
+    print(f"   📝 Transactions scanned: {len(txns)}")
+    print(f"   💳 Buckets written: {0 if dry_run else len(buckets)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild daily wallet analytics buckets")
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without writing")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("   JASHO - Wallet Rollups Rebuild Script")
+    print("="*60)
+
+    try:
+        rebuild_wallet_rollups(args.dry_run)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Rebuild cancelled by user")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ Error during rebuild: {e}")
+        sys.exit(1)
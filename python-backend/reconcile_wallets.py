@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Reconciliation script for wallets: compares each wallet's balances against its
+account in the double-entry ledger (ledger_accounts/wallet:{userId}) and reports
+every currency where they differ. Read-only; drift is for an operator to investigate.
+
+Usage: python reconcile_wallets.py [--user USER_ID]
+"""
+
+import argparse
+import sys
+
+from app.services.firebase import get_db
+from app.services.ledger import balance_diffs, slots, wallet_account
+
+ACCOUNTS_COLLECTION = "ledger_accounts"
+
+
+def ledger_balances(db, user_id):
+    """Ledger balances for a user's wallet account, summed over its slot documents."""
+    balances = {}
+    for slot in slots(wallet_account(user_id)):
+        doc = db.collection(ACCOUNTS_COLLECTION).document(slot).get()
+        if not doc.exists:
+            continue
+        for cur, amount in ((doc.to_dict() or {}).get('balances') or {}).items():
+            balances[cur] = balances.get(cur, 0.0) + float(amount)
+    return balances
+
+
+def reconcile_wallets(user_id=None):
+    """Report wallets whose balances disagree with the ledger; returns the number that do."""
+
+    db = get_db()
+    if user_id:
+        doc = db.collection('wallets').document(user_id).get()
+        wallets = [doc] if doc.exists else []
+    else:
+        wallets = list(db.collection('wallets').stream())
+
+    drifted = 0
+    for doc in wallets:
+        diffs = balance_diffs((doc.to_dict() or {}).get('balances') or {}, ledger_balances(db, doc.id))
+        if diffs:
+            drifted += 1
+            summary = ", ".join(f"{cur} {diff:+.2f}" for cur, diff in sorted(diffs.items()))
+            print(f"  ⚠️  {doc.id}: wallet - ledger = {summary}")
+
+    print(f"\n📊 Reconciliation Complete:")
+    print(f"   💳 Wallets checked: {len(wallets)}")
+    print(f"   ⚠️  Wallets out of balance: {drifted}")
+    return drifted
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile wallet balances against the ledger")
+    parser.add_argument("--user", help="Only reconcile this user's wallet")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("   JASHO - Wallet Ledger Reconciliation Script")
+    print("="*60)
+
+    try:
+        sys.exit(1 if reconcile_wallets(args.user) else 0)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Reconciliation cancelled by user")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ Error during reconciliation: {e}")
+        sys.exit(1)
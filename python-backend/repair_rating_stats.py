@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Repair script for user rating aggregates: rebuilds each user's ratingStats (count, sum,
+star histogram, recent per-day counts) from the ratings collection. Run once to backfill
+users rated before the aggregates existed, or if a failed write left them out of step.
+
+Usage: python repair_rating_stats.py [--dry-run]
+"""
+
+import argparse
+import sys
+
+from firebase_admin import firestore
+
+from app.services.firebase import get_db
+from app.services.rating_stats import fold
+
+
+def repair_rating_stats(dry_run=False):
+    """Fold every rating into per-user aggregates and rewrite the users whose stored copy differs."""
+
+    db = get_db()
+    ratings = [doc.to_dict() or {} for doc in db.collection('ratings').stream()]
+    expected = fold(ratings)
+    print(f"  ⭐ {len(ratings)} ratings for {len(expected)} users")
+
+    repaired = 0
+    unchanged = 0
+    missing = set(expected)
+
+    for user in db.collection('users').stream():
+        data = user.to_dict() or {}
+        missing.discard(user.id)
+        stats = expected.get(user.id)
+        legacy = 'averageRating' in data or 'totalRatings' in data
+        if stats is None and 'ratingStats' not in data and not legacy:
+            continue
+        stats = stats or {'count': 0, 'sum': 0.0, 'histogram': {}, 'days': {}}
+        if data.get('ratingStats') == stats and not legacy:
+            unchanged += 1
+            continue
+
+        print(f"  ✏️  {user.id}: {(data.get('ratingStats') or {}).get('count', 0)} -> {stats['count']} ratings")
+        if not dry_run:
+            # Averages are derived from ratingStats now; drop the old recomputed fields
+            db.collection('users').document(user.id).update({
+                'ratingStats': stats,
+                'averageRating': firestore.DELETE_FIELD,
+                'totalRatings': firestore.DELETE_FIELD,
+            })
+        repaired += 1
+
+    print(f"\n📊 Repair Complete{' (dry run)' if dry_run else ''}:")
+    print(f"   ✏️  Repaired: {repaired} users")
+    print(f"   ✅ Already correct: {unchanged} users")
+    print(f"   ❓ Ratings for unknown users: {len(missing)}")
+    for user_id in sorted(missing):
+        print(f"      {user_id}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild user rating aggregates from the ratings collection")
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without writing")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("   JASHO - Rating Stats Repair Script")
+    print("="*60)
+
+    try:
+        repair_rating_stats(args.dry_run)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Repair cancelled by user")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ Error during repair: {e}")
+        sys.exit(1)
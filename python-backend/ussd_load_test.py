@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+USSD load test: replays concurrent multi-hop carrier sessions against POST /api/ussd/ussd.
+Runs the app in-process on the MockDatabase (never a real project), so the numbers are
+app-side latency per hop: routing, session store, repos and caches, without network.
+
+Usage: python ussd_load_test.py [--sessions N] [--concurrency C] [--burst B --burst-gap S]
+                                [--timeout S] [--think-ms MS] [--max-p99-ms MS] [--max-timeout-rate R]
+"""
+
+import os
+
+# Must be set before the app (and its settings) are imported
+os.environ["USE_MOCK_DB"] = "true"
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+from app.config import settings
+from app.main import app
+from app.services.firebase import get_db
+from app.services.geo import locate
+from app.services.job_search import job_index
+from app.services.repos import price_bucket
+
+# Key sequences a subscriber types; each hop resends everything typed so far
+SCENARIOS = {
+    "balance": ["1"],
+    "browse_jobs": ["3", "1", "98", "98"],
+    "loan_eligibility": ["5", "1"],
+    "savings_goals": ["2", "1"],
+    "history": ["4", "4", "98"],
+    "help_contact": ["6", "3"],
+    "back_and_forth": ["2", "0", "3", "0", "1"],
+}
+
+
+def seed(users, jobs=40):
+    """Users with wallets, credit scores, savings goals and transaction history, plus open jobs."""
+
+    db = get_db()
+    now = datetime.utcnow()
+    phones = []
+    for i in range(users):
+        user_id = f"load_user_{i}"
+        phone = f"+2547{i:08d}"
+        phones.append(phone)
+        db.collection("users").document(user_id).set({"userId": user_id, "phoneNumber": phone, "fullName": f"Load User {i}"})
+        db.collection("wallets").document(user_id).set({"balances": {"KES": 1000.0 + i, "USDT": 0.0, "USD": 0.0}})
+        db.collection("credit_scores").document(user_id).set({"currentScore": 300 + i % 550, "maxLoanAmount": 5000})
+        for g in range(i % 4):
+            db.collection("savings_goals").document(f"{user_id}_goal_{g}").set(
+                {"userId": user_id, "name": f"Goal {g}", "saved": 100 * g, "target": 1000})
+        for t in range(i % 8):
+            db.collection("transactions").document(f"{user_id}_tx_{t}").set({
+                "userId": user_id, "type": "deposit" if t % 2 else "withdrawal", "amount": 50.0 + t,
+                "description": f"Load test transaction {t}", "initiatedAt": (now - timedelta(hours=t)).isoformat() + "Z",
+            })
+    for j in range(jobs):
+        location = {"address": "Nairobi"}
+        db.collection("jobs").document(f"load_job_{j}").set({
+            "title": f"Load test job {j}", "status": "active", "category": "Other", "urgency": "normal",
+            "location": location, "priceKes": 500 + j, "priceBucket": price_bucket(500 + j),
+            "geo": locate(location, settings.heatmap_geohash_precision),
+            "createdAt": now - timedelta(minutes=j), "updatedAt": now - timedelta(minutes=j),
+        })
+    return phones
+
+
+def percentiles(samples):
+    if len(samples) < 2:
+        value = samples[0] if samples else 0.0
+        return {"p50": value, "p95": value, "p99": value, "max": value}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"p50": cuts[49], "p95": cuts[94], "p99": cuts[98], "max": max(samples)}
+
+
+class Results:
+    def __init__(self):
+        self.by_hop = {}
+        self.all = []
+        self.timeouts = 0
+        self.errors = 0
+        self.hops = 0
+        self.sessions_completed = 0
+        self.sessions_dropped = 0
+
+    def record(self, hop, ms):
+        self.by_hop.setdefault(hop, []).append(ms)
+        self.all.append(ms)
+
+
+async def run_session(client, n, phone, keys, args, results):
+    """One carrier dialog: resend the growing key history every hop, dropping the session on timeout."""
+
+    session_id = f"ATUid_load_{n}"
+    typed = []
+    for hop in range(len(keys) + 1):
+        if hop:
+            typed.append(keys[hop - 1])
+            if args.think_ms:
+                await asyncio.sleep(random.uniform(0, args.think_ms) / 1000)
+        form = {"sessionId": session_id, "serviceCode": "*384#", "phoneNumber": phone, "text": "*".join(typed)}
+        results.hops += 1
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(client.post("/api/ussd/ussd", data=form), args.timeout)
+        except asyncio.TimeoutError:
+            results.timeouts += 1
+            results.sessions_dropped += 1
+            return
+        results.record(hop, (time.perf_counter() - started) * 1000)
+        body = response.json() if response.status_code == 200 else ""
+        if response.status_code != 200 or "error occurred" in body:
+            results.errors += 1
+            results.sessions_dropped += 1
+            return
+        if body.startswith("END"):
+            break
+    results.sessions_completed += 1
+
+
+async def load_test(args):
+    """Seed the mock database, then launch sessions in bursts under a concurrency cap."""
+
+    random.seed(args.seed)
+    results = Results()
+    limit = asyncio.Semaphore(args.concurrency)
+
+    async def bounded(client, n):
+        async with limit:
+            name = random.choice(list(SCENARIOS))
+            await run_session(client, n, random.choice(phones), SCENARIOS[name], args, results)
+
+    # Run the app's startup/shutdown hooks around the test (ASGITransport doesn't)
+    async with app.router.lifespan_context(app):
+        phones = seed(args.users)
+        # Startup indexed the empty database; pick up the seeded jobs before measuring
+        indexed = await job_index.rebuild()
+        print(f"🌱 Seeded {len(phones)} users, {indexed} jobs indexed")
+
+        started = time.perf_counter()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://carrier") as client:
+            tasks = []
+            for n in range(args.sessions):
+                tasks.append(asyncio.create_task(bounded(client, n)))
+                if args.burst_gap and (n + 1) % args.burst == 0:
+                    await asyncio.sleep(args.burst_gap)
+            await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+    return results, elapsed
+
+
+def report(results, elapsed, args):
+    timeout_rate = results.timeouts / results.hops if results.hops else 0.0
+    overall = percentiles(results.all)
+    summary = {
+        "sessions": args.sessions,
+        "completed": results.sessions_completed,
+        "dropped": results.sessions_dropped,
+        "hops": results.hops,
+        "hopsPerSecond": round(results.hops / elapsed, 1) if elapsed else 0.0,
+        "timeouts": results.timeouts,
+        "timeoutRate": timeout_rate,
+        "errors": results.errors,
+        "overallMs": {k: round(v, 2) for k, v in overall.items()},
+        "byHopMs": {hop: {k: round(v, 2) for k, v in percentiles(s).items()} for hop, s in sorted(results.by_hop.items())},
+    }
+
+    print(f"\n📊 Load Test Complete ({elapsed:.1f}s):")
+    print(f"   ✅ Sessions completed: {results.sessions_completed}/{args.sessions}")
+    print(f"   ⏱️  Timeouts: {results.timeouts} ({timeout_rate:.2%} of {results.hops} hops, budget {args.timeout}s)")
+    print(f"   ❌ Errors: {results.errors}")
+    print(f"   🚀 Throughput: {summary['hopsPerSecond']} hops/s")
+    print(f"\n   {'hop':>6} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for hop, samples in sorted(results.by_hop.items()):
+        p = percentiles(samples)
+        print(f"   {hop:>6} {len(samples):>7} {p['p50']:>9.2f} {p['p95']:>9.2f} {p['p99']:>9.2f} {p['max']:>9.2f}")
+    print(f"   {'all':>6} {len(results.all):>7} {overall['p50']:>9.2f} {overall['p95']:>9.2f} {overall['p99']:>9.2f} {overall['max']:>9.2f}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"\n💾 Wrote summary to {args.out}")
+
+    failures = []
+    if args.max_p99_ms is not None and overall["p99"] > args.max_p99_ms:
+        failures.append(f"p99 {overall['p99']:.2f}ms > {args.max_p99_ms}ms")
+    if args.max_timeout_rate is not None and timeout_rate > args.max_timeout_rate:
+        failures.append(f"timeout rate {timeout_rate:.2%} > {args.max_timeout_rate:.2%}")
+    if results.errors:
+        failures.append(f"{results.errors} error responses")
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the USSD endpoint with simulated carrier sessions")
+    parser.add_argument("--sessions", type=int, default=2000, help="Dialogs to run (default 2000)")
+    parser.add_argument("--concurrency", type=int, default=200, help="Dialogs in flight at once (default 200)")
+    parser.add_argument("--burst", type=int, default=500, help="Dialogs released per burst (default 500)")
+    parser.add_argument("--burst-gap", type=float, default=0.0, help="Seconds between bursts (default 0: all at once)")
+    parser.add_argument("--users", type=int, default=1000, help="Seeded subscribers (default 1000)")
+    parser.add_argument("--timeout", type=float, default=2.0, help="Carrier per-hop budget in seconds (default 2.0)")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Max random pause between hops")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for scenario and subscriber choice")
+    parser.add_argument("--max-p99-ms", type=float, help="Exit 1 if overall p99 exceeds this")
+    parser.add_argument("--max-timeout-rate", type=float, help="Exit 1 if the timeout rate exceeds this (e.g. 0.01)")
+    parser.add_argument("--out", help="Write a JSON summary here")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("   JASHO - USSD Load Test")
+    print("="*60)
+
+    try:
+        results, elapsed = asyncio.run(load_test(args))
+        failures = report(results, elapsed, args)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Load test cancelled by user")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ Error during load test: {e}")
+        sys.exit(1)
+
+    if failures:
+        print("\n❌ Regression thresholds exceeded: " + "; ".join(failures))
+        sys.exit(1)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Batch wallet report: per-user, per-currency totals over all transactions.
+Uses the same columnar analytics engine as the /wallet/analytics endpoint.
+
+Usage: python wallet_report.py [--days N] [--freq D|W|MS] [--out report.csv]
+"""
+
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from app.services import analytics
+
+
+def wallet_report(days=None, freq=None, out=None):
+    """Load transactions once and print (or write) per-user summaries."""
+
+    start_at = datetime.utcnow() - timedelta(days=days) if days else None
+    frame = analytics.load_transactions(start_at=start_at)
+    print(f"📥 Loaded {len(frame)} transactions")
+
+    report = analytics.time_series(frame, freq) if freq else analytics.summarize_by_user(frame)
+    if out:
+        report.to_csv(out, index=False)
+        print(f"💾 Wrote {len(report)} rows to {out}")
+    else:
+        print(report.to_string(index=False))
+
+    totals = analytics.summarize(frame)
+    print(f"\n📊 Report Complete:")
+    print(f"   Users: {frame['userId'].nunique()}")
+    print(f"   Transactions: {totals['totalTransactions']}")
+    print(f"   Success rate: {totals['successRate']:.1%}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Wallet analytics batch report")
+    parser.add_argument("--days", type=int, help="Only include the last N days")
+    parser.add_argument("--freq", help="Time-bucketed series per currency instead of per-user totals (D, W, MS, ...)")
+    parser.add_argument("--out", help="Write CSV here instead of printing")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("   JASHO - Wallet Analytics Report")
+    print("="*60)
+
+    try:
+        wallet_report(args.days, args.freq, args.out)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Report cancelled by user")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n❌ Error building report: {e}")
+        sys.exit(1)